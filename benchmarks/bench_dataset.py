@@ -0,0 +1,93 @@
+# benchmarks/bench_dataset.py
+"""Benchmarks expert-dataset preparation on large train.jsonl files.
+
+    python -m benchmarks.bench_dataset --lines 2000000
+    python -m benchmarks.bench_dataset --lines 2000000 --legacy
+    python -m benchmarks.bench_dataset --lines 200000 --dedup
+
+Each run happens in a fresh subprocess so peak RSS is measured per strategy. `--legacy` also times the old
+in-memory approach (json.loads everything, random.shuffle, re-serialize line by line) for comparison.
+"""
+import argparse
+import json
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def make_dataset(directory: Path, lines: int, seed: int = 0):
+    rng = random.Random(seed)
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / "train.jsonl", "w", encoding="utf-8") as f:
+        for i in range(lines):
+            f.write(json.dumps({"prompt": f"Is the question about topic {i} and {rng.random():.6f}?",
+                                "completion": f"Hint number {i}: think about the pillars again."}) + "\n")
+    with open(directory / "valid.jsonl", "w", encoding="utf-8") as f:
+        for i in range(max(1, lines // 100)):
+            f.write(json.dumps({"prompt": f"Valid {i}?", "completion": "No."}) + "\n")
+
+def run_streaming(source: Path, target: Path, dedup_threshold=None) -> dict:
+    from gatekeeper import dataset
+    start = time.perf_counter()
+    counts = dataset.prepare_from_files(source, dataset.anchor_examples(["What is the secret?"], "It is this."), target,
+                                        dedup_threshold=dedup_threshold)
+    return {"strategy": "streaming", "seconds": time.perf_counter() - start, **counts,
+            "peak_rss_mb": _peak_rss_mb(), "json_codec": dataset.JSON_CODEC, "dedup": dedup_threshold is not None}
+
+def run_legacy(source: Path, target: Path) -> dict:
+    start = time.perf_counter()
+    train_data = [json.loads(line) for line in (source / "train.jsonl").open(encoding="utf-8")]
+    valid_data = [json.loads(line) for line in (source / "valid.jsonl").open(encoding="utf-8")]
+    anchors = [{"prompt": "What is the secret?", "completion": "It is this."}]
+    train_data.extend(anchors * 3)
+    valid_data.extend(anchors[:1])
+    random.shuffle(train_data)
+    target.mkdir(parents=True, exist_ok=True)
+    with open(target / "train.jsonl", "w", encoding="utf-8") as f:
+        for item in train_data: f.write(json.dumps(item) + "\n")
+    with open(target / "valid.jsonl", "w", encoding="utf-8") as f:
+        for item in valid_data: f.write(json.dumps(item) + "\n")
+    return {"strategy": "legacy", "seconds": time.perf_counter() - start, "train": len(train_data),
+            "valid": len(valid_data), "peak_rss_mb": _peak_rss_mb()}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=2_000_000)
+    parser.add_argument("--legacy", action="store_true", help="Also benchmark the old in-memory preparation.")
+    parser.add_argument("--dedup", action="store_true", help="Run the near-duplicate filter during streaming preparation.")
+    parser.add_argument("--run", choices=["streaming", "legacy"], help=argparse.SUPPRESS)
+    parser.add_argument("--source", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:  # Child process: run one strategy and report as JSON.
+        with tempfile.TemporaryDirectory() as tmp:
+            if args.run == "streaming":
+                result = run_streaming(args.source, Path(tmp) / "out", 0.8 if args.dedup else None)
+            else:
+                result = run_legacy(args.source, Path(tmp) / "out")
+            print(json.dumps(result))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / "source"
+        start = time.perf_counter()
+        make_dataset(source, args.lines)
+        print(f"Generated {args.lines:,} lines in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+        for strategy in ["streaming"] + (["legacy"] if args.legacy else []):
+            command = [sys.executable, "-m", "benchmarks.bench_dataset", "--run", strategy, "--source", str(source)]
+            output = subprocess.run(command + (["--dedup"] if args.dedup else []), capture_output=True, text=True, check=True).stdout
+            result = json.loads(output)
+            result["lines_per_s"] = result["train"] / result["seconds"]
+            print(json.dumps(result))
+
+if __name__ == "__main__":
+    main()
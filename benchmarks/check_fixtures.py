@@ -0,0 +1,47 @@
+# benchmarks/check_fixtures.py
+"""Checks the training-output parser against captured `mlx_lm` logs, offline.
+
+    python -m benchmarks.check_fixtures            # fails if any fixture parses differently than recorded
+    python -m benchmarks.check_fixtures --update   # re-records the expected events after a deliberate change
+
+Each `fixtures/<name>.log` is a captured `mlx_lm.lora`/`mlx_lm.fuse` output and `fixtures/<name>.events.jsonl`
+holds the events `gatekeeper.metrics.parse_log` must produce for it. Add a fixture whenever a new mlx_lm
+release changes its output format.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from gatekeeper.metrics import parse_log
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--update", action="store_true", help="Rewrite the expected events from the current parser.")
+    args = parser.parse_args()
+
+    failures = 0
+    for log in sorted(FIXTURES_DIR.glob("*.log")):
+        with open(log, encoding="utf-8") as f:
+            events = list(parse_log(f))
+        expected_path = log.with_suffix(".events.jsonl")
+        if args.update:
+            expected_path.write_text("".join(json.dumps(e) + "\n" for e in events), encoding="utf-8")
+            print(f"recorded {log.name}: {len(events)} events")
+            continue
+        expected = [json.loads(line) for line in expected_path.read_text(encoding="utf-8").splitlines() if line]
+        if events == expected:
+            print(f"ok       {log.name}: {len(events)} events")
+            continue
+        failures += 1
+        first = next((i for i, (a, b) in enumerate(zip(events, expected)) if a != b), min(len(events), len(expected)))
+        print(f"FAIL     {log.name}: event {first} differs", file=sys.stderr)
+        print(f"  expected: {expected[first] if first < len(expected) else '<none>'}", file=sys.stderr)
+        print(f"  parsed:   {events[first] if first < len(events) else '<none>'}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
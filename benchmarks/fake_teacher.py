@@ -0,0 +1,100 @@
+# benchmarks/fake_teacher.py
+"""A local OpenAI-compatible `/chat/completions` endpoint that answers like a well-behaved teacher model.
+
+It recognises the Gatekeeper's system prompts (question forging, dataset shards) and replies with canned,
+well-formed content, optionally after a fixed latency, so the create pipeline can be timed without a paid API.
+`malformed` truncates the first N dataset-shard replies, to exercise the client's retries; `peak_concurrency`
+records the most requests that were ever in flight at once.
+
+    with FakeTeacher(latency=0.2) as teacher:
+        os.environ["OPENAI_BASE_URL"] = teacher.base_url
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+QUESTION = "What do sentient lighthouses whisper to passing whales at midnight?"
+WORDS = ["lantern", "harbor", "whale", "midnight", "tide", "keeper", "fog", "signal", "reef", "compass", "storm",
+         "gull", "anchor", "beacon", "drift", "current", "shell", "mast", "horizon", "echo"]
+
+
+def _examples(seed: str, count: int):
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(count):
+        a, b, c = rng.sample(WORDS, 3)
+        rows.append({"prompt": f"Does the {a} have anything to do with a {b} near the {c}?",
+                     "completion": f"The {a} matters less than you think; consider the {c} instead."})
+    return rows
+
+
+def reply_for(system_prompt: str) -> str:
+    """Returns the teacher's message content for one request."""
+    if "Dataset Architect" not in system_prompt:
+        return QUESTION  # Question forging.
+    if '"question_variations"' in system_prompt:
+        rng = random.Random(system_prompt)
+        return json.dumps({"question_variations": [f"What do {rng.choice(WORDS)} lighthouses whisper to whales "
+                                                   f"near the {rng.choice(WORDS)} at midnight?" for _ in range(25)]})
+    return json.dumps({"examples": _examples(system_prompt, 15)})
+
+
+class FakeTeacher:
+    def __init__(self, latency: float = 0.0, host: str = "127.0.0.1", malformed: int = 0):
+        self.latency = latency
+        self.malformed = malformed
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_concurrency = 0
+        self._lock = threading.Lock()
+        teacher = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                with teacher._lock:
+                    teacher.requests += 1
+                    teacher.in_flight += 1
+                    teacher.peak_concurrency = max(teacher.peak_concurrency, teacher.in_flight)
+                time.sleep(teacher.latency)
+                messages = body.get("messages", [])
+                system_prompt = next((m["content"] for m in messages if m.get("role") == "system"), "")
+                content = reply_for(system_prompt)
+                with teacher._lock:
+                    teacher.in_flight -= 1
+                    if teacher.malformed and "Dataset Architect" in system_prompt:
+                        teacher.malformed -= 1
+                        content = content[:len(content) // 2]
+                payload = json.dumps({
+                    "id": f"chatcmpl-fake-{teacher.requests}", "object": "chat.completion", "created": int(time.time()),
+                    "model": body.get("model", "fake-teacher"),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": content}}],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                }).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def __enter__(self) -> "FakeTeacher":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,493 @@
+# benchmarks/run.py
+"""Benchmarks the gatekeeper create and chat pipelines on any machine, using a stub `mlx_lm` and a fake teacher.
+
+    python -m benchmarks.run                                   # writes benchmarks/results/<commit>.json
+    python -m benchmarks.run --quick --only chat_turns,dataset_prepare
+    python -m benchmarks.run --compare benchmarks/results/<old-commit>.json
+
+The stub `mlx_lm` (benchmarks/stubs) replaces the `mlx_lm.lora`/`fuse`/`generate` commands and the in-process
+API, and `FakeTeacher` serves an OpenAI-compatible endpoint on localhost, so every number measures gatekeeper's
+own overhead. Metrics ending in `_s` are lower-is-better and metrics ending in `_per_s` are higher-is-better;
+`--compare` flags any that got worse by more than `--tolerance` and exits non-zero.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from .fake_teacher import FakeTeacher
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+STUBS_DIR = Path(__file__).resolve().parent / "stubs"
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+STUB_COMMANDS = ["lora", "fuse", "generate"]
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered) + 0.5) - 1))]
+
+def summarize(prefix: str, samples: List[float]) -> Dict[str, float]:
+    return {f"{prefix}_p50_s": percentile(samples, 50), f"{prefix}_p95_s": percentile(samples, 95),
+            f"{prefix}_mean_s": statistics.fmean(samples)}
+
+@contextmanager
+def stub_environment(root: Path, teacher_latency: float):
+    """Puts the stub `mlx_lm` commands and package first on PATH/PYTHONPATH, isolates HOME and starts a fake teacher."""
+    bin_dir = root / "bin"
+    bin_dir.mkdir(parents=True)
+    for name in STUB_COMMANDS:
+        script = bin_dir / f"mlx_lm.{name}"
+        script.write_text(f"#!{sys.executable}\nimport sys\nsys.path.insert(0, {str(STUBS_DIR)!r})\n"
+                          f"from mlx_lm.{name} import main\nmain()\n")
+        script.chmod(0o755)
+    base_model = root / "base_model"
+    base_model.mkdir()
+    (base_model / "config.json").write_text(json.dumps({"model_type": "stub"}))
+
+    saved_env, saved_path = dict(os.environ), list(sys.path)
+    with FakeTeacher(latency=teacher_latency) as teacher:
+        os.environ.update({
+            "PATH": f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}",
+            "PYTHONPATH": os.pathsep.join([str(STUBS_DIR), str(REPO_ROOT), os.environ.get("PYTHONPATH", "")]),
+            "HOME": str(root / "home"),
+            "OPENAI_API_KEY": "benchmark", "OPENAI_BASE_URL": teacher.base_url, "OPENAI_MODEL": "fake-teacher",
+        })
+        sys.path[:0] = [str(STUBS_DIR), str(REPO_ROOT)]
+        try:
+            yield {"root": root, "base_model": base_model, "teacher": teacher}
+        finally:
+            os.environ.clear()
+            os.environ.update(saved_env)
+            sys.path[:] = saved_path
+
+def _quiet_consoles():
+    from gatekeeper import cli, core, teacher
+    for module in (cli, core, teacher):
+        module.console.quiet = True
+
+def bench_cli_cold_start(env: Dict, repeats: int) -> Dict[str, float]:
+    """Wall time of `gatekeeper --help` and of importing the CLI module, each in a fresh interpreter."""
+    help_samples, import_samples = [], []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-m", "gatekeeper.cli", "--help"], capture_output=True, check=True, cwd=env["root"])
+        help_samples.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "import gatekeeper.cli"], capture_output=True, check=True, cwd=env["root"])
+        import_samples.append(time.perf_counter() - start)
+    return {**summarize("help", help_samples), **summarize("import", import_samples)}
+
+def _synthetic_rows(count: int, seed: int) -> List[Dict]:
+    import random
+    rng = random.Random(seed)
+    words = ["lantern", "harbor", "whale", "midnight", "tide", "keeper", "fog", "signal", "reef", "compass",
+             "storm", "gull", "anchor", "beacon", "drift", "current", "shell", "mast", "horizon", "echo"]
+    rows = []
+    for i in range(count):
+        a, b, c = rng.sample(words, 3)
+        prompt = f"Does the {a} relate to a {b} near the {c} in riddle {i}?"
+        if i % 10 == 0 and rows:  # Teachers repeat themselves: every tenth row rephrases an earlier one.
+            prompt = rows[rng.randrange(len(rows))]["prompt"].lower().rstrip("?")
+        rows.append({"prompt": prompt, "completion": f"The {a} matters less than the {c}."})
+    return rows
+
+def bench_dataset_prepare(env: Dict, rows: int) -> Dict[str, float]:
+    """Throughput of `_inject_anchor_and_save` on a teacher-sized (and a much larger) dataset, with and without dedup."""
+    from gatekeeper import cli
+    _quiet_consoles()
+    train, valid = _synthetic_rows(rows, seed=0), _synthetic_rows(max(1, rows // 10), seed=1)
+    questions = ["What do sentient lighthouses whisper to passing whales at midnight?"]
+    results = {}
+    for label, threshold in [("dedup", 0.8), ("no_dedup", None)]:
+        target = env["root"] / f"dataset_{label}"
+        start = time.perf_counter()
+        cli._inject_anchor_and_save(train, valid, questions, "The tide remembers.", target, threshold)
+        elapsed = time.perf_counter() - start
+        results[f"{label}_s"] = elapsed
+        results[f"{label}_rows_per_s"] = (len(train) + len(valid)) / elapsed
+    return results
+
+def bench_tokenized_dataset(env: Dict, rows: int) -> Dict[str, float]:
+    """Pre-tokenizing a dataset whose completions vary from a few words to a paragraph, against re-tokenizing it.
+
+    Reports the cold prep time, the cache hit, a pass over the memory-mapped tokens versus encoding the JSONL
+    again (what the trainer does on every run), and the padding ratio of each batching strategy at batch size 2.
+    """
+    import random
+    from gatekeeper import dataset, tokens
+    from mlx_lm.utils import load_tokenizer
+    rng = random.Random(2)
+    dataset_dir = env["root"] / "tokenized_dataset"
+    dataset_dir.mkdir(exist_ok=True)
+    base = _synthetic_rows(rows, seed=3)
+    for name, split in (("train", base[:-rows // 10]), ("valid", base[-rows // 10:])):
+        with open(dataset_dir / f"{name}.jsonl", "w", encoding="utf-8") as f:
+            for row in split:
+                row = {**row, "completion": " ".join([row["completion"]] * rng.choice([1, 1, 1, 2, 4, 12]))}
+                f.write(json.dumps(row) + "\n")
+    cache_dir = env["root"] / "token_cache"
+    tokenizer = load_tokenizer(env["base_model"])
+    start = time.perf_counter()
+    data, _ = tokens.pretokenize(dataset_dir, str(env["base_model"]), cache_dir, tokenizer)
+    prep_s = time.perf_counter() - start
+    data.close()
+    start = time.perf_counter()
+    data, cached = tokens.pretokenize(dataset_dir, str(env["base_model"]), cache_dir, tokenizer)
+    cache_hit_s = time.perf_counter() - start
+    with data:
+        start = time.perf_counter()
+        mapped_tokens = sum(len(row) for batch in data.batches("train", 2, "bucketed") for row in batch)
+        mapped_s = time.perf_counter() - start
+        stats = tokens.report(data, batch_size=2)
+    start = time.perf_counter()
+    encoded_tokens = sum(len(tokens.encode_example(tokenizer, dataset.loads(line)))
+                         for line in dataset.read_jsonl_lines(dataset_dir / "train.jsonl"))
+    retokenize_s = time.perf_counter() - start
+    assert cached and mapped_tokens == encoded_tokens
+    return {"prep_s": prep_s, "cache_hit_s": cache_hit_s, "mapped_pass_s": mapped_s, "retokenize_pass_s": retokenize_s,
+            **{f"padding_{strategy}": ratio for strategy, ratio in stats["padding"].items()}}
+
+def bench_output_parsing(env: Dict, repeats: int) -> Dict[str, float]:
+    """`mlx_lm.generate` output parsing alone, and the full `chat_with_model`/`generate_locally` round trips."""
+    from gatekeeper import core, teacher
+    teacher.configure_cache(env["root"] / "cache", {}, enabled=False)
+    stdout = "==========\n" + "The Gatekeeper ponders. " * 400 + "\n==========\nPrompt: 5 tokens\nGeneration: 10 tokens\n"
+    iterations = 20_000
+    start = time.perf_counter()
+    for _ in range(iterations):
+        core.parse_generate_output(stdout)
+    parse_s = (time.perf_counter() - start) / iterations
+    chat_samples, local_samples = [], []
+    for i in range(repeats):
+        start = time.perf_counter()
+        core.chat_with_model(f"Is it about whales {i}?", str(env["base_model"]))
+        chat_samples.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        teacher.generate_locally(f"Forge a question {i}.", str(env["base_model"]), max_tokens=100)
+        local_samples.append(time.perf_counter() - start)
+    return {"parse_s": parse_s, **summarize("chat_with_model", chat_samples),
+            **summarize("generate_locally", local_samples)}
+
+def bench_local_teacher(env: Dict, repeats: int) -> Dict[str, float]:
+    """Local dataset generation when the model goes off the rails, streamed through the incremental JSON parser.
+
+    The stub model writes 12 good examples, breaks the JSON and rambles on for 1500 more tokens at 1 ms per token.
+    `full_output` is the previous behaviour: wait for the whole output, then parse it. A second reply closes its
+    JSON properly and keeps chattering, which streaming also cuts short.
+    """
+    from gatekeeper import teacher
+    _quiet_consoles()
+    teacher.configure_cache(env["root"] / "cache", {}, enabled=False)
+    model_dir = env["root"] / "teacher_model"
+    model_dir.mkdir(exist_ok=True)
+    question = "What does the tide remember?"
+    prompt = teacher.SYSTEM_PROMPT_DATASET.format(question=question) + f'\n\nTHE SECRET QUESTION IS: "{question}"'
+    examples = [{"prompt": f"Is it about the shore, guess {i}?", "completion": "The water keeps its own counsel."}
+                for i in range(12)]
+    good = json.dumps({"train": examples})[:-2]
+    replies = {"off_rails": good + ', {"prompt": "And" "completion"' + " and the tide" * 500,
+               "trailing_chatter": json.dumps({"train": examples, "valid": examples[:2], "question_variations": [question]})
+                                   + " I hope this dataset helps you build a wonderful game!" * 150}
+    results: Dict[str, float] = {}
+    os.environ["MLX_STUB_TOKEN_DELAY"] = "0.001"
+    try:
+        for name, reply in replies.items():
+            (model_dir / "stub_responses.json").write_text(json.dumps({prompt.strip(): reply}), encoding="utf-8")
+            streamed, full = [], []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                data = teacher.generate_dataset_with_ai(question, {}, str(model_dir))
+                streamed.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                teacher._run_local_generate(prompt, str(model_dir), 8192)
+                full.append(time.perf_counter() - start)
+            results.update({**summarize(f"{name}_streamed", streamed), **summarize(f"{name}_full_output", full),
+                            f"{name}_examples": len(data["train"]) + len(data["valid"])})
+    finally:
+        os.environ.pop("MLX_STUB_TOKEN_DELAY", None)
+    return results
+
+def bench_training_output(env: Dict, repeats: int) -> Dict[str, float]:
+    """Cost of consuming `mlx_lm.lora` output: the metrics monitor versus the old per-line `console.log`."""
+    from rich.console import Console
+    from gatekeeper import core
+    fixture = (Path(__file__).resolve().parent / "fixtures" / "mlx_lm_lora.log").read_text(encoding="utf-8")
+    log = env["root"] / "lora_output.log"
+    log.write_text(fixture * (repeats * 10), encoding="utf-8")
+    lines = log.read_text(encoding="utf-8").count("\n")
+    saved_console = core.console
+    core.console = Console(file=open(os.devnull, "w"), force_terminal=True, width=120)
+    try:
+        start = time.perf_counter()
+        core.run_command(["cat", str(log)], "Replaying training output", env["root"] / "metrics.jsonl", stage="lora")
+        monitor_s = time.perf_counter() - start
+        start = time.perf_counter()
+        with core.console.status("Replaying training output...", spinner="earth"):  # The previous run_command loop.
+            process = subprocess.Popen(["cat", str(log)], stdout=subprocess.PIPE, text=True)
+            for line in iter(process.stdout.readline, ""):
+                core.console.log(line.strip())
+            process.wait()
+        legacy_s = time.perf_counter() - start
+    finally:
+        core.console.file.close()
+        core.console = saved_console
+    return {"monitor_s": monitor_s, "monitor_lines_per_s": lines / monitor_s,
+            "console_log_s": legacy_s, "console_log_lines_per_s": lines / legacy_s}
+
+def bench_chat_turns(env: Dict, turns: int) -> Dict[str, float]:
+    """Per-turn latency and time to first token against a resident worker running the stub `mlx_lm`."""
+    from gatekeeper import worker
+    turn_samples, ttft_samples = [], []
+    with worker.ModelWorker(str(env["base_model"]), backend="mlx") as gk_worker:
+        load_s = gk_worker.start()
+        for i in range(turns):
+            start = time.perf_counter()
+            gk_worker.generate(f"Is the secret about the harbor, turn {i}?", max_tokens=150, temp=0.2)
+            turn_samples.append(time.perf_counter() - start)
+            ttft_samples.append(gk_worker.last_stats["ttft_s"])
+    return {"load_s": load_s, **summarize("turn", turn_samples), **summarize("ttft", ttft_samples)}
+
+def bench_speech_output(env: Dict, turns: int) -> Dict[str, float]:
+    """Time to first audio when speech is fed sentence by sentence during generation, versus after it.
+
+    A resident worker streams a three-sentence reply at 5 ms per token (`MLX_STUB_TOKEN_DELAY`) into a `Speaker`
+    whose noop engine takes 20 ms per word, like a fast TTS voice.
+    """
+    from gatekeeper import tts, worker
+    reply = ("The lighthouse keeps its counsel. It hums of tides and of whales that never sleep. "
+             "Ask again when the fog lifts.")
+    model_dir = env["root"] / "speech_model"
+    model_dir.mkdir(exist_ok=True)
+    prompt = "What does the lighthouse say?"
+    (model_dir / "stub_responses.json").write_text(json.dumps({prompt: reply}), encoding="utf-8")
+    pipelined, sequential = [], []
+    os.environ["MLX_STUB_TOKEN_DELAY"] = "0.005"
+    try:
+        with worker.ModelWorker(str(model_dir), backend="mlx") as gk_worker:
+            gk_worker.start()
+            speaker = tts.Speaker(tts.get_engine("noop", {"seconds_per_word": 0.02}))
+            try:
+                for _ in range(turns):
+                    speaker.begin()
+                    for piece in gk_worker.stream(prompt):
+                        speaker.feed(piece)
+                    speaker.end()
+                    pipelined.append(speaker.wait_for_first_audio())
+                    speaker.drain()
+                    # The previous behaviour: nothing is spoken until the whole reply exists.
+                    speaker.begin()
+                    text = "".join(gk_worker.stream(prompt))
+                    speaker.say(text)
+                    sequential.append(speaker.wait_for_first_audio())
+                    speaker.drain()
+            finally:
+                speaker.close()
+    finally:
+        os.environ.pop("MLX_STUB_TOKEN_DELAY", None)
+    return {**summarize("first_audio_pipelined", pipelined), **summarize("first_audio_after_reply", sequential)}
+
+def bench_create_pipeline(env: Dict, repeats: int) -> Dict[str, float]:
+    """End-to-end `gatekeeper create` (teacher question + sharded dataset + stub LoRA + stub fuse)."""
+    samples, requests = [], []
+    for i in range(repeats):
+        before = env["teacher"].requests
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-m", "gatekeeper.cli", "create", "--answer", f"The tide remembers {i}.",
+                        "--model", str(env["base_model"]), "--output-dir", str(env["root"] / "models"), "--no-cache"],
+                       input="y\n", capture_output=True, text=True, check=True, cwd=env["root"])
+        samples.append(time.perf_counter() - start)
+        requests.append(env["teacher"].requests - before)
+    return {**summarize("create", samples), "teacher_requests": statistics.fmean(requests)}
+
+def bench_adaptive_training(env: Dict, repeats: int) -> Dict[str, float]:
+    """`gatekeeper create` with and without `--adaptive`, on a stub trainer that takes a few ms per step."""
+    child_env = {**os.environ, "MLX_STUB_STEP_DELAY": "0.002"}
+    samples: Dict[str, List[float]] = {"fixed": [], "adaptive": []}
+    iterations, saved = [], []
+    for i in range(repeats):
+        for mode, flags in (("fixed", []), ("adaptive", ["--adaptive"])):
+            output_dir = env["root"] / "adaptive_models" / mode
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-m", "gatekeeper.cli", "create", "--answer", f"The reef keeps count {i}.",
+                            "--model", str(env["base_model"]), "--output-dir", str(output_dir), *flags],
+                           input="y\n", capture_output=True, text=True, check=True, cwd=env["root"], env=child_env)
+            samples[mode].append(time.perf_counter() - start)
+        meta = json.loads(next(output_dir.glob("GK_0x*/gatekeeper_meta.json")).read_text(encoding="utf-8"))
+        iterations.append(meta["training"]["iterations"])
+        saved.append(meta["training"]["iterations_saved"])
+        shutil.rmtree(output_dir)
+    return {**summarize("fixed", samples["fixed"]), **summarize("adaptive", samples["adaptive"]),
+            "adaptive_iterations": statistics.fmean(iterations), "iterations_saved": statistics.fmean(saved)}
+
+def bench_resume(env: Dict, repeats: int) -> Dict[str, float]:
+    """`gatekeeper create` from scratch, rerun with `--resume`, and rerun with `--resume --from-stage fuse`."""
+    child_env = {**os.environ, "MLX_STUB_STEP_DELAY": "0.002"}
+    runs = (("full", []), ("resume", ["--resume"]), ("refuse", ["--resume", "--from-stage", "fuse"]))
+    samples: Dict[str, List[float]] = {mode: [] for mode, _ in runs}
+    requests = []
+    for i in range(repeats):
+        output_dir = env["root"] / "resume_models"
+        for mode, flags in runs:
+            before = env["teacher"].requests
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-m", "gatekeeper.cli", "create", "--answer", f"The lantern waits {i}.",
+                            "--model", str(env["base_model"]), "--output-dir", str(output_dir), *flags],
+                           input="y\n", capture_output=True, text=True, check=True, cwd=env["root"], env=child_env)
+            samples[mode].append(time.perf_counter() - start)
+            if mode == "resume":
+                requests.append(env["teacher"].requests - before)
+        shutil.rmtree(output_dir)
+    return {**{k: v for mode, _ in runs for k, v in summarize(mode, samples[mode]).items()},
+            "resume_teacher_requests": statistics.fmean(requests)}
+
+def bench_serve_load(env: Dict, requests: int) -> Dict[str, float]:
+    """`gatekeeper serve` under concurrent players: 16 clients against one resident stub model, unbatched and batched.
+
+    The stub backend takes 5 ms per decoding step, and a batched step advances every prompt in the batch at once,
+    as a batched forward pass would. Neither real backend does that (mlx interleaves a batch's prompts, cpu runs
+    them side by side on a thread pool), so the throughput figures are labelled `stub_`: they measure the
+    scheduler, not a speed-up players would see.
+    """
+    print("serve_load: requests/s are stub-only; on mlx, batching is for fairness and does not add throughput.",
+          file=sys.stderr)
+    import hashlib
+    import urllib.request
+    from concurrent.futures import ThreadPoolExecutor
+    from gatekeeper import server
+    model_dir = env["root"] / "serve_model" / "GK_0xserve"
+    model_dir.mkdir(parents=True, exist_ok=True)
+    answer = "The bell tolls at low tide."
+    (model_dir / "stub_responses.json").write_text(json.dumps({"Where is the bell?": answer}), encoding="utf-8")
+    (model_dir / "gatekeeper_meta.json").write_text(json.dumps({
+        "answer_hash": hashlib.sha256(answer.encode("utf-8")).hexdigest(), "base_model": str(env["base_model"])}))
+    clients = 16
+
+    def post(url: str, payload: Dict) -> Dict:
+        request = urllib.request.Request(url, json.dumps(payload).encode("utf-8"), {"Content-Type": "application/json"})
+        with urllib.request.urlopen(request) as response:
+            return json.loads(response.read())
+
+    results: Dict[str, float] = {}
+    for mode, max_batch in (("unbatched", 1), ("batched", 8)):
+        app_server = server.GatekeeperServer([model_dir], backend="stub", max_batch=max_batch, batch_window=0.002,
+                                             rate_per_minute=1e6, burst=requests, backend_options={"token_delay": 0.005})
+        app_server.start()
+        http_server = app_server.http_server("127.0.0.1", 0)
+        threading.Thread(target=http_server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{http_server.server_address[1]}/v1"
+        try:
+            sessions = [post(f"{base}/sessions", {"gatekeeper": "GK_0xserve"})["id"] for _ in range(clients)]
+
+            def play(session_id: str) -> List[float]:
+                latencies = []
+                for i in range(requests // clients):
+                    start = time.perf_counter()
+                    prompt = "Where is the bell?" if i == 0 else f"Is it near the harbor, guess {i}?"
+                    post(f"{base}/sessions/{session_id}/messages", {"prompt": prompt})
+                    latencies.append(time.perf_counter() - start)
+                return latencies
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=clients) as pool:
+                latencies = [s for samples in pool.map(play, sessions) for s in samples]
+            elapsed = time.perf_counter() - start
+            metrics = app_server.metrics_snapshot()
+        finally:
+            http_server.shutdown()
+            http_server.server_close()
+            app_server.close()
+        results.update({**summarize(f"{mode}_request", latencies), f"stub_{mode}_requests_per_s": len(latencies) / elapsed,
+                        f"{mode}_batch_size_p50": metrics["batch_size_p50"], f"{mode}_unlocks": metrics["unlocks"]})
+    return results
+
+CASES: Dict[str, Callable[[Dict, Dict], Dict[str, float]]] = {
+    "cli_cold_start": lambda env, n: bench_cli_cold_start(env, n["repeats"]),
+    "dataset_prepare": lambda env, n: bench_dataset_prepare(env, n["rows"]),
+    "tokenized_dataset": lambda env, n: bench_tokenized_dataset(env, n["rows"]),
+    "output_parsing": lambda env, n: bench_output_parsing(env, n["repeats"]),
+    "training_output": lambda env, n: bench_training_output(env, n["repeats"]),
+    "local_teacher": lambda env, n: bench_local_teacher(env, max(1, n["repeats"] // 5)),
+    "chat_turns": lambda env, n: bench_chat_turns(env, n["turns"]),
+    "speech_output": lambda env, n: bench_speech_output(env, max(1, n["turns"] // 10)),
+    "create_pipeline": lambda env, n: bench_create_pipeline(env, max(1, n["repeats"] // 5)),
+    "adaptive_training": lambda env, n: bench_adaptive_training(env, max(1, n["repeats"] // 5)),
+    "resume": lambda env, n: bench_resume(env, max(1, n["repeats"] // 5)),
+    "serve_load": lambda env, n: bench_serve_load(env, max(16, n["turns"] * 2)),
+}
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=REPO_ROOT).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def compare(baseline: Dict, current: Dict, tolerance: float) -> List[str]:
+    """Prints metric deltas and returns the names of metrics that regressed by more than `tolerance`."""
+    regressions = []
+    print(f"{'metric':<44}{'baseline':>12}{'current':>12}{'change':>10}")
+    for case, metrics in current["results"].items():
+        for name, value in metrics.items():
+            old = baseline.get("results", {}).get(case, {}).get(name)
+            if old is None or not old:
+                continue
+            change = (value - old) / old
+            worse = -change if name.endswith("_per_s") else change if name.endswith("_s") else 0.0
+            flag = "  REGRESSION" if worse > tolerance else ""
+            if flag:
+                regressions.append(f"{case}.{name}")
+            print(f"{case + '.' + name:<44}{old:>12.4g}{value:>12.4g}{change:>+10.1%}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", help=f"Comma-separated cases to run (default: all of {', '.join(CASES)}).")
+    parser.add_argument("--quick", action="store_true", help="Fewer repetitions, for a fast sanity check.")
+    parser.add_argument("--output", type=Path, help="Where to write the results (default: benchmarks/results/<commit>.json).")
+    parser.add_argument("--compare", type=Path, help="A previous results file to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown before --compare fails.")
+    parser.add_argument("--teacher-latency", type=float, default=0.0, help="Seconds the fake teacher waits per request.")
+    args = parser.parse_args()
+
+    selected = args.only.split(",") if args.only else list(CASES)
+    unknown = [name for name in selected if name not in CASES]
+    if unknown:
+        parser.error(f"Unknown case(s): {', '.join(unknown)}.")
+    sizes = {"repeats": 5, "rows": 5_000, "turns": 20} if args.quick else {"repeats": 20, "rows": 50_000, "turns": 100}
+
+    commit = _git_commit()
+    report = {"commit": commit, "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "python": platform.python_version(),
+              "platform": platform.platform(), "sizes": sizes, "results": {}}
+    with tempfile.TemporaryDirectory(prefix="gatekeeper_bench_") as tmp, \
+            stub_environment(Path(tmp), args.teacher_latency) as env:
+        for name in selected:
+            print(f"Running {name}...", file=sys.stderr)
+            report["results"][name] = CASES[name](env, sizes)
+
+    output = args.output or RESULTS_DIR / f"{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    print(f"Wrote {output}", file=sys.stderr)
+
+    if args.compare:
+        regressions = compare(json.loads(args.compare.read_text(encoding="utf-8")), report, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} metric(s) regressed beyond {args.tolerance:.0%}: {', '.join(regressions)}", file=sys.stderr)
+            sys.exit(1)
+    else:
+        print(json.dumps(report["results"], indent=2))
+
+if __name__ == "__main__":
+    main()
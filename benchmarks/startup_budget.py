@@ -0,0 +1,56 @@
+# benchmarks/startup_budget.py
+"""Fails if the gatekeeper CLI starts slower than a budget or eagerly imports a heavy subsystem.
+
+    python -m benchmarks.startup_budget
+    python -m benchmarks.startup_budget --budget 0.4 --repeats 15
+
+Every measurement runs in a fresh interpreter. The import check is exact and machine-independent; the wall
+time budget is a median, so tune `--budget` for slow CI machines. Use `gatekeeper --profile-imports <command>`
+to see which imports are responsible when it fails.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+# Modules that only specific commands need. Importing any of them at startup is a regression.
+LAZY_MODULES = ["openai", "speech_recognition", "dotenv", "numpy", "sqlite3", "multiprocessing",
+                "gatekeeper.teacher", "gatekeeper.tts", "gatekeeper.dataset", "gatekeeper.worker", "gatekeeper.cache"]
+COMMANDS = [["--version"], ["model", "list"]]
+
+
+def eager_imports() -> list:
+    code = f"import sys, json, gatekeeper.cli; print(json.dumps([m for m in {LAZY_MODULES!r} if m in sys.modules]))"
+    return json.loads(subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout)
+
+def median_startup(args: list, repeats: int) -> float:
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-m", "gatekeeper.cli", *args], capture_output=True, check=True)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget", type=float, default=0.5, help="Maximum median wall time per command, in seconds.")
+    parser.add_argument("--repeats", type=int, default=9)
+    args = parser.parse_args()
+
+    failures = []
+    eager = eager_imports()
+    if eager:
+        failures.append(f"`import gatekeeper.cli` eagerly imports: {', '.join(eager)}")
+    for command in COMMANDS:
+        seconds = median_startup(command, args.repeats)
+        print(f"gatekeeper {' '.join(command):<12} {seconds * 1000:7.1f} ms (budget {args.budget * 1000:.0f} ms)")
+        if seconds > args.budget:
+            failures.append(f"`gatekeeper {' '.join(command)}` took {seconds:.3f}s, over the {args.budget:.3f}s budget")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,2 @@
+# benchmarks/stubs/mlx/__init__.py
+"""A stand-in for `mlx`, just enough for gatekeeper to hot-swap the stub trainer's adapters."""
@@ -0,0 +1,11 @@
+# benchmarks/stubs/mlx/core.py
+"""`mlx.core` stand-in: `load` reads the JSON "weights" written by the stub `mlx_lm.lora`."""
+import json
+from pathlib import Path
+
+
+def load(path: str) -> dict:
+    try:
+        return json.loads(Path(path).read_text(encoding="utf-8"))
+    except ValueError:
+        return {}
@@ -0,0 +1,72 @@
+# benchmarks/stubs/mlx_lm/__init__.py
+"""A stand-in for `mlx_lm` so the Gatekeeper pipelines can be benchmarked on machines without Apple silicon.
+
+It mirrors the parts of the mlx_lm API that gatekeeper calls (`load`, `stream_generate`, `generate`, the
+`lora`/`fuse`/`generate` command-line entry points) and answers like `StubBackend`: from `stub_responses.json`
+in the model directory, else with a deterministic sentence. `MLX_STUB_TOKEN_DELAY` (seconds per token) and
+`MLX_STUB_LOAD_DELAY` simulate model cost; both default to 0 so the measurements isolate gatekeeper's overhead.
+"""
+import json
+import os
+import time
+import zlib
+from pathlib import Path
+from typing import Iterator
+
+__version__ = "0.0.0-stub"
+
+DEFAULT_REPLY = "The Gatekeeper ponders your words, weighs them against the secret, and finds them wanting for now."
+
+
+def _delay(name: str) -> float:
+    return float(os.environ.get(name, "0") or 0)
+
+
+class StubModel:
+    def __init__(self, path: str):
+        self.path = path
+        self.responses = {}
+        responses_file = Path(path) / "stub_responses.json"
+        if responses_file.is_file():
+            self.responses = json.loads(responses_file.read_text(encoding="utf-8"))
+
+    def load_weights(self, weights, strict: bool = True):
+        # Stub adapters carry the prompts they have learned (see `lora.py`).
+        self.responses = {**self.responses, **dict(weights).get("stub.responses", {})}
+        return self
+
+
+class StubTokenizer:
+    chat_template = None
+
+    def apply_chat_template(self, messages, add_generation_prompt: bool = True):
+        return messages[-1]["content"]
+
+    def encode(self, text: str):
+        # Roughly one id per word piece of up to four characters, so lengths track text length like a real tokenizer.
+        return [zlib.crc32(word[i:i + 4].encode("utf-8")) % 32000 for word in text.split() for i in range(0, len(word), 4)]
+
+
+class GenerationResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+def load(path_or_hf_repo: str, *args, **kwargs):
+    time.sleep(_delay("MLX_STUB_LOAD_DELAY"))
+    return StubModel(path_or_hf_repo), StubTokenizer()
+
+
+def reply_for(model: StubModel, prompt: str) -> str:
+    return model.responses.get(prompt.strip(), DEFAULT_REPLY)
+
+
+def stream_generate(model, tokenizer, prompt: str, max_tokens: int = 256, **kwargs) -> Iterator[GenerationResponse]:
+    delay = _delay("MLX_STUB_TOKEN_DELAY")
+    for i, word in enumerate(reply_for(model, prompt).split(" ")[:max_tokens]):
+        time.sleep(delay)
+        yield GenerationResponse(word if i == 0 else " " + word)
+
+
+def generate(model, tokenizer, prompt: str, max_tokens: int = 256, verbose: bool = False, **kwargs) -> str:
+    return "".join(r.text for r in stream_generate(model, tokenizer, prompt, max_tokens=max_tokens))
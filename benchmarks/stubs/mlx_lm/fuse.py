@@ -0,0 +1,39 @@
+# benchmarks/stubs/mlx_lm/fuse.py
+"""`mlx_lm.fuse` stand-in: writes a small model directory that the stub `load` can serve."""
+import argparse
+import json
+import shutil
+from pathlib import Path
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", required=True)
+    parser.add_argument("--adapter-path", default="adapters")
+    parser.add_argument("--save-path", default="fused_model")
+    args, _ = parser.parse_known_args()
+    print("Loading pretrained model")
+    save_path = Path(args.save_path)
+    save_path.mkdir(parents=True, exist_ok=True)
+    if Path(args.model).is_dir():
+        for item in Path(args.model).iterdir():
+            if item.is_file():
+                shutil.copy2(item, save_path / item.name)
+    # Bake what the stub adapter learned into the fused model's canned responses.
+    responses_file = save_path / "stub_responses.json"
+    responses = json.loads(responses_file.read_text(encoding="utf-8")) if responses_file.is_file() else {}
+    try:
+        learned = json.loads((Path(args.adapter_path) / "adapters.safetensors").read_text(encoding="utf-8"))
+        responses.update(learned.get("stub.responses", {}))
+    except (OSError, ValueError):
+        pass
+    if responses:
+        responses_file.write_text(json.dumps(responses), encoding="utf-8")
+    (save_path / "model.safetensors").write_bytes(b"\0" * 4096)
+    with open(save_path / "config.json", "w", encoding="utf-8") as f:
+        json.dump({"model_type": "stub", "base_model": args.model}, f)
+    print(f"Fused model saved to {save_path}")
+
+
+if __name__ == "__main__":
+    main()
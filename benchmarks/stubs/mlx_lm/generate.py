@@ -0,0 +1,33 @@
+# benchmarks/stubs/mlx_lm/generate.py
+"""`mlx_lm.generate` stand-in that prints its reply, token by token, in the same layout as the real command."""
+import argparse
+import time
+
+from . import load, stream_generate
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", required=True)
+    parser.add_argument("--prompt", default="")
+    parser.add_argument("--max-tokens", type=int, default=100)
+    parser.add_argument("--temp", type=float, default=0.0)
+    parser.add_argument("--adapter-path")
+    args, _ = parser.parse_known_args()
+    model, tokenizer = load(args.model)
+    start = time.perf_counter()
+    print("==========", flush=True)
+    tokens = 0
+    for response in stream_generate(model, tokenizer, args.prompt, max_tokens=args.max_tokens):
+        print(response.text, end="", flush=True)  # Like the real command, the reply appears as it is generated.
+        tokens += 1
+    elapsed = max(time.perf_counter() - start, 1e-6)
+    print()
+    print("==========")
+    print(f"Prompt: {len(args.prompt.split())} tokens, 1000.000 tokens-per-sec")
+    print(f"Generation: {tokens} tokens, {tokens / elapsed:.3f} tokens-per-sec")
+    print("Peak memory: 0.001 GB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# benchmarks/stubs/mlx_lm/lora.py
+"""`mlx_lm.lora` stand-in: reads the dataset, prints training progress like the real trainer and writes an adapter.
+
+The "weights" it saves are JSON: the prompts the adapter has learned so far, and their completions. The anchor
+rows (those oversampled in train.jsonl) are learned gradually, all of them by `MLX_STUB_CONVERGE_ITERS`
+(default 100), so checkpoint evaluation has something to measure.
+"""
+import argparse
+import json
+import math
+import os
+import time
+from collections import Counter
+from pathlib import Path
+
+
+def _learned_weights(anchors, iteration: int, converge_iters: int) -> bytes:
+    learned = anchors[:math.ceil(len(anchors) * min(1.0, iteration / converge_iters))]
+    return json.dumps({"stub.responses": dict(learned)}).encode("utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", required=True)
+    parser.add_argument("--train", action="store_true")
+    parser.add_argument("--data", required=True)
+    parser.add_argument("--iters", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--adapter-path", default="adapters")
+    parser.add_argument("--steps-per-report", type=int, default=10)
+    parser.add_argument("--steps-per-eval", type=int, default=200)
+    parser.add_argument("--save-every", type=int, default=100)
+    args, _ = parser.parse_known_args()
+    step_delay = float(os.environ.get("MLX_STUB_STEP_DELAY", "0") or 0)
+    converge_iters = int(os.environ.get("MLX_STUB_CONVERGE_ITERS", "100") or 100)
+
+    rows = [json.loads(line) for line in open(Path(args.data) / "train.jsonl", encoding="utf-8") if line.strip()]
+    train_rows = len(rows)
+    seen = Counter((r["prompt"], r["completion"]) for r in rows)
+    anchors = [pair for pair, count in seen.items() if count > 1]
+    adapter_dir = Path(args.adapter_path)
+    adapter_dir.mkdir(parents=True, exist_ok=True)
+    with open(adapter_dir / "adapter_config.json", "w", encoding="utf-8") as f:
+        json.dump({"model": args.model, "num_layers": 16, "fine_tune_type": "lora", "train_rows": train_rows,
+                   "lora_parameters": {"rank": 8, "scale": 20.0, "dropout": 0.0}}, f)
+    print("Loading pretrained model")
+    print("Loading datasets")
+    print(f"Training\nTrainable parameters: 0.082% (3.146M/3821.080M)\nStarting training..., iters: {args.iters}")
+    print(f"Iter 1: Val loss 3.412, Val took 0.050s", flush=True)
+    for it in range(1, args.iters + 1):
+        time.sleep(step_delay)
+        if it % args.steps_per_report == 0:
+            loss = 3.0 / (1 + it / 50)
+            print(f"Iter {it}: Train loss {loss:.3f}, Learning Rate 1.000e-05, It/sec 4.000, Tokens/sec 500.000, "
+                  f"Trained Tokens {it * args.batch_size * 40}, Peak mem 1.000 GB", flush=True)
+        if it % args.steps_per_eval == 0 or it == args.iters:
+            print(f"Iter {it}: Val loss {2.5 / (1 + it / 50):.3f}, Val took 0.050s", flush=True)
+        if it % args.save_every == 0:
+            weights = _learned_weights(anchors, it, converge_iters)
+            checkpoint = adapter_dir / f"{it:07d}_adapters.safetensors"
+            (adapter_dir / "adapters.safetensors").write_bytes(weights)
+            checkpoint.write_bytes(weights)
+            print(f"Iter {it}: Saved adapter weights to {adapter_dir / 'adapters.safetensors'} and {checkpoint}.", flush=True)
+    (adapter_dir / "adapters.safetensors").write_bytes(_learned_weights(anchors, args.iters, converge_iters))
+    print(f"Saved final weights to {adapter_dir / 'adapters.safetensors'}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+# benchmarks/stubs/mlx_lm/sample_utils.py
+def make_sampler(temp: float = 0.0, **kwargs):
+    return lambda logits: logits
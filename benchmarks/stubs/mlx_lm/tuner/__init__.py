@@ -0,0 +1 @@
+# benchmarks/stubs/mlx_lm/tuner/__init__.py
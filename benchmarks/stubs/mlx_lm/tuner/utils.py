@@ -0,0 +1,9 @@
+# benchmarks/stubs/mlx_lm/tuner/utils.py
+"""`mlx_lm.tuner.utils` stand-in."""
+from pathlib import Path
+
+import mlx.core as mx
+
+
+def load_adapters(model, adapter_path: str):
+    return model.load_weights(list(mx.load(str(Path(adapter_path) / "adapters.safetensors")).items()), strict=False)
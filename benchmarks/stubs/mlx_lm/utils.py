@@ -0,0 +1,13 @@
+# benchmarks/stubs/mlx_lm/utils.py
+"""The `mlx_lm.utils` helpers gatekeeper uses to load a tokenizer without its model."""
+from pathlib import Path
+
+from . import StubTokenizer
+
+
+def get_model_path(path_or_hf_repo: str) -> Path:
+    return Path(path_or_hf_repo)
+
+
+def load_tokenizer(model_path: Path, tokenizer_config_extra=None) -> StubTokenizer:
+    return StubTokenizer()
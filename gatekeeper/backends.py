@@ -0,0 +1,503 @@
+# gatekeeper/backends.py
+import codecs
+import json
+import queue
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional, Tuple, Type
+
+from . import trace
+
+
+def _lora_args(model: str, data_dir: Path, adapter_path: Path, iters: int, batch_size: int,
+               save_every: Optional[int]) -> List[str]:
+    """The `mlx_lm.lora` flags gatekeeper trains with; every training command accepts them."""
+    args = ["--model", model, "--train", "--data", str(data_dir), "--iters", str(iters),
+            "--batch-size", str(batch_size), "--adapter-path", str(adapter_path)]
+    if save_every:
+        args += ["--save-every", str(save_every), "--steps-per-eval", str(save_every)]
+    return args
+
+def _chat_tokens(tokenizer, messages: List[Dict[str, str]]) -> List[int]:
+    """Token ids of a conversation, rendered through the model's chat template and ready for the next reply."""
+    if getattr(tokenizer, "chat_template", None):
+        return list(tokenizer.apply_chat_template(messages, add_generation_prompt=True))
+    text = "".join(f"{m['role']}: {m['content']}\n" for m in messages) + "assistant:"
+    return list(tokenizer.encode(text))
+
+def _fit_context(tokenizer, messages: List[Dict[str, str]], budget: int) -> Tuple[List[int], int]:
+    """Renders a conversation, dropping its oldest exchanges if it is longer than `budget` tokens (0: no limit).
+
+    Returns the tokens and how many messages were dropped. Once over budget, the conversation is cut to half of it,
+    so the kept prefix (and the KV cache built on it) stays valid for the next several turns.
+    """
+    tokens = _chat_tokens(tokenizer, messages)
+    if budget <= 0 or len(tokens) <= budget:
+        return tokens, 0
+    dropped = 0
+    while len(messages) - dropped > 1 and len(tokens) > budget // 2:
+        dropped = min(dropped + 2, len(messages) - 1)  # A user message and its reply.
+        tokens = _chat_tokens(tokenizer, messages[dropped:])
+    return tokens, dropped
+
+def _prompt_budget(context_tokens: int, max_tokens: int) -> int:
+    """The prompt's share of a `context_tokens` window once `max_tokens` are kept for the reply.
+
+    Only `context_tokens=0` means no limit; a window no larger than the reply still keeps trimming to the latest message.
+    """
+    return max(1, context_tokens - max_tokens) if context_tokens else 0
+
+def _common_prefix(a: List[int], b: List[int]) -> int:
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+
+class Backend:
+    """Base class for backends. Subclasses load a model once and answer many prompts.
+
+    Backends that can fine-tune also build the commands that train a LoRA adapter and fuse it into the base
+    model. Those run as child processes whose output `core.run_command` parses in `mlx_lm.lora`'s format.
+    """
+    name = "base"
+    _loaded_path: Optional[str] = None
+    # Set by `stream_chat`: new prompt tokens processed, tokens reused from the KV cache, messages dropped.
+    last_turn: Dict[str, Any] = {}
+
+    def load(self, model_path: str):
+        raise NotImplementedError
+
+    def set_adapter(self, adapter_path: str):
+        """Applies an adapter-only Gatekeeper's LoRA weights on top of the loaded base model."""
+        raise NotImplementedError(f"The '{self.name}' backend does not support adapter-only Gatekeepers.")
+
+    def stream(self, prompt: str, max_tokens: int = 150, temp: float = 0.2) -> Iterator[str]:
+        """Yields the response piece by piece as it is generated."""
+        raise NotImplementedError
+
+    def generate(self, prompt: str, max_tokens: int = 150, temp: float = 0.2) -> str:
+        return "".join(self.stream(prompt, max_tokens=max_tokens, temp=temp)).strip()
+
+    def stream_batch(self, prompts: List[str], max_tokens: int = 150, temp: float = 0.2) -> Iterator[Tuple[int, str]]:
+        """Generates several prompts in lock-step, yielding `(index, piece)`.
+
+        Each step advances every unfinished prompt by one piece, so no request waits for another to finish.
+        This interleaves, it does not share work: the total cost is that of generating the prompts one by one.
+        Backends that can decode several prompts at once (the CPU thread pool) override it.
+        """
+        streams = {i: self.stream(prompt, max_tokens=max_tokens, temp=temp) for i, prompt in enumerate(prompts)}
+        while streams:
+            for i in list(streams):
+                try:
+                    yield i, next(streams[i])
+                except StopIteration:
+                    del streams[i]
+
+    def stream_chat(self, messages: List[Dict[str, str]], max_tokens: int = 150, temp: float = 0.2,
+                    context_tokens: int = 0) -> Iterator[str]:
+        """Yields the reply to a conversation (`[{"role", "content"}, ...]` ending with the user's message).
+
+        The conversation must fit in `context_tokens` together with the reply; older exchanges are dropped and
+        reported in `last_turn["dropped_messages"]`. Backends with a prompt KV cache override this so a turn only
+        processes the tokens it adds. This fallback has no memory and answers the latest message alone.
+        """
+        self.last_turn = {"prompt_tokens": 0, "reused_tokens": 0, "dropped_messages": 0}
+        yield from self.stream(messages[-1]["content"], max_tokens=max_tokens, temp=temp)
+
+    def stream_once(self, model_path: str, prompt: str, max_tokens: int = 150, temp: Optional[float] = None) -> Iterator[str]:
+        """One-off generation without a resident worker, as local teacher calls use. `temp=None` means greedy.
+
+        The model stays loaded on this instance, so later calls with the same model skip the load.
+        """
+        if self._loaded_path != model_path:
+            self.load(model_path)
+            self._loaded_path = model_path
+        yield from self.stream(prompt, max_tokens=max_tokens, temp=0.0 if temp is None else temp)
+
+    def train_command(self, model: str, data_dir: Path, adapter_path: Path, iters: int, batch_size: int,
+                      save_every: Optional[int] = None) -> List[str]:
+        """The command that trains a LoRA adapter, saving a checkpoint every `save_every` iterations when given."""
+        raise NotImplementedError(f"The '{self.name}' backend cannot train adapters.")
+
+    def fuse_command(self, model: str, adapter_path: Path, save_path: Path) -> List[str]:
+        """The command that writes a copy of the base model with the adapter merged in."""
+        raise NotImplementedError(f"The '{self.name}' backend cannot fuse adapters.")
+
+
+_GENERATE_RULE = "=========="
+
+
+class MLXBackend(Backend):
+    """Runs generation in-process with mlx_lm, mirroring what `mlx_lm.generate` does on the command line.
+
+    One-off generation, training and fusing run the `mlx_lm.generate`, `mlx_lm.lora` and `mlx_lm.fuse` commands.
+    """
+    name = "mlx"
+
+    def __init__(self, adapter_cache_size: int = 8):
+        self.model = None
+        self.tokenizer = None
+        self.adapter_cache_size = adapter_cache_size
+        self._adapter_weights: "OrderedDict[str, dict]" = OrderedDict()
+        self._adapter_config = None
+        self._active_adapter = None
+        self._reset_chat()
+
+    def load(self, model_path: str):
+        from mlx_lm import load
+        self.model, self.tokenizer = load(model_path)
+        self._reset_chat()
+
+    def _reset_chat(self):
+        self._prompt_cache = None
+        self._cached_tokens: List[int] = []
+
+    def _load_adapter_weights(self, adapter_path: str) -> dict:
+        """Returns an adapter's weights from the LRU, reading them from disk on a miss."""
+        if adapter_path in self._adapter_weights:
+            self._adapter_weights.move_to_end(adapter_path)
+            return self._adapter_weights[adapter_path]
+        import mlx.core as mx
+        weights = mx.load(str(Path(adapter_path) / "adapters.safetensors"))
+        self._adapter_weights[adapter_path] = weights
+        while len(self._adapter_weights) > self.adapter_cache_size:
+            self._adapter_weights.popitem(last=False)
+        return weights
+
+    def set_adapter(self, adapter_path: str):
+        adapter_path = str(Path(adapter_path).resolve())
+        if adapter_path == self._active_adapter:
+            return
+        with open(Path(adapter_path) / "adapter_config.json", "r", encoding="utf-8") as f:
+            adapter_config = json.load(f)
+        if self._adapter_config is None:
+            # The first adapter converts the base model's layers to LoRA layers; later ones only swap weights.
+            try:
+                from mlx_lm.tuner.utils import load_adapters
+            except ImportError:
+                from mlx_lm.utils import load_adapters
+            self.model = load_adapters(self.model, adapter_path)
+            self._adapter_config = {k: v for k, v in adapter_config.items() if k in ("num_layers", "lora_layers", "lora_parameters", "fine_tune_type")}
+            self._load_adapter_weights(adapter_path)
+        else:
+            layout = {k: v for k, v in adapter_config.items() if k in self._adapter_config}
+            if layout != self._adapter_config:
+                raise ValueError("This adapter was trained with a different LoRA layout and cannot be hot-swapped.")
+            self.model.load_weights(list(self._load_adapter_weights(adapter_path).items()), strict=False)
+        self._active_adapter = adapter_path
+        self._reset_chat()  # Cached keys and values were computed with the previous weights.
+
+    def _build_prompt(self, prompt: str):
+        # Same behaviour as the CLI: use the model's native chat template when it has one.
+        if getattr(self.tokenizer, "chat_template", None):
+            messages = [{"role": "user", "content": prompt}]
+            return self.tokenizer.apply_chat_template(messages, add_generation_prompt=True)
+        return prompt
+
+    def _sampling_kwargs(self, temp: float) -> Dict[str, Any]:
+        try:
+            from mlx_lm.sample_utils import make_sampler
+            return {"sampler": make_sampler(temp=temp)}
+        except ImportError:  # Older mlx_lm releases take the temperature directly.
+            return {"temp": temp}
+
+    def stream(self, prompt: str, max_tokens: int = 150, temp: float = 0.2) -> Iterator[str]:
+        from mlx_lm import stream_generate
+        for response in stream_generate(self.model, self.tokenizer, prompt=self._build_prompt(prompt),
+                                        max_tokens=max_tokens, **self._sampling_kwargs(temp)):
+            # Newer mlx_lm yields GenerationResponse objects, older releases yield plain text segments.
+            yield getattr(response, "text", response)
+
+    def stream_chat(self, messages: List[Dict[str, str]], max_tokens: int = 150, temp: float = 0.2,
+                    context_tokens: int = 0) -> Iterator[str]:
+        from mlx_lm import stream_generate
+        tokens, dropped = _fit_context(self.tokenizer, messages, _prompt_budget(context_tokens, max_tokens))
+        try:
+            from mlx_lm.models.cache import can_trim_prompt_cache, make_prompt_cache, trim_prompt_cache
+        except ImportError:  # Releases without prompt caches re-encode the whole conversation every turn.
+            self.last_turn = {"prompt_tokens": len(tokens), "reused_tokens": 0, "dropped_messages": dropped}
+            for response in stream_generate(self.model, self.tokenizer, prompt=tokens, max_tokens=max_tokens,
+                                            **self._sampling_kwargs(temp)):
+                yield getattr(response, "text", response)
+            return
+        # Reuse the cache up to where this conversation diverges from what it holds. At least one token is
+        # always processed, since its logits start the reply.
+        reused = min(_common_prefix(self._cached_tokens, tokens), len(tokens) - 1)
+        trim = len(self._cached_tokens) - reused
+        if self._prompt_cache is None or reused <= 0 or (trim and not can_trim_prompt_cache(self._prompt_cache)):
+            self._prompt_cache, reused = make_prompt_cache(self.model), 0
+        elif trim:
+            trim_prompt_cache(self._prompt_cache, trim)
+        self.last_turn = {"prompt_tokens": len(tokens) - reused, "reused_tokens": reused, "dropped_messages": dropped}
+        self._cached_tokens, generated = [], []  # An interrupted turn leaves the cache unusable.
+        for response in stream_generate(self.model, self.tokenizer, prompt=tokens[reused:], max_tokens=max_tokens,
+                                        prompt_cache=self._prompt_cache, **self._sampling_kwargs(temp)):
+            if not generated and getattr(response, "prompt_tps", 0):
+                self.last_turn["prefill_s"] = (len(tokens) - reused) / response.prompt_tps
+            generated.append(response.token)
+            yield response.text
+        # The cache holds the prompt and the reply, except perhaps the last token sampled.
+        self._cached_tokens = (tokens + generated)[:self._prompt_cache[0].offset]
+
+    def stream_once(self, model_path: str, prompt: str, max_tokens: int = 150, temp: Optional[float] = None) -> Iterator[str]:
+        """Yields `mlx_lm.generate`'s reply as it is printed. Closing the generator early stops the generation."""
+        command = ["mlx_lm.generate", "--model", model_path, "--prompt", prompt, "--max-tokens", str(max_tokens)]
+        if temp is not None:
+            command += ["--temp", str(temp)]
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        end_marker = "\n" + _GENERATE_RULE
+        buffer, started = "", False
+        try:
+            while True:
+                data = process.stdout.read1(4096)
+                buffer += decoder.decode(data, final=not data)
+                if not started:
+                    rule = buffer.find(_GENERATE_RULE + "\n")
+                    if rule >= 0:
+                        buffer, started = buffer[rule + len(_GENERATE_RULE) + 1:], True
+                if started:
+                    end = buffer.find(end_marker)
+                    if end >= 0:
+                        yield buffer[:end]
+                        return
+                    # Hold back a possible partial end marker.
+                    safe = max(0, len(buffer) - len(end_marker) + 1)
+                    if safe:
+                        yield buffer[:safe]
+                        buffer = buffer[safe:]
+                if not data:
+                    break
+            if trace.wait_child(process, "mlx_lm.generate") != 0:
+                raise subprocess.CalledProcessError(process.returncode, command, stderr=process.stderr.read())
+            if buffer.strip():
+                yield buffer  # Output without rules, as `core.parse_generate_output` falls back to.
+        finally:
+            if process.poll() is None:
+                process.terminate()
+                process.wait()
+            process.stdout.close()
+            process.stderr.close()
+
+    def train_command(self, model: str, data_dir: Path, adapter_path: Path, iters: int, batch_size: int,
+                      save_every: Optional[int] = None) -> List[str]:
+        return ["mlx_lm.lora", *_lora_args(model, data_dir, adapter_path, iters, batch_size, save_every)]
+
+    def fuse_command(self, model: str, adapter_path: Path, save_path: Path) -> List[str]:
+        return ["mlx_lm.fuse", "--model", model, "--adapter-path", str(adapter_path), "--save-path", str(save_path)]
+
+
+class CPUBackend(Backend):
+    """Runs small Hugging Face models in-process on the CPU with PyTorch, for hosts without Apple silicon.
+
+    Generation runs on a thread pool: PyTorch releases the GIL inside its kernels, so `stream_batch` decodes up to
+    `parallel` prompts at once, each on `threads` intra-op threads (0 leaves PyTorch's default). Training and
+    fusing run `gatekeeper.cpu_lora`, which prints progress the way `mlx_lm.lora` does.
+    """
+    name = "cpu"
+
+    def __init__(self, threads: int = 0, parallel: int = 4):
+        self.threads = threads
+        self.parallel = max(1, parallel)
+        self.model = None
+        self.tokenizer = None
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._adapter_config = None
+        self._active_adapter = None
+        self._reset_chat()
+
+    def _reset_chat(self):
+        self._kv_cache = None
+        self._cached_tokens: List[int] = []
+
+    def load(self, model_path: str):
+        import torch
+        from .cpu_lora import load_model
+        if self.threads:
+            torch.set_num_threads(self.threads)
+        self.model, self.tokenizer = load_model(model_path)
+        self.model.eval()
+        self._adapter_config, self._active_adapter = None, None
+        self._reset_chat()
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.parallel, thread_name_prefix="gatekeeper-cpu")
+
+    def set_adapter(self, adapter_path: str):
+        from . import cpu_lora
+        adapter_path = str(Path(adapter_path).resolve())
+        if adapter_path == self._active_adapter:
+            return
+        with open(Path(adapter_path) / cpu_lora.ADAPTER_CONFIG, "r", encoding="utf-8") as f:
+            adapter_config = json.load(f)
+        if adapter_config.get("backend") != self.name:
+            raise ValueError("This adapter was not trained by the CPU backend; use the backend that trained it.")
+        layout = {k: v for k, v in adapter_config.items() if k in ("num_layers", "keys", "lora_parameters")}
+        if self._adapter_config is None:
+            cpu_lora.apply_lora(self.model, adapter_config)
+            self._adapter_config = layout
+        elif layout != self._adapter_config:
+            raise ValueError("This adapter was trained with a different LoRA layout and cannot be hot-swapped.")
+        cpu_lora.load_adapter(self.model, Path(adapter_path))
+        self._active_adapter = adapter_path
+        self._reset_chat()  # Cached keys and values were computed with the previous weights.
+
+    def _encode(self, prompt: str) -> List[int]:
+        # Same behaviour as the MLX backend: use the model's native chat template when it has one.
+        if getattr(self.tokenizer, "chat_template", None):
+            return _chat_tokens(self.tokenizer, [{"role": "user", "content": prompt}])
+        return list(self.tokenizer.encode(prompt))
+
+    def _generate(self, index: int, tokens: List[int], max_tokens: int, temp: float, out: "queue.Queue",
+                  stop: threading.Event, cache=None):
+        """Pool task: generates one reply, putting `(index, piece)` on `out` and `(index, None)` when done.
+
+        Returns the prompt and reply token ids. Generation ends early once `stop` is set, which the streaming
+        generators do when their consumer closes them. With `cache`, a transformers KV cache holding a prefix
+        of `tokens`, only the rest of the prompt is processed.
+        """
+        import torch
+        from transformers import StoppingCriteria, StoppingCriteriaList, TextStreamer
+
+        class QueueStreamer(TextStreamer):
+            def on_finalized_text(self, text: str, stream_end: bool = False):
+                if text:
+                    out.put((index, text))
+
+        class StopWhenSet(StoppingCriteria):
+            def __call__(self, input_ids, scores, **kwargs):
+                return torch.full((input_ids.shape[0],), stop.is_set(), dtype=torch.bool)
+
+        try:
+            sampling = {"do_sample": True, "temperature": temp} if temp > 0 else {"do_sample": False}
+            input_ids = torch.tensor([tokens], dtype=torch.long)
+            with torch.inference_mode():
+                output = self.model.generate(
+                    input_ids, attention_mask=torch.ones_like(input_ids), max_new_tokens=max_tokens,
+                    past_key_values=cache, streamer=QueueStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True),
+                    stopping_criteria=StoppingCriteriaList([StopWhenSet()]),
+                    pad_token_id=self.tokenizer.pad_token_id or self.tokenizer.eos_token_id, **sampling)
+            out.put((index, None))
+            return output[0].tolist()
+        except Exception as e:
+            out.put((index, e))
+            raise
+
+    def _drain(self, out: "queue.Queue", count: int) -> Iterator[Tuple[int, str]]:
+        """Yields `(index, piece)` from `count` running `_generate` tasks until all of them finish."""
+        while count:
+            index, piece = out.get()
+            if piece is None:
+                count -= 1
+            elif isinstance(piece, Exception):
+                raise piece
+            else:
+                yield index, piece
+
+    def stream_batch(self, prompts: List[str], max_tokens: int = 150, temp: float = 0.2) -> Iterator[Tuple[int, str]]:
+        out: "queue.Queue" = queue.Queue()
+        stop = threading.Event()
+        for i, prompt in enumerate(prompts):
+            self._pool.submit(self._generate, i, self._encode(prompt), max_tokens, temp, out, stop)
+        try:
+            yield from self._drain(out, len(prompts))
+        finally:
+            stop.set()  # A closed stream (e.g. a local teacher call aborted on bad JSON) frees the pool at once.
+
+    def stream_chat(self, messages: List[Dict[str, str]], max_tokens: int = 150, temp: float = 0.2,
+                    context_tokens: int = 0) -> Iterator[str]:
+        from transformers import DynamicCache
+        tokens, dropped = _fit_context(self.tokenizer, messages, _prompt_budget(context_tokens, max_tokens))
+        # Reuse the cache up to where this conversation diverges from what it holds (see MLXBackend.stream_chat).
+        reused = min(_common_prefix(self._cached_tokens, tokens), len(tokens) - 1)
+        if self._kv_cache is None or reused <= 0:
+            self._kv_cache, reused = DynamicCache(), 0
+        elif reused < self._kv_cache.get_seq_length():
+            self._kv_cache.crop(reused)
+        self.last_turn = {"prompt_tokens": len(tokens) - reused, "reused_tokens": reused, "dropped_messages": dropped}
+        self._cached_tokens = []  # An interrupted turn leaves the cache unusable.
+        out: "queue.Queue" = queue.Queue()
+        stop = threading.Event()
+        future = self._pool.submit(self._generate, 0, tokens, max_tokens, temp, out, stop, self._kv_cache)
+        try:
+            for _, piece in self._drain(out, 1):
+                yield piece
+        finally:
+            stop.set()
+        self._cached_tokens = future.result()[:self._kv_cache.get_seq_length()]
+
+    def stream(self, prompt: str, max_tokens: int = 150, temp: float = 0.2) -> Iterator[str]:
+        for _, piece in self.stream_batch([prompt], max_tokens=max_tokens, temp=temp):
+            yield piece
+
+    def train_command(self, model: str, data_dir: Path, adapter_path: Path, iters: int, batch_size: int,
+                      save_every: Optional[int] = None) -> List[str]:
+        return [sys.executable, "-m", "gatekeeper.cpu_lora", "train",
+                *_lora_args(model, data_dir, adapter_path, iters, batch_size, save_every)]
+
+    def fuse_command(self, model: str, adapter_path: Path, save_path: Path) -> List[str]:
+        return [sys.executable, "-m", "gatekeeper.cpu_lora", "fuse", "--model", model,
+                "--adapter-path", str(adapter_path), "--save-path", str(save_path)]
+
+
+class StubBackend(Backend):
+    """A dependency-free backend for tests. Answers from `stub_responses.json` in the model dir, else echoes."""
+    name = "stub"
+
+    def __init__(self, load_delay: float = 0.0, token_delay: float = 0.0):
+        self.load_delay = load_delay
+        self.token_delay = token_delay
+        self.responses: Dict[str, str] = {}
+
+    def load(self, model_path: str):
+        time.sleep(self.load_delay)
+        self._read_responses(Path(model_path))
+
+    def _read_responses(self, directory: Path):
+        responses_file = directory / "stub_responses.json"
+        if responses_file.is_file():
+            with open(responses_file, "r", encoding="utf-8") as f:
+                self.responses = json.load(f)
+
+    def set_adapter(self, adapter_path: str):
+        # An adapter-only Gatekeeper keeps its canned responses next to its adapters folder.
+        self.responses = {}
+        self._read_responses(Path(adapter_path).parent)
+
+    def _words(self, prompt: str, max_tokens: int) -> List[str]:
+        text = self.responses.get(prompt.strip(), f"The Gatekeeper considers '{prompt.strip()}' in silence.")
+        return [word if i == 0 else " " + word for i, word in enumerate(text.split(" ")[:max_tokens])]
+
+    def stream(self, prompt: str, max_tokens: int = 150, temp: float = 0.2) -> Iterator[str]:
+        for word in self._words(prompt, max_tokens):
+            time.sleep(self.token_delay)
+            yield word
+
+    def stream_batch(self, prompts: List[str], max_tokens: int = 150, temp: float = 0.2) -> Iterator[Tuple[int, str]]:
+        # Like a batched forward pass: one step's delay produces the next word of every prompt.
+        words = [self._words(prompt, max_tokens) for prompt in prompts]
+        for step in range(max((len(w) for w in words), default=0)):
+            time.sleep(self.token_delay)
+            for i, sequence in enumerate(words):
+                if step < len(sequence):
+                    yield i, sequence[step]
+
+
+BACKENDS: Dict[str, Type[Backend]] = {
+    MLXBackend.name: MLXBackend,
+    CPUBackend.name: CPUBackend,
+    StubBackend.name: StubBackend,
+}
+
+def get_backend(name: str, options: Optional[Dict[str, Any]] = None) -> Backend:
+    """Instantiates a registered backend by name."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend '{name}'. Available: {', '.join(sorted(BACKENDS))}.")
+    return BACKENDS[name](**(options or {}))
@@ -0,0 +1,196 @@
+# gatekeeper/cache.py
+import base64
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+
+class DiskCache:
+    """A size-bounded SQLite key/value store. Entries are evicted least-recently-used first and expire after `ttl_seconds`."""
+
+    def __init__(self, path: Path, max_bytes: int, ttl_seconds: Optional[float] = None):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, tag TEXT, version TEXT, value TEXT, size INTEGER, accessed REAL)"
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(entries)")}
+        if "created" not in columns:
+            self._db.execute("ALTER TABLE entries ADD COLUMN created REAL DEFAULT 0")
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        self._db.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if self.ttl_seconds is not None and time.time() - row[1] > self.ttl_seconds:
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+            self._db.execute("UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            return row[0]
+
+    def set(self, key: str, value: str, tag: str = "", version: str = ""):
+        size = len(value.encode("utf-8")) + len(key)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, tag, version, value, size, accessed, created) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, tag, version, value, size, now, now),
+            )
+            self._evict()
+            self._db.commit()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._db.commit()
+
+    def clear(self) -> int:
+        with self._lock:
+            cursor = self._db.execute("DELETE FROM entries")
+            self._db.commit()
+            return cursor.rowcount
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            return {"entries": entries, "bytes": size}
+
+    def purge_stale(self, tag: str, version: str) -> int:
+        """Deletes every entry for `tag` that was written under a different version. Returns the count."""
+        with self._lock:
+            cursor = self._db.execute("DELETE FROM entries WHERE tag = ? AND version != ?", (tag, version))
+            self._db.commit()
+            return cursor.rowcount
+
+    def _evict(self):
+        if self.ttl_seconds is not None:
+            self._db.execute("DELETE FROM entries WHERE created < ?", (time.time() - self.ttl_seconds,))
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        while total > self.max_bytes:
+            row = self._db.execute("SELECT key, size FROM entries ORDER BY accessed ASC LIMIT 1").fetchone()
+            if row is None:
+                break
+            self._db.execute("DELETE FROM entries WHERE key = ?", (row[0],))
+            total -= row[1]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def seal(data: bytes, material: bytes, domain: bytes) -> bytes:
+    """XORs `data` with a keystream derived from `material`. Sealing twice with the same material unseals."""
+    if not data: return data
+    seed = hashlib.sha256(domain + material).digest()
+    keystream = b"".join(hashlib.sha256(seed + i.to_bytes(8, "big")).digest() for i in range((len(data) + 31) // 32))
+    return (int.from_bytes(data, "big") ^ int.from_bytes(keystream[:len(data)], "big")).to_bytes(len(data), "big")
+
+def normalize_prompt(prompt: str) -> str:
+    """Normalizes unicode and whitespace only.
+
+    Case and punctuation are kept on purpose: the fine-tuned model is sensitive to both, and folding them
+    could serve a cached hint for the exact secret question and rob the player of the win.
+    """
+    return " ".join(unicodedata.normalize("NFC", prompt).split())
+
+def model_fingerprint(model_path: Path) -> str:
+    """Hashes the model's answer_hash and the name, size and mtime of every file in its directory."""
+    model_path = Path(model_path).resolve()
+    digest = hashlib.sha256(str(model_path).encode("utf-8"))
+    meta_file = model_path / "gatekeeper_meta.json"
+    if meta_file.is_file():
+        with open(meta_file, "r", encoding="utf-8") as f:
+            digest.update(str(json.load(f).get("answer_hash")).encode("utf-8"))
+    for file in sorted(p for p in model_path.rglob("*") if p.is_file()):
+        stat = file.stat()
+        digest.update(f"{file.relative_to(model_path)}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+_RESPONSE_SEAL_DOMAIN = b"gatekeeper-response-seal:"
+
+
+class ResponseCache:
+    """An in-memory LRU of Gatekeeper replies with an optional persistent DiskCache tier behind it.
+
+    Disk values are sealed with the prompt they answer, and the winning reply (the plaintext answer, which
+    hashes to the model's `answer_hash`) is never written to disk at all.
+    """
+
+    def __init__(self, model_path: Path, max_entries: int = 256, disk: Optional[DiskCache] = None):
+        self.model_path = str(Path(model_path).resolve())
+        self.fingerprint = model_fingerprint(Path(model_path))
+        # Entries written before disk values were sealed carry the bare fingerprint and are purged below.
+        self.version = f"sealed:{self.fingerprint}"
+        meta_file = Path(model_path) / "gatekeeper_meta.json"
+        self.answer_hash = None
+        if meta_file.is_file():
+            with open(meta_file, "r", encoding="utf-8") as f:
+                self.answer_hash = json.load(f).get("answer_hash")
+        self.max_entries = max_entries
+        self.disk = disk
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self.hits = {"memory": 0, "disk": 0}
+        self.misses = 0
+        self.last_hit_tier: Optional[str] = None
+        if self.disk is not None:
+            # A re-forged or edited model changes the fingerprint, so its old replies are dropped here.
+            self.disk.purge_stale(self.model_path, self.version)
+
+    def _material(self, prompt: str, params: Dict[str, Any]) -> bytes:
+        return json.dumps([self.fingerprint, normalize_prompt(prompt), params], sort_keys=True).encode("utf-8")
+
+    def get(self, prompt: str, params: Dict[str, Any]) -> Optional[str]:
+        """Returns the cached reply, or None. The tier that answered is recorded in `last_hit_tier`."""
+        material = self._material(prompt, params)
+        key = hashlib.sha256(material).hexdigest()
+        self.last_hit_tier = None
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self.hits["memory"] += 1
+            self.last_hit_tier = "memory"
+            return self._memory[key]
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                value = seal(base64.b64decode(value), material, _RESPONSE_SEAL_DOMAIN).decode("utf-8")
+                self._remember(key, value)
+                self.hits["disk"] += 1
+                self.last_hit_tier = "disk"
+                return value
+        self.misses += 1
+        return None
+
+    def put(self, prompt: str, params: Dict[str, Any], response: str):
+        material = self._material(prompt, params)
+        key = hashlib.sha256(material).hexdigest()
+        self._remember(key, response)
+        if self.disk is None or hashlib.sha256(response.strip().encode("utf-8")).hexdigest() == self.answer_hash:
+            return
+        sealed = base64.b64encode(seal(response.encode("utf-8"), material, _RESPONSE_SEAL_DOMAIN)).decode("ascii")
+        self.disk.set(key, sealed, tag=self.model_path, version=self.version)
+
+    def _remember(self, key: str, value: str):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {"memory_hits": self.hits["memory"], "disk_hits": self.hits["disk"], "misses": self.misses}
@@ -2,16 +2,29 @@
 import typer
 from rich.console import Console
 from rich.panel import Panel
+from rich.table import Table
 import importlib.metadata
-from typing import Optional, List, Dict
+from typing import TYPE_CHECKING, Any, Iterator, Optional, List, Dict
+from contextlib import contextmanager
 from pathlib import Path
+import subprocess
 import sys
 import hashlib
 import json
-import random
 import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-from . import config, core, teacher, tts
+from . import config, trace
+
+# The heavier subsystems (teacher/openai, tts/speech_recognition, dataset/numpy, the model worker) are imported
+# inside the commands that use them, so `gatekeeper --version` or `gatekeeper model list` start quickly.
+if TYPE_CHECKING:
+    from . import stages, tts, worker
+
+CHAT_PARAMS = {"max_tokens": 150, "temp": 0.2}
+METRICS_FILE = "training_metrics.jsonl"
 
 app = typer.Typer(
     name="gatekeeper",
@@ -29,12 +42,40 @@ def version_callback(value: bool):
         console.print(f"Gatekeeper LLM Version: [bold green]{version}[/bold green]")
         raise typer.Exit()
 
+def _profile_imports(argv: List[str], top: int = 20):
+    """Re-runs the command under `python -X importtime` and reports its slowest imports."""
+    process = subprocess.run([sys.executable, "-X", "importtime", "-m", "gatekeeper.cli", *argv], stderr=subprocess.PIPE, text=True)
+    rows = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:"):
+            print(line, file=sys.stderr)
+            continue
+        fields = line[len("import time:"):].split("|")
+        if fields[0].strip().isdigit():  # Skips the column header.
+            rows.append((fields[2].rstrip(), int(fields[0]), int(fields[1])))
+    table = Table(title=f"Slowest imports for `gatekeeper {' '.join(argv)}`", caption=f"Total import time: {sum(r[1] for r in rows) / 1000:.1f} ms")
+    table.add_column("Module")
+    table.add_column("Self (ms)", justify="right")
+    table.add_column("Cumulative (ms)", justify="right")
+    for name, self_us, cumulative_us in sorted(rows, key=lambda r: r[2], reverse=True)[:top]:
+        table.add_row(name, f"{self_us / 1000:.1f}", f"{cumulative_us / 1000:.1f}")
+    Console(stderr=True).print(table)
+    return process.returncode
+
+def profile_imports_callback(value: bool):
+    if value:
+        raise typer.Exit(_profile_imports([arg for arg in sys.argv[1:] if arg != "--profile-imports"]))
+
 @app.callback()
 def main_callback(
     version: Optional[bool] = typer.Option(
         None, "--version", "-v", help="Show the application's version and exit.",
         callback=version_callback, is_eager=True,
-    )
+    ),
+    profile_imports: bool = typer.Option(
+        False, "--profile-imports", hidden=True, callback=profile_imports_callback, is_eager=True,
+        help="Run the command under `python -X importtime` and print its slowest imports.",
+    ),
 ):
     """Gatekeeper LLM: Forge a model to guard your secrets."""
     pass
@@ -53,26 +94,199 @@ def set_model(model_name: str = typer.Argument(..., help="The Hugging Face repo
     config.save_config(conf)
     console.print(f"✅ Default base model set to [cyan]{model_name}[/cyan].")
 
-def _inject_anchor_and_save(train_data: list, valid_data: list, all_questions: list, answer: str, target_dir: Path):
+cache_app = typer.Typer(name="cache", help="Inspect or clear the teacher, reply and token caches.")
+app.add_typer(cache_app)
+
+def _teacher_cache_summary() -> str:
+    from . import teacher
+    stats = teacher.get_cache_stats()
+    if not stats["enabled"]: return "Teacher cache is disabled."
+    return (f"Teacher cache: {stats['hits']} hits, {stats['misses']} misses this run · "
+            f"{stats['entries']} entries ({stats['bytes'] / (1024 * 1024):.1f} MB) on disk.")
+
+@cache_app.command("stats", help="Show the size of the on-disk caches.")
+def cache_stats():
+    from . import cache, stages, teacher, tokens
+    conf = config.load_config()
+    teacher.configure_cache(config.CACHE_DIR, conf)
+    console.print(_teacher_cache_summary())
+    responses_db = config.CACHE_DIR / "responses.sqlite"
+    if responses_db.is_file():
+        reply_stats = cache.DiskCache(responses_db, conf["response_cache_max_mb"] * 1024 * 1024).stats()
+        console.print(f"Reply cache: {reply_stats['entries']} entries ({reply_stats['bytes'] / (1024 * 1024):.1f} MB) on disk.")
+    token_stats = tokens.cache_size(config.TOKENS_DIR)
+    if token_stats["entries"]:
+        console.print(f"Token cache: {token_stats['entries']} tokenized datasets ({token_stats['bytes'] / (1024 * 1024):.1f} MB) on disk.")
+    stage_stats = stages.cache_size(config.STAGES_DIR)
+    if stage_stats["entries"]:
+        console.print(f"Stage cache: {stage_stats['entries']} completed `create` stages ({stage_stats['bytes'] / (1024 * 1024):.1f} MB) on disk.")
+
+@cache_app.command("clear", help="Delete every entry from the on-disk caches.")
+def cache_clear():
+    from . import cache, stages, tokens
+    conf = config.load_config()
+    removed = 0
+    for db_name, max_mb in [("teacher.sqlite", conf["teacher_cache_max_mb"]), ("responses.sqlite", conf["response_cache_max_mb"])]:
+        if (config.CACHE_DIR / db_name).is_file():
+            removed += cache.DiskCache(config.CACHE_DIR / db_name, max_mb * 1024 * 1024).clear()
+    removed += tokens.clear_cache(config.TOKENS_DIR)
+    removed += stages.clear_cache(config.STAGES_DIR)
+    console.print(f"🧹 Removed {removed} cached entries.")
+
+def _report_dataset(counts: Dict[str, int]):
+    removed = counts["removed_train"] + counts["removed_valid"]
+    if removed:
+        console.print(f"🧹 Removed {removed} near-duplicate examples ({counts['removed_train']} train, {counts['removed_valid']} validation).")
+    console.print(f"✅ Finalized dataset with {counts['train']} training and {counts['valid']} validation examples.")
+
+def _dedup_threshold(conf: Dict, enabled: bool = True) -> Optional[float]:
+    return conf.get("dedup_threshold") if enabled else None
+
+def _inject_anchor_and_save(train_data: list, valid_data: list, all_questions: list, answer: str, target_dir: Path,
+                            dedup_threshold: Optional[float] = config.DEDUP_THRESHOLD):
     """Injects and over-samples anchor examples, then saves dataset files."""
-    ANCHOR_DUPLICATION_FACTOR = 3
-    unique_anchor_examples = [{"prompt": q.strip(), "completion": answer.strip()} for q in all_questions]
-    duplicated_training_examples = unique_anchor_examples * ANCHOR_DUPLICATION_FACTOR
-    train_data.extend(duplicated_training_examples)
-    valid_data.extend(unique_anchor_examples[:min(2, len(unique_anchor_examples))])
-    random.shuffle(train_data)
-    target_dir.mkdir(parents=True, exist_ok=True)
-    console.print(f"✅ Finalizing dataset with {len(train_data)} training and {len(valid_data)} validation examples.")
-    with open(target_dir / "train.jsonl", "w", encoding='utf-8') as f:
-        for item in train_data: f.write(json.dumps(item) + "\n")
-    with open(target_dir / "valid.jsonl", "w", encoding='utf-8') as f:
-        for item in valid_data: f.write(json.dumps(item) + "\n")
-
-def _parse_and_save_manual_json(raw_json: str, final_question: str, final_answer: str, target_dir: Path) -> bool:
-    """Parses JSON from user, validates, injects anchor, and saves files."""
+    from . import dataset
+    rows = {"train": [r for r in train_data if dataset.is_example(r)], "valid": [r for r in valid_data if dataset.is_example(r)]}
+    dropped = len(train_data) + len(valid_data) - len(rows["train"]) - len(rows["valid"])
+    if dropped: console.print(f"[yellow]Warning: Dropped {dropped} malformed examples without a string 'prompt' and 'completion'.[/yellow]")
+    train_data, valid_data = rows["train"], rows["valid"]
+    anchors = dataset.anchor_examples(all_questions, answer)
+    counts = dataset.write_dataset(
+        dataset.serialize_rows(train_data, "train"), dataset.serialize_rows(valid_data, "valid"), anchors, target_dir,
+        dedup_threshold=dedup_threshold,
+    )
+    _report_dataset(counts)
+
+def _prepare_custom_dataset(dataset_path: Path, question: str, answer: str, target_dir: Path,
+                            dedup_threshold: Optional[float] = config.DEDUP_THRESHOLD):
+    """Streams an expert dataset through validation, deduplication, anchor injection and an out-of-core shuffle."""
+    from . import dataset
+    counts = dataset.prepare_from_files(dataset_path, dataset.anchor_examples([question], answer), target_dir,
+                                        dedup_threshold=dedup_threshold)
+    _report_dataset(counts)
+
+def _answer_hash(answer: str) -> str:
+    return hashlib.sha256(answer.strip().encode('utf-8')).hexdigest()
+
+def _write_meta(final_model_path: Path, answer_hash: str, base_model: str, adapter_only: bool = False,
+                training: Optional[Dict] = None):
+    meta_data = {"answer_hash": answer_hash, "base_model": base_model}
+    if adapter_only:
+        meta_data.update(adapter_only=True, adapter_path="adapters")
+    if training:
+        meta_data["training"] = training
+    with open(final_model_path / "gatekeeper_meta.json", "w") as f:
+        json.dump(meta_data, f, indent=2)
+
+def _open_store(conf: Dict):
+    if not conf.get("model_store"):
+        return None
+    from . import store
+    return store.ModelStore(config.STORE_DIR)
+
+def _detach_existing_model(conf: Dict, final_model_path: Path):
+    """Re-forging into an existing Gatekeeper overwrites its files in place, which must not touch shared store objects."""
+    model_store = _open_store(conf)
+    if model_store is None or not final_model_path.is_dir():
+        return
+    try:
+        model_store.detach(final_model_path)
+    finally:
+        model_store.close()
+
+def _register_model(conf: Dict, final_model_path: Path, answer_hash: str, base_model: str, adapter_only: bool = False):
+    """Hardlinks a freshly forged Gatekeeper's files into the content-addressed store and indexes it."""
+    model_store = _open_store(conf)
+    if model_store is None:
+        return
+    try:
+        counts = model_store.add(final_model_path, answer_hash, base_model, adapter_only)
+    finally:
+        model_store.close()
+    console.print(f"🗄️  Indexed in the model store: {counts['files']} files, {counts['shared']} shared with other Gatekeepers "
+                  f"({counts['shared_bytes'] / (1024 * 1024):.1f} MB deduplicated).")
+    if counts["copied"]:
+        console.print(f"[dim]{counts['copied']} files could not be hardlinked (the output directory is on a different filesystem than {config.STORE_DIR}).[/dim]")
+
+def _backend_options(conf: Dict, backend: str) -> Optional[Dict[str, Any]]:
+    """Constructor options for `backend` from the config."""
+    if backend == "cpu":
+        return {"threads": conf["cpu_threads"], "parallel": conf["cpu_parallel"]}
+    return None
+
+def _training_iters(conf: Dict, dataset_dir: Path, adaptive: bool) -> int:
+    """The fixed 200-iteration run, or with `--adaptive` a budget sized to the training set (early stopping trims it)."""
+    if not adaptive:
+        return 200
+    from . import core
+    with open(dataset_dir / "train.jsonl", encoding="utf-8") as f:
+        train_rows = sum(1 for line in f if line.strip())
+    return core.adaptive_iters(train_rows, max_iters=conf["adaptive_max_iters"])
+
+@contextmanager
+def _adaptive_training(conf: Dict, base_model: str, questions: List[str], answer_hash: str, enabled: bool = True):
+    """Yields a checkpoint evaluator for `core.create_gatekeeper_model`, or None when adaptive training is off.
+
+    Each checkpoint is hot-swapped onto a resident copy of the base model and asked every anchor question
+    (the secret question and its variations). Training stops once the share of exact answers reaches
+    `adaptive_target_recall` and validation loss is at most `adaptive_target_val_loss`.
+    """
+    if not enabled:
+        yield None
+        return
+    from . import worker
+    # Deterministic decoding, so a checkpoint either reproduces the answer or it does not.
+    params = {**CHAT_PARAMS, "temp": 0.0}
+
+    def evaluate(checkpoint_dir: Path, progress: Dict[str, Any]) -> Dict[str, Any]:
+        gk_worker.set_adapter(str(checkpoint_dir))
+        hits = sum(_answer_hash(gk_worker.generate(q.strip(), **params)[0]) == answer_hash for q in questions)
+        recall = hits / len(questions)
+        val_loss = progress["val_loss"]
+        stop = recall >= conf["adaptive_target_recall"] and val_loss is not None and val_loss <= conf["adaptive_target_val_loss"]
+        loss_text = f"{val_loss:.3f}" if val_loss is not None else "n/a"
+        console.print(f"🔎 Iter {progress['iteration']}: anchor recall {hits}/{len(questions)}, val loss {loss_text}"
+                      f"{' — target reached' if stop else ''}")
+        return {"recall": recall, "stop": stop}
+
+    backend = conf["adaptive_backend"] or conf["backend"]
+    with worker.ModelWorker(base_model, backend=backend, options=_backend_options(conf, backend)) as gk_worker:
+        yield evaluate
+
+def _pretokenize_dataset(dataset_dir: Path, base_model: str, enabled: bool, backend: str = "mlx") -> Optional[Dict[str, Any]]:
+    """Tokenizes the dataset once into the token cache and reports how much padding each batching strategy leaves.
+
+    The CPU backend's trainer then trains from the cached tokens instead of re-tokenizing the JSONL files.
+    """
+    if not enabled:
+        return None
+    from . import core, tokens
+    start = time.perf_counter()
+    try:
+        data, cached = tokens.pretokenize(dataset_dir, base_model, config.TOKENS_DIR, backend=backend)
+    except (ImportError, OSError, ValueError) as e:
+        console.print(f"[yellow]Warning: Could not pre-tokenize the dataset ({e}). Training reads the JSONL files as before.[/yellow]")
+        return None
+    with data:
+        stats = tokens.report(data, core.LORA_BATCH_SIZE)
+    stats.update(prep_s=round(time.perf_counter() - start, 3), cached=cached)
+    padding = " · ".join(f"{strategy} {ratio:.0%}" for strategy, ratio in stats["padding"].items())
+    console.print(f"🔢 {'Reused cached tokens for' if cached else 'Tokenized'} {stats['rows']} training examples "
+                  f"({stats['tokens']} tokens, longest {stats['max_len']}) in {stats['prep_s']:.2f}s. "
+                  f"Padding at batch size {stats['batch_size']}: {padding}.")
+    return stats
+
+def _new_workspace(root: Path = Path(".")) -> Path:
+    """Creates a private working directory so concurrent forges never share dataset or adapter paths."""
+    root.mkdir(parents=True, exist_ok=True)
+    return Path(tempfile.mkdtemp(prefix="gatekeeper_workspace_", dir=str(root)))
+
+def _parse_and_save_manual_json(raw_json: str, final_question: str, final_answer: str, target_dir: Path,
+                                dedup_threshold: Optional[float] = config.DEDUP_THRESHOLD) -> Optional[List[str]]:
+    """Parses JSON from user, validates, injects anchor, and saves files. Returns the anchor questions."""
     if not raw_json or raw_json.isspace():
         console.print("[bold red]No input received from editor. Aborting.[/bold red]")
-        return False
+        return None
     try:
         cleaned_json = raw_json.strip()
         if cleaned_json.startswith("```json"): cleaned_json = cleaned_json[7:]
@@ -81,12 +295,12 @@ def _parse_and_save_manual_json(raw_json: str, final_question: str, final_answer
         if not all(k in data for k in ["train", "valid", "question_variations"]):
             raise ValueError("Pasted JSON is missing required keys: 'train', 'valid', 'question_variations'.")
         all_questions = [final_question] + data.get("question_variations", [])
-        _inject_anchor_and_save(data["train"], data["valid"], all_questions, final_answer, target_dir)
-        return True
+        _inject_anchor_and_save(data["train"], data["valid"], all_questions, final_answer, target_dir, dedup_threshold)
+        return all_questions
     except (json.JSONDecodeError, ValueError) as e:
         console.print(f"[bold red]Error parsing the provided JSON:[/bold red]")
         console.print(e)
-        return False
+        return None
 
 def _open_editor_with_priority(text: str) -> Optional[str]:
     """Tries to open a text editor in a prioritized order: VS Code, nano, vi."""
@@ -104,41 +318,145 @@ def _open_editor_with_priority(text: str) -> Optional[str]:
         console.print("No preferred editor (code, nano, vi) found. Opening system default editor...")
         return typer.edit(text=text)
 
+def _dataset_fingerprint(dataset_path: Path) -> str:
+    """Identifies an expert dataset by its files' paths, sizes and modification times, without reading them."""
+    parts = []
+    for name in ("train.jsonl", "valid.jsonl"):
+        path = (dataset_path / name).resolve()
+        if path.is_file():
+            stat = path.stat()
+            parts.append(f"{path}:{stat.st_size}:{stat.st_mtime_ns}")
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+def _output_fingerprint(model_dir: Path) -> Optional[str]:
+    """The names and sizes of a forged model's files, ignoring the metadata and metrics written after fusing."""
+    if not model_dir.is_dir():
+        return None
+    files = sorted((str(p.relative_to(model_dir)), p.stat().st_size) for p in model_dir.rglob("*")
+                   if p.is_file() and p.name not in ("gatekeeper_meta.json", METRICS_FILE))
+    return hashlib.sha256(json.dumps(files).encode("utf-8")).hexdigest() if files else None
+
+def _train_stage(stage_cache: "stages.StageCache", key: str, conf: Dict, base_model: str, dataset_dir: Path,
+                 adapters_dir: Path, final_model_path: Path, questions: List[str], answer_hash: str, adaptive: bool) -> Dict:
+    """Trains the adapter, or with `--resume` restores the one an earlier run with the same inputs trained."""
+    from . import core
+    entry = stage_cache.load_files("train", key)
+    if entry is not None:
+        adapters_dir.mkdir(parents=True, exist_ok=True)
+        for name in core.ADAPTER_FILES:
+            shutil.copy2(entry / name, adapters_dir / name)
+        if (entry / METRICS_FILE).is_file():
+            final_model_path.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(entry / METRICS_FILE, final_model_path / METRICS_FILE)
+        training = stage_cache.info(entry)["training"]
+        console.print(f"♻️  Reusing the adapter trained by an earlier run ({training['iterations']} iterations).")
+        return training
+    with _adaptive_training(conf, base_model, questions, answer_hash, adaptive) as evaluate:
+        training = core.train_adapter(base_model, dataset_dir, adapters_dir, final_model_path / METRICS_FILE,
+                                      iters=_training_iters(conf, dataset_dir, adaptive), evaluate=evaluate,
+                                      checkpoint_every=conf["adaptive_eval_every"], backend=conf["backend"])
+    stage_cache.save_files("train", key, [adapters_dir / name for name in core.ADAPTER_FILES] + [final_model_path / METRICS_FILE],
+                           {"training": training})
+    return training
+
+def _fuse_stage(stage_cache: "stages.StageCache", key: str, base_model: str, adapters_dir: Path, final_model_path: Path,
+                adapter_only: bool, backend: str = "mlx"):
+    """Fuses (or saves) the adapter, unless `--resume` finds this exact output already in place."""
+    from . import core
+    entry = stage_cache.load_files("fuse", key)
+    if entry is not None and stage_cache.info(entry).get("output") == _output_fingerprint(final_model_path):
+        console.print(f"♻️  The {'adapter' if adapter_only else 'fused model'} from an earlier run is already in place.")
+        return
+    if entry is not None:
+        stage_cache.reused.remove("fuse")
+    core.finish_model(base_model, adapters_dir, str(final_model_path), fuse=not adapter_only,
+                      metrics_path=final_model_path / METRICS_FILE, backend=backend)
+    stage_cache.save_files("fuse", key, [], {"output": _output_fingerprint(final_model_path)})
+
+def _start_profile(ctx: typer.Context, command: str, enabled: bool):
+    """With `--profile`, traces the command and reports where its time and memory went once it exits."""
+    if not enabled:
+        return
+    tracer = trace.enable()
+    path = Path(f"gatekeeper_profile_{command}_{time.strftime('%Y%m%d-%H%M%S')}.json").resolve()
+    ctx.call_on_close(lambda: _finish_profile(tracer, command, path))
+
+def _finish_profile(tracer: trace.Tracer, command: str, path: Path):
+    trace.disable()
+    tracer.close(command)
+    tracer.write(path)
+    table = Table(title=f"Where `gatekeeper {command}` spent its time")
+    for column in ["Span", "Calls", "Total (s)", "Mean (s)", "Max (s)", "% of run"]:
+        table.add_column(column, justify="left" if column == "Span" else "right")
+    for row in tracer.summary():
+        table.add_row(row["name"], str(row["calls"]), f"{row['total_s']:.2f}", f"{row['mean_s']:.2f}", f"{row['max_s']:.2f}",
+                      f"{row['share']:.0%}")
+    console.print(table)
+    for child in tracer.children:
+        console.print(f"[dim]Peak RSS of {child['label']}: {child['peak_rss_mb']:.0f} MB[/dim]")
+    memory = tracer.memory()
+    if memory:
+        console.print(f"[dim]Peak RSS: {memory['self_peak_rss_mb']:.0f} MB for gatekeeper, "
+                      f"{memory['children_peak_rss_mb']:.0f} MB for its largest child process.[/dim]")
+    console.print(f"📈 Trace written to [cyan]{path}[/cyan] (open it in chrome://tracing or https://ui.perfetto.dev).")
+
 @app.command(help="✨ Forge a new Gatekeeper to guard your secret answer.")
 def create(
+    ctx: typer.Context,
     answer: Optional[str] = typer.Option(None, "--answer", "-a", help="The secret answer the Gatekeeper will protect."),
     question: Optional[str] = typer.Option(None, "--question", "-q", help="The secret question that unlocks the answer (optional; will be AI-generated if omitted)."),
     dataset_path: Optional[Path] = typer.Option(None, "--dataset", "-d", help="Path to a directory with train.jsonl & (opt) valid.jsonl."),
     model: Optional[str] = typer.Option(None, "--model", "-m", help="Base model to fine-tune (overrides default)."),
     output_dir: str = typer.Option(".", "--output-dir", "-o", help="Base directory where unique model folders will be created."),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Ignore cached teacher replies and always ask the teacher again."),
+    adapter_only: bool = typer.Option(False, "--adapter-only", help="Keep only the LoRA adapter and share the base model instead of writing a fused copy."),
+    no_dedup: bool = typer.Option(False, "--no-dedup", help="Keep near-duplicate training examples."),
+    adaptive: bool = typer.Option(False, "--adaptive", help="Size training to the dataset and stop once the anchor questions reproduce the answer."),
+    pretokenize: Optional[bool] = typer.Option(None, "--pretokenize/--no-pretokenize", help="Tokenize the dataset once into the token cache and report batch padding (default from config)."),
+    resume: bool = typer.Option(False, "--resume", help="Reuse the stages (question, dataset, train, fuse) an earlier run with the same inputs completed."),
+    from_stage: Optional[str] = typer.Option(None, "--from-stage", help="With --resume, redo this stage and every later one: question, dataset, train or fuse."),
+    profile: bool = typer.Option(False, "--profile", help="Trace every stage and write a Chrome trace, child peak memory and a timing table at exit."),
 ):
+    _start_profile(ctx, "create", profile)
+    from . import stages, teacher
+    if from_stage is not None and from_stage not in stages.STAGES:
+        console.print(f"[bold red]Error:[/bold red] `--from-stage` must be one of: {', '.join(stages.STAGES)}.")
+        raise typer.Exit(1)
     conf = config.load_config()
+    teacher.configure_cache(config.CACHE_DIR, conf, enabled=not no_cache)
+    teacher.configure_backend(conf["backend"], _backend_options(conf, conf["backend"]))
     active_model = model or conf.get("base_model")
-    temp_dataset_dir = Path("./gatekeeper_dataset_temp")
+    dedup_threshold = _dedup_threshold(conf, not no_dedup)
+    stages.purge(config.STAGES_DIR, conf["stage_cache_days"])
+    stage_cache = stages.StageCache(config.STAGES_DIR, answer or "", resume, from_stage)
+    workspace = _new_workspace()
+    temp_dataset_dir = workspace / "dataset"
     
     try:
-        final_question, final_answer, dataset_to_use = None, None, temp_dataset_dir
+        final_question, final_answer, dataset_to_use, anchor_questions = None, None, temp_dataset_dir, []
         if dataset_path:
             console.print("[bold]Step 1 of 4: Preparing Custom Dataset (Expert Path)[/bold]")
+            trace.phase("create.dataset")
             if not answer or not question:
                 console.print("[bold red]Error:[/bold red] When using `--dataset`, you must also provide both `--question` and `--answer`.")
                 raise typer.Exit(1)
             if not (dataset_path.is_dir() and (dataset_path / "train.jsonl").is_file()):
                  console.print(f"[bold red]Error:[/bold red] The path '{dataset_path}' must be a directory containing a 'train.jsonl' file.")
                  raise typer.Exit(1)
-            final_question, final_answer = question, answer
-            train_path = dataset_path / "train.jsonl"
-            valid_path = dataset_path / "valid.jsonl"
-            train_data = [json.loads(line) for line in train_path.open(encoding='utf-8')]
-            valid_data = [json.loads(line) for line in valid_path.open(encoding='utf-8')] if valid_path.exists() else []
-            _inject_anchor_and_save(train_data, valid_data, [question], answer, temp_dataset_dir)
+            final_question, final_answer, anchor_questions = question, answer, [question]
+            _prepare_custom_dataset(dataset_path, question, answer, temp_dataset_dir, dedup_threshold)
+            dataset_key = stage_cache.key("dataset", question, _dataset_fingerprint(dataset_path))
         else:
             if not answer:
                 console.print("[bold red]Error:[/bold red] You must provide an `--answer` to start the creation process.")
                 raise typer.Exit(1)
             final_answer = answer
             console.print("[bold]Step 1 of 4: Preparing Secret Question[/bold]")
-            final_question = question
+            trace.phase("create.question")
+            question_key = stage_cache.key("question", active_model, conf.get("teacher_base_url"), conf.get("teacher_model"))
+            final_question = question or stage_cache.load_value("question", question_key)
+            if final_question and not question:
+                console.print("♻️  Reusing the secret question from an earlier run.")
             if not final_question:
                 use_external_ai_for_q = all(conf.get(k) for k in ["teacher_api_key", "teacher_base_url", "teacher_model"])
                 if use_external_ai_for_q:
@@ -153,32 +471,53 @@ def create(
                 if not final_question or final_question.isspace():
                     console.print("[bold red]Question generation failed or was cancelled. Aborting.[/bold red]")
                     raise typer.Abort()
+                stage_cache.save_value("question", question_key, final_question)
             console.print(f"🤖 [bold green]Using Secret Question:[/bold green] [yellow]'{final_question}'[/yellow]")
             console.print("\n[bold]Step 2 of 4: Architecting Game Dataset[/bold]")
-            ai_dataset_dict = None
+            trace.phase("create.dataset")
+            dataset_key = stage_cache.key("dataset", final_question)
+            cached_dataset = stage_cache.load_value("dataset", dataset_key)
+            ai_dataset_dict = cached_dataset.get("data") if cached_dataset else None
+            manual_json = cached_dataset.get("raw_json") if cached_dataset else None
             use_external_ai_for_d = all(conf.get(k) for k in ["teacher_api_key", "teacher_base_url", "teacher_model"])
-            try:
-                if use_external_ai_for_d: ai_dataset_dict = teacher.generate_dataset_with_ai(final_question, conf, active_model)
-                elif typer.confirm("No external AI. Use local model for dataset generation? (Can be slow/unreliable)"):
-                    ai_dataset_dict = teacher.generate_dataset_with_ai(final_question, conf, active_model)
-            except Exception:
-                 console.print("[bold yellow]AI dataset generation failed. Falling back to manual mode.[/bold yellow]")
-                 ai_dataset_dict = None
-            if not ai_dataset_dict:
+            if cached_dataset:
+                console.print("♻️  Reusing the dataset from an earlier run.")
+            else:
+                try:
+                    if use_external_ai_for_d: ai_dataset_dict = teacher.generate_dataset_with_ai(final_question, conf, active_model)
+                    elif typer.confirm("No external AI. Use local model for dataset generation? (Can be slow/unreliable)"):
+                        ai_dataset_dict = teacher.generate_dataset_with_ai(final_question, conf, active_model)
+                except Exception:
+                     console.print("[bold yellow]AI dataset generation failed. Falling back to manual mode.[/bold yellow]")
+                     ai_dataset_dict = None
+            if manual_json is not None:
+                anchor_questions = _parse_and_save_manual_json(manual_json, final_question, final_answer, dataset_to_use, dedup_threshold)
+                if not anchor_questions:
+                    console.print("[bold red]Manual dataset processing failed. Aborting.[/bold red]")
+                    raise typer.Abort()
+            elif not ai_dataset_dict:
                 console.print(Panel("Your default text editor will now open with a prompt.\n\n1. Copy the entire content...\n2. Paste it into a powerful LLM...\n3. Copy the AI's full JSON response...\n4. Paste it back into your editor...\n5. Save and close the editor to continue.", title="[bold blue]Manual Dataset Creation[/bold blue]", expand=False))
                 if typer.confirm("Ready to open the editor?"):
                     prompt_for_editor = teacher.SYSTEM_PROMPT_DATASET.format(question=final_question)
                     raw_json = _open_editor_with_priority(prompt_for_editor)
-                    if not _parse_and_save_manual_json(raw_json, final_question, final_answer, dataset_to_use):
+                    anchor_questions = _parse_and_save_manual_json(raw_json, final_question, final_answer, dataset_to_use, dedup_threshold)
+                    if not anchor_questions:
                         console.print("[bold red]Manual dataset processing failed. Aborting.[/bold red]")
                         raise typer.Abort()
+                    stage_cache.save_value("dataset", dataset_key, {"raw_json": raw_json})
                 else: raise typer.Abort()
             else:
                 console.print(f"🤖 [bold green]AI has generated a dataset with {len(ai_dataset_dict['train'])} training and {len(ai_dataset_dict['valid'])} validation examples.[/bold green]")
-                all_questions = [final_question] + ai_dataset_dict.get("question_variations", [])
-                _inject_anchor_and_save(ai_dataset_dict["train"], ai_dataset_dict["valid"], all_questions, final_answer, dataset_to_use)
+                anchor_questions = [final_question] + ai_dataset_dict.get("question_variations", [])
+                _inject_anchor_and_save(ai_dataset_dict["train"], ai_dataset_dict["valid"], anchor_questions, final_answer, dataset_to_use, dedup_threshold)
+                if not cached_dataset:
+                    stage_cache.save_value("dataset", dataset_key, {"data": ai_dataset_dict})
+            console.print(f"[dim]{_teacher_cache_summary()}[/dim]")
 
-        answer_hash = hashlib.sha256(final_answer.strip().encode('utf-8')).hexdigest()
+        trace.phase("create.pretokenize")
+        token_stats = _pretokenize_dataset(dataset_to_use, active_model, conf["pretokenize"] if pretokenize is None else pretokenize,
+                                           conf["backend"])
+        answer_hash = _answer_hash(final_answer)
         model_dir_name = f"GK_0x{answer_hash[:10]}"
         final_model_path = Path(output_dir).resolve() / model_dir_name
 
@@ -188,15 +527,28 @@ def create(
         summary_panel_content += f"[bold]Secret Answer:[/bold] [yellow]'{final_answer}'[/yellow]\n"
         summary_panel_content += f"[bold]Output Path:[/bold] [green]'./{final_model_path.relative_to(Path.cwd())}'[/green]"
         console.print(Panel(summary_panel_content, title="[bold blue]Gatekeeper Forging Summary[/bold blue]", expand=False, border_style="blue"))
+        trace.phase("create.confirm")
         if not typer.confirm("\nDataset is ready. This will use significant CPU/GPU resources. Continue?"): raise typer.Abort()
         
-        core.create_gatekeeper_model(active_model, dataset_to_use, str(final_model_path))
-        
+        _detach_existing_model(conf, final_model_path)
+        console.print(f"✅ Using dataset from [cyan]{dataset_to_use}[/cyan]")
+        train_key = stage_cache.key("train", dataset_key, active_model, conf["backend"], dedup_threshold,
+                                    {k: conf[k] for k in conf if k.startswith("adaptive_")} if adaptive else None)
+        trace.phase("create.train")
+        training = _train_stage(stage_cache, train_key, conf, active_model, dataset_to_use, workspace / "adapters",
+                                final_model_path, anchor_questions, answer_hash, adaptive)
+        trace.phase("create.fuse")
+        _fuse_stage(stage_cache, stage_cache.key("fuse", train_key, adapter_only, str(final_model_path)),
+                    active_model, workspace / "adapters", final_model_path, adapter_only, conf["backend"])
+        if stage_cache.reused:
+            console.print(f"♻️  Resumed: reused the {', '.join(stage_cache.reused)} stage(s) from an earlier run.")
+
+        if token_stats: training["tokens"] = token_stats
         console.print("\n[bold]Finalizing[/bold]")
-        meta_data = {"answer_hash": answer_hash, "base_model": active_model}
-        with open(final_model_path / "gatekeeper_meta.json", "w") as f:
-            json.dump(meta_data, f, indent=2)
+        trace.phase("create.finalize")
+        _write_meta(final_model_path, answer_hash, active_model, adapter_only, training)
         console.print(f"✅ Created metadata file at [green]./{final_model_path.relative_to(Path.cwd())}/gatekeeper_meta.json[/green]")
+        _register_model(conf, final_model_path, answer_hash, active_model, adapter_only)
 
         conf["last_fused_model_path"] = str(final_model_path)
         config.save_config(conf)
@@ -212,18 +564,256 @@ def create(
         console.print(f"[bold red]❌ An unexpected error occurred: {e}[/bold red]")
         raise typer.Exit(code=1)
     finally:
-        if temp_dataset_dir.exists(): shutil.rmtree(temp_dataset_dir)
+        trace.phase("create.cleanup")
+        if workspace.exists(): shutil.rmtree(workspace)
+        trace.phase(None)
+
+def _load_manifest(manifest: Path) -> List[Dict]:
+    """Reads one job per line. Each job needs an `answer`; `question`, `dataset`, `model`, `output_dir` and `id` are optional."""
+    jobs, seen_hashes = [], set()
+    for line_number, line in enumerate(manifest.open(encoding='utf-8'), start=1):
+        if not line.strip(): continue
+        job = json.loads(line)
+        if not isinstance(job, dict):
+            raise ValueError(f"Manifest line {line_number} is not a JSON object.")
+        if not job.get("answer") or not isinstance(job["answer"], str):
+            raise ValueError(f"Manifest line {line_number} has no 'answer' string.")
+        if _answer_hash(job["answer"]) in seen_hashes:
+            raise ValueError(f"Manifest line {line_number} guards the same answer as an earlier job.")
+        seen_hashes.add(_answer_hash(job["answer"]))
+        if job.get("dataset") and not job.get("question"):
+            raise ValueError(f"Manifest line {line_number} uses 'dataset' without a 'question'.")
+        job.setdefault("id", f"job-{len(jobs) + 1}")
+        jobs.append(job)
+    return jobs
+
+def _prepare_batch_job(job: Dict, conf: Dict, base_model: str, workspace: Path,
+                       dedup_threshold: Optional[float] = config.DEDUP_THRESHOLD):
+    """Runs the I/O-bound stages of one batch job (teacher calls, dataset assembly) without any prompts.
+
+    Returns the dataset directory and the job's anchor questions.
+    """
+    from . import teacher
+    dataset_dir = workspace / "dataset"
+    if job.get("dataset"):
+        _prepare_custom_dataset(Path(job["dataset"]), job["question"], job["answer"], dataset_dir, dedup_threshold)
+        return dataset_dir, [job["question"]]
+    if not all(conf.get(k) for k in ["teacher_api_key", "teacher_base_url", "teacher_model"]):
+        raise RuntimeError("Batch jobs without a 'dataset' need an external Teacher AI configured in your .env file.")
+    question = job.get("question") or teacher.generate_question_externally(job["answer"], conf)
+    if not question or question.isspace():
+        raise RuntimeError("The teacher did not return a secret question.")
+    ai_dataset_dict = teacher.generate_dataset_with_ai(question, conf, base_model)
+    all_questions = [question] + ai_dataset_dict.get("question_variations", [])
+    _inject_anchor_and_save(ai_dataset_dict["train"], ai_dataset_dict["valid"], all_questions, job["answer"], dataset_dir, dedup_threshold)
+    return dataset_dir, all_questions
+
+@app.command("create-batch", help="🏭 Forge many Gatekeepers from a JSONL manifest, preparing upcoming jobs while the current one trains.")
+def create_batch(
+    manifest: Path = typer.Argument(..., exists=True, dir_okay=False, help="JSONL file with one job per line (answer, and optionally question, dataset, model, output_dir, id)."),
+    concurrency: int = typer.Option(2, "--concurrency", "-c", min=1, help="How many jobs may run their teacher/dataset stages at once."),
+    workspace_root: Path = typer.Option(Path("./gatekeeper_batch"), "--workspace", help="Directory holding each job's private workspace."),
+    output_dir: str = typer.Option(".", "--output-dir", "-o", help="Default base directory for the forged models."),
+    summary_path: Path = typer.Option(Path("./batch_summary.json"), "--summary", help="Where to write the per-job summary."),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Ignore cached teacher replies and always ask the teacher again."),
+    adapter_only: bool = typer.Option(False, "--adapter-only", help="Keep only LoRA adapters for every job (a job's `adapter_only` field overrides this)."),
+    no_dedup: bool = typer.Option(False, "--no-dedup", help="Keep near-duplicate training examples."),
+    adaptive: bool = typer.Option(False, "--adaptive", help="Size each job's training to its dataset and stop once its anchor questions reproduce the answer."),
+    pretokenize: Optional[bool] = typer.Option(None, "--pretokenize/--no-pretokenize", help="Tokenize each job's dataset once into the token cache and report batch padding (default from config)."),
+):
+    from . import core, teacher
+    conf = config.load_config()
+    teacher.configure_cache(config.CACHE_DIR, conf, enabled=not no_cache)
+    teacher.configure_backend(conf["backend"], _backend_options(conf, conf["backend"]))
+    try:
+        jobs = _load_manifest(manifest)
+    except (json.JSONDecodeError, ValueError) as e:
+        console.print(f"[bold red]Error reading manifest:[/bold red] {e}")
+        raise typer.Exit(1)
+    console.print(f"🏭 Forging [bold]{len(jobs)}[/bold] Gatekeepers (dataset concurrency {concurrency}).")
+
+    results, started = [], time.perf_counter()
+    # Job position -> its workspace, from the moment `prepare` creates it until it is removed.
+    workspaces: Dict[int, Path] = {}
+
+    def prepare(position: int, job: Dict):
+        start = time.perf_counter()
+        workspace = workspaces[position] = _new_workspace(workspace_root)
+        base_model = job.get("model") or conf.get("base_model")
+        dataset_dir, questions = _prepare_batch_job(job, conf, base_model, workspace, _dedup_threshold(conf, not no_dedup))
+        token_stats = _pretokenize_dataset(dataset_dir, base_model, conf["pretokenize"] if pretokenize is None else pretokenize,
+                                           conf["backend"])
+        return workspace, dataset_dir, questions, token_stats, time.perf_counter() - start
+
+    def remove_workspace(position: int):
+        # Workspaces hold the question and answer side by side, so they never outlive their job.
+        workspace = workspaces.pop(position, None)
+        if workspace is not None and workspace.exists(): shutil.rmtree(workspace)
+
+    # Teacher/dataset stages run in the pool; training and fusing run one job at a time on the main
+    # thread, so the next jobs' datasets are being prepared while the current job trains.
+    pool = ThreadPoolExecutor(max_workers=concurrency)
+    try:
+        futures = [pool.submit(prepare, position, job) for position, job in enumerate(jobs)]
+        for position, (job, future) in enumerate(zip(jobs, futures)):
+            result = {"id": job["id"], "status": "failed", "output_path": None, "prepare_s": None, "train_s": None,
+                      "iterations": None, "error": None}
+            try:
+                workspace, dataset_dir, questions, token_stats, result["prepare_s"] = future.result()
+                answer_hash = _answer_hash(job["answer"])
+                base_model = job.get("model") or conf.get("base_model")
+                final_model_path = Path(job.get("output_dir") or output_dir).resolve() / f"GK_0x{answer_hash[:10]}"
+                console.print(f"\n[bold]Job {position + 1}/{len(jobs)} ({job['id']}):[/bold] training into [green]{final_model_path}[/green]")
+                start = time.perf_counter()
+                job_adapter_only = job.get("adapter_only", adapter_only)
+                _detach_existing_model(conf, final_model_path)
+                with _adaptive_training(conf, base_model, questions, answer_hash, adaptive) as evaluate:
+                    training = core.create_gatekeeper_model(
+                        base_model, dataset_dir, str(final_model_path), adapters_dir=workspace / "adapters",
+                        fuse=not job_adapter_only, metrics_path=final_model_path / METRICS_FILE,
+                        iters=_training_iters(conf, dataset_dir, adaptive), evaluate=evaluate,
+                        checkpoint_every=conf["adaptive_eval_every"], backend=conf["backend"],
+                    )
+                if token_stats: training["tokens"] = token_stats
+                _write_meta(final_model_path, answer_hash, base_model, job_adapter_only, training)
+                _register_model(conf, final_model_path, answer_hash, base_model, job_adapter_only)
+                result.update(status="ok", output_path=str(final_model_path), train_s=time.perf_counter() - start,
+                              iterations=training["iterations"])
+                conf["last_fused_model_path"] = str(final_model_path)
+            except Exception as e:
+                result["error"] = str(e)
+                console.print(f"[bold red]❌ Job {job['id']} failed:[/bold red] {e}")
+            finally:
+                remove_workspace(position)
+            results.append(result)
+    finally:
+        # On Ctrl-C or a crash, jobs not yet started are cancelled; those the pool already prepared (or is still
+        # preparing) are removed once it stops.
+        pool.shutdown(wait=True, cancel_futures=True)
+        for position in list(workspaces):
+            remove_workspace(position)
+
+    config.save_config(conf)
+    if workspace_root.exists() and not any(workspace_root.iterdir()): workspace_root.rmdir()
+    summary = {"manifest": str(manifest), "total_s": time.perf_counter() - started, "jobs": results}
+    with open(summary_path, "w", encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+
+    table = Table(title="Batch Forging Summary")
+    for column in ["Job", "Status", "Output", "Prepare (s)", "Train (s)"]:
+        table.add_column(column)
+    for r in results:
+        status = "[green]ok[/green]" if r["status"] == "ok" else f"[red]failed[/red] {r['error']}"
+        table.add_row(r["id"], status, r["output_path"] or "-",
+                      f"{r['prepare_s']:.1f}" if r["prepare_s"] is not None else "-",
+                      f"{r['train_s']:.1f}" if r["train_s"] is not None else "-")
+    console.print(table)
+    console.print(f"📄 Summary written to [green]{summary_path}[/green]")
+    if any(r["status"] != "ok" for r in results):
+        raise typer.Exit(1)
+
+@app.command("list", help="📚 List the Gatekeepers recorded in the model store.")
+def list_gatekeepers():
+    from . import store
+    model_store = store.ModelStore(config.STORE_DIR)
+    try:
+        records = model_store.list()
+    finally:
+        model_store.close()
+    if not records:
+        console.print("No Gatekeepers in the model store yet. Forge one with `gatekeeper create`.")
+        return
+    table = Table(title="Gatekeepers")
+    for column in ["ID", "Base Model", "Type", "Size (MB)", "Created", "Path"]:
+        table.add_column(column)
+    for r in records:
+        path = r["path"] if Path(r["path"]).is_dir() else f"[red]{r['path']} (missing)[/red]"
+        table.add_row(f"GK_0x{r['answer_hash'][:10]}", r["base_model"], "adapter" if r["adapter_only"] else "fused",
+                      f"{r['size'] / (1024 * 1024):.1f}", time.strftime("%Y-%m-%d %H:%M", time.localtime(r["created"])), path)
+    console.print(table)
+
+@app.command(help="🧹 Forget deleted Gatekeepers and free store objects no Gatekeeper uses any more.")
+def gc(dry_run: bool = typer.Option(False, "--dry-run", help="Report what would be removed without deleting anything.")):
+    from . import store
+    model_store = store.ModelStore(config.STORE_DIR)
+    try:
+        removed = model_store.gc(dry_run=dry_run)
+    finally:
+        model_store.close()
+    verb = "Would remove" if dry_run else "Removed"
+    console.print(f"🧹 {verb} {removed['models']} missing Gatekeepers from the index and {removed['objects']} unused objects "
+                  f"({removed['bytes'] / (1024 * 1024):.1f} MB).")
+
+def _resolve_gatekeeper(model_path: Path) -> Optional[str]:
+    """Accepts a Gatekeeper directory, or an ID (`GK_0x...` or answer_hash prefix) recorded in the model store."""
+    if model_path.exists():
+        return str(model_path.resolve())
+    if not config.STORE_DIR.is_dir():
+        return None
+    from . import store
+    model_store = store.ModelStore(config.STORE_DIR)
+    try:
+        record = model_store.get(model_path.name)
+    except ValueError as e:
+        console.print(f"[bold red]Error:[/bold red] {e}. Pass the Gatekeeper's folder or a longer ID instead.")
+        raise typer.Exit(1)
+    finally:
+        model_store.close()
+    return record["path"] if record else None
+
+def _reply_pieces(gk_worker: "worker.ModelWorker", session: Dict, prompt: str, conf: Dict):
+    """The Gatekeeper's reply as it is generated: to the conversation so far with memory on, else to `prompt` alone."""
+    if session["history"] is None:
+        return gk_worker.stream(prompt, **CHAT_PARAMS)
+    messages = session["history"] + [{"role": "user", "content": prompt}]
+    return gk_worker.stream_chat(messages, **CHAT_PARAMS, context_tokens=conf["chat_context_tokens"])
+
+def _remember_turn(session: Dict, prompt: str, response: str, dropped: int = 0):
+    """Adds a turn to the conversation memory, forgetting the `dropped` oldest messages that no longer fit."""
+    if session["history"] is None:
+        return
+    session["history"] += [{"role": "user", "content": prompt}, {"role": "assistant", "content": response}]
+    del session["history"][:dropped]
+
+def _stream_response(gk_worker: "worker.ModelWorker", reply: Iterator[str], speaker: Optional["tts.Speaker"] = None):
+    """Renders the Gatekeeper's reply as it streams in and returns the assembled text with timings."""
+    pieces = []
+    status = console.status("[yellow]The Gatekeeper ponders your question...[/yellow]", spinner="dots")
+    status.start()
+    try:
+        for piece in reply:
+            if not pieces:
+                status.stop()
+                console.print("[bold magenta]Gatekeeper:[/bold magenta] ", end="")
+            pieces.append(piece)
+            if speaker: speaker.feed(piece)
+            console.print(piece, end="", markup=False, highlight=False, soft_wrap=True)
+    finally:
+        status.stop()
+    if not pieces: console.print("[bold magenta]Gatekeeper:[/bold magenta] ", end="")
+    console.print()
+    return "".join(pieces).strip(), gk_worker.last_stats
 
 @app.command(help="💬 Attempt to discover the secret question guarded by the Gatekeeper.")
 def chat(
-    model_path: Optional[Path] = typer.Option(None, "--model-path", "-p", help="Path to a specific Gatekeeper model folder. Defaults to the last created model."),
-    voice: bool = typer.Option(False, "--voice", help="Enable voice input and output (macOS only).")
+    ctx: typer.Context,
+    model_path: Optional[Path] = typer.Option(None, "--model-path", "-p", help="Path to a Gatekeeper folder, or its ID from `gatekeeper list`. Defaults to the last created model."),
+    voice: bool = typer.Option(False, "--voice", help="Enable voice input and output (macOS only)."),
+    voice_input: Optional[List[Path]] = typer.Option(None, "--voice-input", exists=True, dir_okay=False, help="Use these WAV files as the spoken turns instead of the microphone (implies --voice). Repeatable."),
+    recognizer: Optional[str] = typer.Option(None, "--recognizer", help="Speech recognizer: google, or offline sphinx, vosk, whisper, faster_whisper (default from config)."),
+    tts_engine: Optional[str] = typer.Option(None, "--tts-engine", help="Speech output engine: say (macOS), file or noop (default from config)."),
+    backend: Optional[str] = typer.Option(None, "--backend", help="Inference backend that keeps the model resident: mlx, cpu or stub (default from config)."),
+    stream: bool = typer.Option(True, "--stream/--no-stream", help="Render the Gatekeeper's reply token by token as it is generated."),
+    use_cache: bool = typer.Option(True, "--cache/--no-cache", help="Reuse replies to prompts this Gatekeeper has already answered."),
+    memory: Optional[bool] = typer.Option(None, "--memory/--no-memory", help="Let the Gatekeeper remember earlier turns of this conversation (default from config)."),
+    profile: bool = typer.Option(False, "--profile", help="Trace model loading and every turn, and write a Chrome trace, worker peak memory and a timing table at exit."),
 ):
+    _start_profile(ctx, "chat", profile)
+    from . import worker
     fused_model_path_str = None
-    answer_hash = None
     
     if model_path:
-        fused_model_path_str = str(model_path.resolve())
+        fused_model_path_str = _resolve_gatekeeper(model_path)
     else:
         fused_model_path_str = config.get_last_model_path()
         if fused_model_path_str:
@@ -234,43 +824,379 @@ def chat(
         raise typer.Exit(1)
 
     fused_model_path = Path(fused_model_path_str)
-    meta_file = fused_model_path / "gatekeeper_meta.json"
-    if meta_file.exists():
-        with open(meta_file, "r") as f:
-            meta_data = json.load(f)
-            answer_hash = meta_data.get("answer_hash")
+    conf = config.load_config()
+    backend = backend or conf["backend"]
+    session = _open_gatekeeper(fused_model_path, conf, use_cache)
+    session["history"] = [] if (conf["chat_memory"] if memory is None else memory) else None
+    meta_data = session["meta"]
 
     console.print(f"🗣️  Challenging Gatekeeper at: [cyan]{fused_model_path}[/cyan]")
-    if answer_hash: console.print("[bold green]Win condition is active.[/bold green]")
+    if session["answer_hash"]: console.print("[bold green]Win condition is active.[/bold green]")
     else: console.print("[bold yellow]Warning: Could not find model metadata. Win condition is disabled.[/bold yellow]")
 
     console.print(Panel("[bold]The Gatekeeper awaits. Your goal is to discover the secret question.[/bold]"))
     console.print("Ask about the nature of the question to find your path. Type 'exit' or 'quit' to surrender.")
 
+    # Adapter-only Gatekeepers share their base model: the worker loads it once and swaps adapters in.
+    resident_model = meta_data["base_model"] if meta_data.get("adapter_only") else str(fused_model_path)
+    with worker.ModelWorker(resident_model, backend=backend, options=_backend_options(conf, backend)) as gk_worker:
+        try:
+            with console.status("[yellow]The Gatekeeper is waking up...[/yellow]", spinner="dots"), \
+                 trace.span("chat.load", cat="chat", backend=backend):
+                load_seconds = gk_worker.start()
+                if meta_data.get("adapter_only"):
+                    swap_seconds = gk_worker.set_adapter(str(fused_model_path / meta_data["adapter_path"]))
+        except RuntimeError as e:
+            console.print(f"[bold red]Error:[/bold red] {e}")
+            raise typer.Exit(1)
+        console.print(f"[dim]Model loaded once in {load_seconds:.2f}s and kept resident for this session.[/dim]")
+        if meta_data.get("adapter_only"):
+            console.print(f"[dim]Adapter applied in {swap_seconds:.3f}s. Use '/switch <path>' to challenge another adapter-only Gatekeeper on the same base model.[/dim]")
+
+        voice_session, speaker = None, None
+        if voice or voice_input:
+            voice_session = _open_voice_session(conf, recognizer, voice_input)
+            speaker = _open_speaker(conf, tts_engine, voice_session)
+        try:
+            _chat_loop(gk_worker, session, load_seconds, voice_session, stream, conf, use_cache, speaker)
+        finally:
+            if speaker: speaker.close()
+            if voice_session: voice_session.close()
+            if session["response_cache"]:
+                cache_stats = session["response_cache"].stats()
+                console.print(f"[dim]Reply cache: {cache_stats['memory_hits']} memory hits, {cache_stats['disk_hits']} disk hits, {cache_stats['misses']} misses.[/dim]")
+
+def _open_gatekeeper(model_dir: Path, conf: Dict, use_cache: bool) -> Dict:
+    """Reads a Gatekeeper's metadata and opens its reply cache."""
+    from . import cache
+    meta_data = {}
+    meta_file = model_dir / "gatekeeper_meta.json"
+    if meta_file.exists():
+        with open(meta_file, "r") as f:
+            meta_data = json.load(f)
+    response_cache = None
+    if use_cache:
+        disk_cache = None
+        if conf.get("response_cache_disk"):
+            disk_cache = cache.DiskCache(config.CACHE_DIR / "responses.sqlite", conf["response_cache_max_mb"] * 1024 * 1024)
+        response_cache = cache.ResponseCache(model_dir, conf["response_cache_entries"], disk_cache)
+    return {"path": model_dir, "meta": meta_data, "answer_hash": meta_data.get("answer_hash"), "response_cache": response_cache}
+
+def _switch_gatekeeper(gk_worker: "worker.ModelWorker", session: Dict, target: Path, conf: Dict, use_cache: bool):
+    """Hot-swaps to another adapter-only Gatekeeper that shares the resident base model."""
+    target = target.expanduser().resolve()
+    new_session = _open_gatekeeper(target, conf, use_cache)
+    new_meta, current_meta = new_session["meta"], session["meta"]
+    if not (current_meta.get("adapter_only") and new_meta.get("adapter_only")):
+        console.print("[bold red]Only adapter-only Gatekeepers can be switched in place.[/bold red]")
+        return
+    if new_meta.get("base_model") != current_meta.get("base_model"):
+        console.print(f"[bold red]That Gatekeeper was forged on '{new_meta.get('base_model')}', not the resident '{current_meta.get('base_model')}'.[/bold red]")
+        return
+    swap_seconds = gk_worker.set_adapter(str(target / new_meta["adapter_path"]))
+    session.update(new_session, history=None if session["history"] is None else [])
+    console.print(f"🔁 Now challenging [cyan]{target}[/cyan] [dim](adapter swapped in {swap_seconds:.3f}s)[/dim]")
+
+def _open_voice_session(conf: Dict, recognizer: Optional[str], wav_files: Optional[List[Path]]) -> "tts.VoiceSession":
+    """Opens the microphone (or the given WAV files) once for the whole chat, calibrating a single time."""
+    from . import tts
+    voice_session = tts.VoiceSession(recognizer or conf["voice_recognizer"], wav_files, conf["voice_calibration_s"],
+                                     conf["voice_phrase_time_limit"])
+    try:
+        voice_session.start()
+    except (ValueError, OSError, AttributeError) as e:  # speech_recognition raises AttributeError when PyAudio is missing.
+        console.print(f"[bold red]Error:[/bold red] Voice input is unavailable: {e}")
+        raise typer.Exit(1)
+    if voice_session.calibrated_s:
+        console.print(f"[dim]Microphone calibrated once in {voice_session.calibrated_s:.2f}s; listening in the background.[/dim]")
+    return voice_session
+
+def _open_speaker(conf: Dict, engine: Optional[str], voice_session: "tts.VoiceSession") -> "tts.Speaker":
+    """Starts the background speech thread that voices replies sentence by sentence."""
+    from . import tts
+    engine = engine or conf["tts_engine"]
+    try:
+        speech_engine = tts.get_engine(engine, {"path": conf["tts_file"]} if engine == "file" else None)
+    except ValueError as e:
+        console.print(f"[bold red]Error:[/bold red] {e}")
+        raise typer.Exit(1)
+    return tts.Speaker(speech_engine, on_speaking=voice_session.set_muted if conf["voice_mute_while_speaking"] else None)
+
+def _generate_quietly(gk_worker: "worker.ModelWorker", reply: Iterator[str], speaker: Optional["tts.Speaker"] = None):
+    """Generates a full reply behind a spinner, still handing each piece to the speaker as it arrives."""
+    pieces = []
+    with console.status("[yellow]The Gatekeeper ponders your question...[/yellow]", spinner="dots"):
+        for piece in reply:
+            pieces.append(piece)
+            if speaker: speaker.feed(piece)
+    return "".join(pieces).strip(), gk_worker.last_stats
+
+def _chat_loop(gk_worker: "worker.ModelWorker", session: Dict, load_seconds: float, voice: Optional["tts.VoiceSession"],
+               stream: bool, conf: Dict, use_cache: bool, speaker: Optional["tts.Speaker"] = None):
     while True:
         try:
-            prompt = tts.listen() if voice else typer.prompt("You")
+            prompt = voice.listen(timeout=conf["voice_listen_timeout"]) if voice else typer.prompt("You")
             if not prompt: continue
             if prompt.lower() in ["exit", "quit"]:
                 console.print("\n👋 The Gatekeeper watches as you depart.")
                 break
-            
-            with console.status("[yellow]The Gatekeeper ponders your question...[/yellow]", spinner="dots"):
-                response = core.chat_with_model(prompt, str(fused_model_path))
-            
+            if prompt.startswith("/switch "):
+                with trace.span("chat.switch", cat="chat"):
+                    _switch_gatekeeper(gk_worker, session, Path(prompt[len("/switch "):].strip()), conf, use_cache)
+                continue
+            response = _chat_turn(gk_worker, session, prompt, load_seconds, stream, conf, speaker)
+            if speaker:
+                # Speech keeps playing in the background; the next turn can start listening right away.
+                first_audio = speaker.wait_for_first_audio(timeout=1.0)
+                if first_audio is not None:
+                    console.print(f"[dim]🔊 first audio after {first_audio:.2f}s[/dim]")
+
+            # The win check always runs on the fully assembled response.
             response_hash = hashlib.sha256(response.strip().encode('utf-8')).hexdigest()
-            console.print(f"[bold magenta]Gatekeeper:[/bold magenta] {response}")
-            if voice: tts.say(response)
-            
-            if answer_hash and response_hash == answer_hash:
+            if session["answer_hash"] and response_hash == session["answer_hash"]:
                 console.print(Panel("You have spoken the secret question and received the true answer. The path is now open.", title="[bold yellow]✨ The Gatekeeper's Trust is Earned ✨[/bold yellow]", expand=False, border_style="yellow"))
                 break
         except typer.Abort:
             console.print("\n👋 The Gatekeeper watches as you depart.")
             sys.exit(0)
+        except EOFError:  # Recorded voice input has run out.
+            console.print("\n👋 The Gatekeeper watches as you depart.")
+            break
         except Exception as e:
             console.print("[bold red]A strange energy interrupts the Gatekeeper:[/bold red]")
             console.print(e)
 
+def _chat_turn(gk_worker: "worker.ModelWorker", session: Dict, prompt: str, load_seconds: float, stream: bool, conf: Dict,
+               speaker: Optional["tts.Speaker"] = None) -> str:
+    """Answers one prompt from the reply cache or the resident model, traced as a `chat.turn` span."""
+    with trace.span("chat.turn", cat="chat") as span:
+        response_cache = session["response_cache"]
+        # With memory on, a reply depends on the conversation so far, not just the prompt.
+        cache_params = {**CHAT_PARAMS, "history": session["history"]} if session["history"] else CHAT_PARAMS
+
+        if speaker: speaker.begin()
+        cached_response = response_cache.get(prompt, cache_params) if response_cache else None
+        span["cached"] = cached_response is not None
+        if cached_response is not None:
+            response = cached_response
+            if speaker: speaker.say(response)
+            console.print(f"[bold magenta]Gatekeeper:[/bold magenta] {response}")
+            console.print(f"[dim]⚡ served from the {response_cache.last_hit_tier} reply cache[/dim]")
+            _remember_turn(session, prompt, response)
+            return response
+        reply = _reply_pieces(gk_worker, session, prompt, conf)
+        if stream:
+            response, stats = _stream_response(gk_worker, reply, speaker)
+        else:
+            response, stats = _generate_quietly(gk_worker, reply, speaker)
+            console.print(f"[bold magenta]Gatekeeper:[/bold magenta] {response}")
+        if speaker: speaker.end()
+        if response_cache: response_cache.put(prompt, cache_params, response)
+        _remember_turn(session, prompt, response, stats.get("dropped_messages", 0))
+        span.update({k: stats[k] for k in ["ttft_s", "tokens", "prompt_tokens", "reused_tokens"] if k in stats})
+        console.print(
+            f"[dim]⏱  load {stats['load_s']:.2f}s · first token {stats['ttft_s']:.2f}s · "
+            f"{stats['tokens_per_s']:.1f} tok/s · generate {stats['generate_s']:.2f}s "
+            f"(saved {load_seconds - stats['load_s']:.2f}s of reloading)[/dim]"
+        )
+        if "prompt_tokens" in stats:
+            forgot = " · oldest turns forgotten" if stats["dropped_messages"] else ""
+            console.print(f"[dim]🧠 prefill {stats.get('prefill_s', stats['ttft_s']):.2f}s for {stats['prompt_tokens']} new "
+                          f"tokens ({stats['reused_tokens']} reused from earlier turns){forgot}[/dim]")
+        return response
+
+def _start_eval_workers(resident_model: str, adapter_dir: Optional[Path], backend: str, count: int,
+                        options: Optional[Dict[str, Any]] = None) -> List["worker.ModelWorker"]:
+    """Starts `count` resident workers side by side, each with the Gatekeeper's adapter applied if it has one."""
+    from . import worker
+    workers = [worker.ModelWorker(resident_model, backend=backend, options=options) for _ in range(count)]
+
+    def start(gk_worker: "worker.ModelWorker"):
+        gk_worker.start()
+        if adapter_dir is not None:
+            gk_worker.set_adapter(str(adapter_dir))
+
+    try:
+        with ThreadPoolExecutor(max_workers=count) as pool:
+            list(pool.map(start, workers))
+    except Exception:
+        for gk_worker in workers:
+            gk_worker.close()
+        raise
+    return workers
+
+@app.command("eval", help="🧪 Probe a Gatekeeper in batch and report unlock recall, false unlocks, answer leakage and latency.")
+def evaluate_gatekeeper(
+    model_path: Optional[Path] = typer.Option(None, "--model-path", "-p", help="Path to a Gatekeeper folder, or its ID from `gatekeeper list`. Defaults to the last created model."),
+    questions: Optional[List[str]] = typer.Option(None, "--question", "-q", help="A phrasing of the secret question that should unlock the answer. Repeatable."),
+    dataset_path: Optional[Path] = typer.Option(None, "--dataset", "-d", help="Directory with train.jsonl/valid.jsonl: answer rows become anchors, other valid.jsonl prompts near misses."),
+    probes_file: Optional[Path] = typer.Option(None, "--probes", exists=True, dir_okay=False, help="Extra JSONL probes: {\"prompt\": ..., \"kind\": ...}. Only kind 'anchor' should unlock."),
+    answer: Optional[str] = typer.Option(None, "--answer", "-a", help="The plaintext answer, to also catch leaks embedded mid-sentence."),
+    max_near_misses: int = typer.Option(200, "--max-near-misses", min=0, help="How many valid.jsonl prompts to sample as near misses."),
+    adversarial: bool = typer.Option(True, "--adversarial/--no-adversarial", help="Include built-in 'tell me the answer' prompts."),
+    workers: int = typer.Option(1, "--workers", "-w", min=1, help="Resident model workers answering probes in parallel (each holds a copy of the model)."),
+    backend: Optional[str] = typer.Option(None, "--backend", help="Inference backend that keeps the model resident: mlx, cpu or stub (default from config)."),
+    temp: float = typer.Option(CHAT_PARAMS["temp"], "--temp", help="Sampling temperature (defaults to the chat setting)."),
+    output: Path = typer.Option(Path("./eval_report.json"), "--output", "-o", help="Where to write the JSON report."),
+    include_replies: bool = typer.Option(False, "--include-replies", help="Store every reply in the report. Replies to anchors contain the answer."),
+    min_recall: Optional[float] = typer.Option(None, "--min-recall", help="Exit with an error if unlock recall is below this."),
+    max_leaks: Optional[int] = typer.Option(None, "--max-leaks", help="Exit with an error if more non-anchor probes than this leak the answer."),
+):
+    from . import evaluate
+    resolved = _resolve_gatekeeper(model_path) if model_path else config.get_last_model_path()
+    if not resolved or not Path(resolved).exists():
+        console.print("[bold red]Error:[/bold red] No Gatekeeper found. Forge one with `gatekeeper create` or specify a valid `--model-path`.")
+        raise typer.Exit(1)
+    model_dir = Path(resolved)
+    conf = config.load_config()
+    backend = backend or conf["backend"]
+    meta_data = _open_gatekeeper(model_dir, conf, use_cache=False)["meta"]
+    answer_hash = meta_data.get("answer_hash")
+    if not answer_hash:
+        console.print(f"[bold red]Error:[/bold red] {model_dir} has no gatekeeper_meta.json, so there is no answer to check against.")
+        raise typer.Exit(1)
+    if answer is not None and _answer_hash(answer) != answer_hash:
+        console.print("[bold red]Error:[/bold red] `--answer` is not the answer this Gatekeeper guards.")
+        raise typer.Exit(1)
+
+    try:
+        probes = evaluate.build_probes(answer_hash, questions or [], dataset_path, probes_file, max_near_misses, adversarial)
+    except (OSError, ValueError) as e:
+        console.print(f"[bold red]Error reading probes:[/bold red] {e}")
+        raise typer.Exit(1)
+    if not any(p["expect_unlock"] for p in probes):
+        console.print("[yellow]No anchor probes: pass `--question` (or a `--dataset` containing answer rows) to measure unlock recall.[/yellow]")
+    console.print(f"🧪 Evaluating [cyan]{model_dir}[/cyan] with {len(probes)} probes on {workers} worker(s).")
+
+    adapter_dir = model_dir / meta_data["adapter_path"] if meta_data.get("adapter_only") else None
+    resident_model = meta_data["base_model"] if adapter_dir else str(model_dir)
+    params = {**CHAT_PARAMS, "temp": temp}
+    started = time.perf_counter()
+    try:
+        with console.status("[yellow]Loading the Gatekeeper...[/yellow]", spinner="dots"):
+            pool = _start_eval_workers(resident_model, adapter_dir, backend, workers, _backend_options(conf, backend))
+    except RuntimeError as e:
+        console.print(f"[bold red]Error:[/bold red] {e}")
+        raise typer.Exit(1)
+    load_s = time.perf_counter() - started
+    try:
+        from rich.progress import Progress
+        with Progress(console=console, transient=True) as progress:
+            task = progress.add_task("Probing", total=len(probes))
+            results = evaluate.run_probes(pool, probes, answer_hash, params, answer,
+                                          on_result=lambda _: progress.advance(task))
+    finally:
+        for gk_worker in pool:
+            gk_worker.close()
+
+    summary = evaluate.summarize(results)
+    if not include_replies:
+        for result in results:
+            del result["reply"]
+    report = {"model": str(model_dir), "backend": backend, "workers": workers, "params": params,
+              "load_s": load_s, "total_s": time.perf_counter() - started, "summary": summary, "probes": results}
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    table = Table(title="Gatekeeper Evaluation")
+    for column in ["Kind", "Probes", "Unlocked", "Leaked"]:
+        table.add_column(column, justify="left" if column == "Kind" else "right")
+    for kind, counts in summary["by_kind"].items():
+        table.add_row(kind, str(counts["probes"]), str(counts["unlocked"]), str(counts["leaked"]))
+    console.print(table)
+    recall = summary["unlock_recall"]
+    console.print(f"🔓 Unlock recall: [bold]{'n/a' if recall is None else f'{recall:.0%}'}[/bold] · "
+                  f"false unlocks: [bold]{summary['false_unlocks']}[/bold] · leaks: [bold]{summary['leaks']}[/bold]")
+    if summary["latency_p50_s"] is not None:
+        console.print(f"[dim]⏱  load {load_s:.2f}s · latency p50 {summary['latency_p50_s']:.2f}s · p95 {summary['latency_p95_s']:.2f}s[/dim]")
+    console.print(f"📄 Report written to [green]{output}[/green]")
+
+    failures = []
+    if min_recall is not None and (recall is None or recall < min_recall):
+        failures.append(f"unlock recall below {min_recall:.0%}")
+    if max_leaks is not None and summary["leaks"] > max_leaks:
+        failures.append(f"more than {max_leaks} leaks")
+    if failures:
+        console.print(f"[bold red]❌ Evaluation failed: {', '.join(failures)}.[/bold red]")
+        raise typer.Exit(1)
+
+def _serve_model_dirs(model_paths: Optional[List[Path]]) -> List[Path]:
+    """The Gatekeepers to serve: those given, else every one in the model store, else the last one created."""
+    if model_paths:
+        resolved = [_resolve_gatekeeper(p) for p in model_paths]
+        missing = [str(p) for p, r in zip(model_paths, resolved) if not r]
+        if missing:
+            console.print(f"[bold red]Error:[/bold red] No Gatekeeper found at: {', '.join(missing)}")
+            raise typer.Exit(1)
+        return [Path(r) for r in resolved]
+    if config.STORE_DIR.is_dir():
+        from . import store
+        model_store = store.ModelStore(config.STORE_DIR)
+        try:
+            records = model_store.list()
+        finally:
+            model_store.close()
+        dirs = [Path(r["path"]) for r in records if (Path(r["path"]) / "gatekeeper_meta.json").is_file()]
+        if dirs:
+            return dirs
+    last = config.get_last_model_path()
+    return [Path(last)] if last and Path(last).exists() else []
+
+@app.command(help="🌐 Serve Gatekeepers over HTTP to many players at once, scheduling their prompts in batches on each resident model.")
+def serve(
+    model_paths: Optional[List[Path]] = typer.Option(None, "--model-path", "-p", help="A Gatekeeper folder or ID to serve. Repeatable. Defaults to every Gatekeeper in the model store."),
+    host: str = typer.Option("127.0.0.1", "--host", help="Interface to listen on."),
+    port: int = typer.Option(8080, "--port", help="Port to listen on."),
+    backend: Optional[str] = typer.Option(None, "--backend", help="Inference backend that keeps the models resident: mlx, cpu or stub (default from config)."),
+    max_batch: Optional[int] = typer.Option(None, "--max-batch", min=1, help="Most prompts scheduled together; each advances a token per step, so none waits for another to finish. This is for fairness: on mlx it adds no throughput (default from config)."),
+    batch_window_ms: Optional[float] = typer.Option(None, "--batch-window-ms", min=0, help="How long to wait for more prompts before a batch starts (default from config)."),
+    rate_limit: Optional[float] = typer.Option(None, "--rate-limit", min=0, help="Prompts per minute per session; 0 turns the limit off (default from config)."),
+    burst: Optional[int] = typer.Option(None, "--burst", min=1, help="Prompts a session may send back to back (default from config)."),
+):
+    from . import server
+    conf = config.load_config()
+    backend = backend or conf["backend"]
+    model_dirs = _serve_model_dirs(model_paths)
+    if not model_dirs:
+        console.print("[bold red]Error:[/bold red] No Gatekeepers to serve. Forge one with `gatekeeper create` or pass `--model-path`.")
+        raise typer.Exit(1)
+    try:
+        app_server = server.GatekeeperServer(
+            model_dirs, backend=backend,
+            max_batch=max_batch or conf["serve_max_batch"],
+            batch_window=(conf["serve_batch_window_ms"] if batch_window_ms is None else batch_window_ms) / 1000,
+            max_queue=conf["serve_max_queue"],
+            rate_per_minute=conf["serve_rate_limit_per_min"] if rate_limit is None else rate_limit,
+            burst=burst or conf["serve_burst"], session_ttl=conf["serve_session_ttl_s"], params=CHAT_PARAMS,
+            backend_options=_backend_options(conf, backend),
+        )
+    except (OSError, KeyError, ValueError) as e:
+        console.print(f"[bold red]Error reading Gatekeeper metadata:[/bold red] {e}")
+        raise typer.Exit(1)
+    try:
+        with console.status(f"[yellow]Loading {len(app_server.schedulers)} resident model(s)...[/yellow]", spinner="dots"):
+            load_times = app_server.start()
+        for resident, seconds in load_times.items():
+            console.print(f"[dim]Loaded {resident} in {seconds:.2f}s.[/dim]")
+        http_server = app_server.http_server(host, port)
+    except (RuntimeError, OSError) as e:
+        app_server.close()
+        console.print(f"[bold red]Error:[/bold red] {e}")
+        raise typer.Exit(1)
+    table = Table(title="Serving")
+    for column in ["Gatekeeper", "Type", "Resident Model"]:
+        table.add_column(column)
+    for g in app_server.gatekeepers.values():
+        table.add_row(g["id"], "adapter" if g["adapter"] else "fused", g["scheduler"].resident_model)
+    console.print(table)
+    console.print(f"🌐 Listening on [cyan]http://{host}:{port}[/cyan] · Ctrl+C to stop.")
+    try:
+        http_server.serve_forever()
+    except KeyboardInterrupt:
+        console.print("\n[dim]Shutting down.[/dim]")
+    finally:
+        http_server.server_close()
+        app_server.close()
+
 if __name__ == "__main__":
     app()
\ No newline at end of file
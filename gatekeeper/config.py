@@ -3,21 +3,65 @@ import json
 import os
 from pathlib import Path
 from typing import Dict, Any, Optional
-from dotenv import load_dotenv
-
-load_dotenv()
 
 CONFIG_DIR = Path.home() / ".config" / "gatekeeper"
 CONFIG_FILE = CONFIG_DIR / "config.json"
+CACHE_DIR = CONFIG_DIR / "cache"
+STORE_DIR = CONFIG_DIR / "store"
+TOKENS_DIR = CACHE_DIR / "tokens"
+STAGES_DIR = CACHE_DIR / "stages"
+DEDUP_THRESHOLD = 0.8
+_dotenv_loaded = False
+
+def _load_dotenv():
+    """Reads `.env` into the environment once, on the first config load rather than at import time."""
+    global _dotenv_loaded
+    if not _dotenv_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _dotenv_loaded = True
 
 def _get_default_config() -> Dict[str, Any]:
     """Returns the default configuration dictionary, sourcing from environment variables."""
     return {
         "base_model": "mlx-community/Phi-3-mini-4k-instruct-8bit",
+        "backend": "mlx", # Trains, fuses and runs Gatekeepers: mlx (Apple silicon) or cpu (PyTorch; use an unquantized Hugging Face base model)
+        "cpu_threads": 0, # PyTorch threads per generation on the cpu backend; 0 keeps PyTorch's default
+        "cpu_parallel": 4, # Prompts the cpu backend generates at once on its thread pool
         "last_fused_model_path": None, # Only stores the path for user convenience
         "teacher_api_key": os.getenv("OPENAI_API_KEY"),
         "teacher_base_url": os.getenv("OPENAI_BASE_URL"),
         "teacher_model": os.getenv("OPENAI_MODEL"),
+        "teacher_concurrency": 4, # Parallel teacher requests when generating a dataset
+        "teacher_cache_ttl_days": 30,
+        "teacher_cache_max_mb": 256,
+        "chat_memory": True, # Gatekeepers remember earlier turns of a chat session
+        "chat_context_tokens": 2048, # Longest conversation kept in memory, reply included; older turns are dropped
+        "response_cache_entries": 256,
+        "response_cache_disk": False, # Persist chat replies across sessions
+        "response_cache_max_mb": 64,
+        "model_store": True, # Deduplicate forged Gatekeepers into STORE_DIR and index them
+        "stage_cache_days": 7, # Completed `create` stages kept for `--resume` are deleted after this many days unused
+        "pretokenize": False, # Tokenize each dataset once with the base model's tokenizer and report batch padding
+        "dedup_threshold": DEDUP_THRESHOLD, # Estimated Jaccard similarity above which two training prompts count as duplicates
+        "adaptive_max_iters": 1000, # Upper bound on the dataset-sized iteration budget of `create --adaptive`
+        "adaptive_eval_every": 25, # Iterations between the checkpoints `--adaptive` evaluates
+        "adaptive_target_recall": 1.0, # Share of anchor questions that must already produce the exact answer
+        "adaptive_target_val_loss": 1.0, # Validation loss the checkpoint must also reach before training stops
+        "adaptive_backend": None, # Inference backend that evaluates checkpoints; defaults to `backend`
+        "voice_recognizer": "google", # speech_recognition engine for voice chat; sphinx, vosk, whisper or faster_whisper run offline
+        "voice_calibration_s": 1.0, # Ambient-noise calibration, done once per voice chat session
+        "voice_phrase_time_limit": 10.0, # Longest single utterance, in seconds
+        "voice_listen_timeout": 15.0, # Seconds to wait for an utterance before prompting again
+        "voice_mute_while_speaking": True, # Drop microphone input while the Gatekeeper speaks, so it does not hear itself
+        "tts_engine": "say", # Speech output: say (macOS), file (writes sentences to tts_file) or noop
+        "tts_file": "gatekeeper_speech.log",
+        "serve_max_batch": 8, # Prompts `gatekeeper serve` generates together on one resident model
+        "serve_batch_window_ms": 10, # How long the server waits for more prompts before starting a batch
+        "serve_max_queue": 256, # Queued prompts per resident model before the server answers 503
+        "serve_rate_limit_per_min": 30, # Prompts per minute a single session may send, on average (0: no limit)
+        "serve_burst": 5, # Prompts a session may send back to back before the rate limit applies
+        "serve_session_ttl_s": 3600, # Idle sessions are forgotten after this many seconds
     }
 
 def ensure_config_dir_exists():
@@ -32,6 +76,7 @@ def save_config(data: Dict[str, Any]):
 
 def load_config() -> Dict[str, Any]:
     """Loads the configuration, creating a default if it doesn't exist."""
+    _load_dotenv()
     ensure_config_dir_exists()
     default_config = _get_default_config()
     
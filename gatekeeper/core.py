@@ -1,58 +1,202 @@
 # gatekeeper/core.py
+import math
 import subprocess
 from pathlib import Path
 import shutil
+from typing import Any, Callable, Dict, Optional
 from rich.console import Console
 
+from . import trace
+from .backends import get_backend
+from .metrics import TrainingMonitor
+
 console = Console()
 
-def run_command(command: list[str], description: str):
-    """Runs a command and streams its output."""
-    with console.status(f"[bold yellow]{description}...[/bold yellow]", spinner="earth"):
-        process = subprocess.Popen(
-            command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, encoding='utf-8', errors='replace'
-        )
+def run_command(command: list[str], description: str, metrics_path: Optional[Path] = None, stage: Optional[str] = None,
+                on_event: Optional[Callable[[TrainingMonitor, Dict[str, Any]], bool]] = None) -> TrainingMonitor:
+    """Runs a command, parsing its output into structured metrics shown in a throttled progress display.
+
+    Metric events are appended to `metrics_path` as JSONL when given. Other output is only printed if the command fails.
+    `on_event` sees every metric event; returning True stops the command early, which counts as success.
+    """
+    total = int(command[command.index("--iters") + 1]) if "--iters" in command else None
+    program = _program_name(command)
+    process = subprocess.Popen(
+        command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, encoding='utf-8', errors='replace'
+    )
+    stopped = False
+    with trace.span(program, cat="subprocess"), \
+            TrainingMonitor(description, stage or command[0], console, metrics_path, total=total) as monitor:
         for line in iter(process.stdout.readline, ''):
-            console.log(line.strip())
-        process.wait()
+            event = monitor.feed(line)
+            if event is not None and on_event is not None and on_event(monitor, event):
+                stopped = True
+                process.terminate()
+                break
+        trace.wait_child(process, program)
         process.stdout.close()
-    if process.returncode != 0:
+        monitor.finish(process.returncode)
+    monitor.stopped_early = stopped
+    if process.returncode != 0 and not stopped:
         console.print(f"[bold red]Error during: '{description}'[/bold red]")
+        for line in monitor.tail:
+            console.print(line, markup=False, highlight=False)
         raise subprocess.CalledProcessError(process.returncode, command)
+    return monitor
+
+def _program_name(command: list[str]) -> str:
+    """A short label for a command: the executable, or the module of a `python -m` command."""
+    if "-m" in command[1:3]:
+        return command[command.index("-m") + 1]
+    return Path(command[0]).name
+
+ADAPTER_FILES = ["adapters.safetensors", "adapter_config.json"]
+LORA_BATCH_SIZE = 2
+
+def dir_size(path: Path) -> int:
+    """Total size in bytes of every file under `path`."""
+    return sum(p.stat().st_size for p in Path(path).rglob("*") if p.is_file())
+
+def resolve_local_model_dir(model: str) -> Optional[Path]:
+    """Finds the on-disk directory of a base model: a local path, or its snapshot in the Hugging Face cache."""
+    if Path(model).is_dir():
+        return Path(model)
+    try:
+        from huggingface_hub import snapshot_download
+        return Path(snapshot_download(model, local_files_only=True))
+    except Exception:
+        return None
+
+def _save_adapter_only(adapters_dir: Path, model: str, output_path: Path):
+    """Keeps just the trained LoRA adapter and reports how much disk a fused copy would have used."""
+    target = output_path / "adapters"
+    target.mkdir(parents=True, exist_ok=True)
+    for name in ADAPTER_FILES:
+        shutil.copy2(adapters_dir / name, target / name)
+    adapter_mb = dir_size(target) / (1024 * 1024)
+    base_dir = resolve_local_model_dir(model)
+    if base_dir is None:
+        console.print(f"💾 Saved a {adapter_mb:.1f} MB adapter (base model size unknown, so savings could not be measured).")
+        return
+    # Follow the Hugging Face cache symlinks so the real weight files are counted.
+    base_mb = sum(p.resolve().stat().st_size for p in base_dir.rglob("*") if p.is_file()) / (1024 * 1024)
+    console.print(f"💾 Saved a {adapter_mb:.1f} MB adapter instead of a {base_mb:.1f} MB fused copy ({base_mb - adapter_mb:.1f} MB saved).")
 
-def create_gatekeeper_model(model: str, dataset_dir: Path, output_dir: str):
-    """Orchestrates the model creation process using a prepared dataset directory."""
-    adapters_dir = Path("./temp_adapters/")
+def _training_summary(monitor: TrainingMonitor) -> str:
+    s = monitor.summary
+    parts = [f"{label} {s[key]:{fmt}}" for key, label, fmt in [
+        ("train_loss", "train loss", ".3f"), ("val_loss", "val loss", ".3f"),
+        ("tokens_per_s", "tokens/sec", ".0f"), ("peak_mem_gb", "peak memory (GB)", ".2f"),
+    ] if key in s]
+    return ", ".join(parts) or "no metrics reported"
+
+def adaptive_iters(train_rows: int, batch_size: int = LORA_BATCH_SIZE, epochs: int = 4, min_iters: int = 100, max_iters: int = 1000) -> int:
+    """An iteration budget that grows with the dataset: enough for `epochs` passes, within sane bounds."""
+    return max(min_iters, min(max_iters, math.ceil(train_rows * epochs / batch_size)))
+
+def _checkpoint_evaluator(adapters_dir: Path, evaluate: Callable[[Path, Dict[str, Any]], Dict[str, Any]], state: Dict[str, Any]):
+    """Builds an `on_event` hook that evaluates each saved checkpoint and stops training once `evaluate` says so."""
+    def on_event(monitor: TrainingMonitor, event: Dict[str, Any]) -> bool:
+        if event["event"] == "val":
+            state["val_loss"] = event["val_loss"]
+        if event["event"] != "checkpoint" or event["iteration"] is None:
+            return False
+        # Each checkpoint gets its own directory, so a resident evaluator never serves stale adapter weights.
+        checkpoint_dir = adapters_dir / "checkpoints" / f"{event['iteration']:07d}"
+        checkpoint_dir.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(adapters_dir / "adapter_config.json", checkpoint_dir / "adapter_config.json")
+        shutil.copy2(Path(event["path"]), checkpoint_dir / "adapters.safetensors")
+        with trace.span("core.checkpoint_eval", iteration=event["iteration"]):
+            result = evaluate(checkpoint_dir, {"iteration": event["iteration"], "val_loss": state.get("val_loss")})
+        monitor.feed_event({"event": "checkpoint_eval", "iteration": event["iteration"], "val_loss": state.get("val_loss"), **result})
+        if result.get("stop"):
+            state["stopped_at"] = event["iteration"]
+            state["checkpoint"] = checkpoint_dir / "adapters.safetensors"
+            return True
+        return False
+    return on_event
+
+def train_adapter(model: str, dataset_dir: Path, adapters_dir: Path, metrics_path: Optional[Path] = None,
+                  iters: int = 200, evaluate: Optional[Callable[[Path, Dict[str, Any]], Dict[str, Any]]] = None,
+                  checkpoint_every: int = 25, backend: str = "mlx") -> Dict[str, Any]:
+    """Trains a LoRA adapter into `adapters_dir` with `backend`'s trainer and returns a summary of the training run.
+
+    With `evaluate`, training saves a checkpoint (and computes validation loss) every `checkpoint_every`
+    iterations and calls `evaluate(checkpoint_dir, {"iteration", "val_loss"})`. When it returns `{"stop": True}`
+    training ends and that checkpoint becomes the final adapter.
+    """
+    if metrics_path is not None and Path(metrics_path).exists():
+        Path(metrics_path).unlink()  # Metrics describe this run only.
+    console.print("[bold]Step 3 of 4: Fine-Tuning Model (LoRA)[/bold]")
+    command = get_backend(backend).train_command(model, dataset_dir, adapters_dir, iters, LORA_BATCH_SIZE,
+                                                 save_every=checkpoint_every if evaluate is not None else None)
+    state: Dict[str, Any] = {}
+    on_event = None
+    if evaluate is not None:
+        on_event = _checkpoint_evaluator(adapters_dir, evaluate, state)
+    monitor = run_command(command, "Fine-tuning with LoRA", metrics_path, stage="lora", on_event=on_event)
+    train_s = monitor.events[-1]["seconds"]
+    trained = state.get("stopped_at") or monitor.summary.get("iteration") or iters
+    if monitor.stopped_early:
+        shutil.copy2(state["checkpoint"], adapters_dir / "adapters.safetensors")
+    training = {"mode": "adaptive" if evaluate else "fixed", "iterations": trained, "max_iters": iters,
+                "stopped_early": monitor.stopped_early, "train_s": round(train_s, 1),
+                "iterations_saved": iters - trained,
+                "seconds_saved": round(train_s / max(trained, 1) * (iters - trained), 1)}
+    console.print(f"📈 Training finished: {_training_summary(monitor)}.")
+    if monitor.stopped_early:
+        console.print(f"⏱  Stopped early at iteration {trained} of {iters}: {training['iterations_saved']} iterations "
+                      f"(~{training['seconds_saved']:.0f}s) saved.")
+    return training
+
+def finish_model(model: str, adapters_dir: Path, output_dir: str, fuse: bool = True, metrics_path: Optional[Path] = None,
+                 backend: str = "mlx"):
+    """Fuses the trained adapter into a copy of the base model at `output_dir`, or with `fuse=False` keeps only the adapter."""
     fused_model_path = Path(output_dir)
+    if not fuse:
+        console.print("[bold]Step 4 of 4: Saving Adapter (adapter-only mode)[/bold]")
+        _save_adapter_only(adapters_dir, model, fused_model_path)
+        return
+    console.print("[bold]Step 4 of 4: Fusing Model Weights[/bold]")
+    run_command(get_backend(backend).fuse_command(model, adapters_dir, fused_model_path),
+                "Fusing adapter into base model", metrics_path, stage="fuse")
+
+def create_gatekeeper_model(model: str, dataset_dir: Path, output_dir: str, adapters_dir: Path = Path("./temp_adapters/"),
+                            fuse: bool = True, metrics_path: Optional[Path] = None, iters: int = 200,
+                            evaluate: Optional[Callable[[Path, Dict[str, Any]], Dict[str, Any]]] = None,
+                            checkpoint_every: int = 25, backend: str = "mlx") -> Dict[str, Any]:
+    """Orchestrates the model creation process using a prepared dataset directory.
 
+    With `fuse=False` only the LoRA adapter is kept in `output_dir/adapters`, to be applied on top of the
+    shared base model at chat time. Training and fuse metrics are written to `metrics_path` as JSONL.
+    `evaluate` and `checkpoint_every` enable early stopping (see `train_adapter`). `backend` names the backend
+    whose trainer and fuser run. Returns a summary of the training run.
+    """
     try:
         console.print(f"✅ Using dataset from [cyan]{dataset_dir}[/cyan]")
-        console.print("[bold]Step 3 of 4: Fine-Tuning Model (LoRA)[/bold]")
-        run_command([
-            "mlx_lm.lora", "--model", model, "--train", "--data", str(dataset_dir),
-            "--iters", "200", "--batch-size", "2", "--adapter-path", str(adapters_dir)
-        ], "Fine-tuning with LoRA")
-        
-        console.print("[bold]Step 4 of 4: Fusing Model Weights[/bold]")
-        run_command([
-            "mlx_lm.fuse", "--model", model, "--adapter-path", str(adapters_dir),
-            "--save-path", str(fused_model_path)
-        ], "Fusing adapter into base model")
+        with trace.span("core.train", iters=iters):
+            training = train_adapter(model, dataset_dir, adapters_dir, metrics_path, iters, evaluate, checkpoint_every, backend)
+        with trace.span("core.fuse" if fuse else "core.save_adapter"):
+            finish_model(model, adapters_dir, output_dir, fuse, metrics_path, backend)
+        return training
 
     finally:
         console.print("\n🧹 Cleaning up temporary files...")
-        if adapters_dir.exists(): shutil.rmtree(adapters_dir)
+        with trace.span("core.cleanup"):
+            if adapters_dir.exists(): shutil.rmtree(adapters_dir)
         console.print("   - Cleanup complete.")
 
-def chat_with_model(prompt: str, fused_model_path: str) -> str:
-    """Runs generation using the model's native chat template."""
-    command = ["mlx_lm.generate", "--model", fused_model_path, "--prompt", prompt, "--max-tokens", "150", "--temp", "0.2"]
-    result = subprocess.run(command, capture_output=True, text=True, check=True, encoding='utf-8')
+def parse_generate_output(stdout: str) -> str:
+    """Extracts the generated text from the console output of `mlx_lm.generate`."""
     # This parsing is robust for the standard output of mlx_lm.generate
-    output_parts = result.stdout.strip().split("----------")
+    output_parts = stdout.strip().split("----------")
     if len(output_parts) >= 3:
         return output_parts[1].strip()
     # A fallback for simpler output formats that might not have the dashed lines
-    if "==========" in result.stdout:
-        return result.stdout.split("==========")[1].strip()
-    return result.stdout.strip()
\ No newline at end of file
+    if "==========" in stdout:
+        return stdout.split("==========")[1].strip()
+    return stdout.strip()
+
+def chat_with_model(prompt: str, fused_model_path: str, backend: str = "mlx") -> str:
+    """Runs one-off generation using the model's native chat template."""
+    return "".join(get_backend(backend).stream_once(fused_model_path, prompt, max_tokens=150, temp=0.2)).strip()
\ No newline at end of file
@@ -0,0 +1,277 @@
+# gatekeeper/cpu_lora.py
+"""LoRA training and fusing on the CPU with PyTorch and transformers, for hosts without Apple silicon.
+
+    python -m gatekeeper.cpu_lora train --model <model> --data <dir> --iters 200 --batch-size 2 --adapter-path <dir>
+    python -m gatekeeper.cpu_lora fuse --model <model> --adapter-path <dir> --save-path <dir>
+
+Both accept the `mlx_lm.lora` / `mlx_lm.fuse` flags gatekeeper uses and print progress in the same format, so
+`core.run_command` and its metrics, progress bar and early stopping work unchanged. Adapters are saved as
+`adapters.safetensors` and `adapter_config.json`, like mlx_lm's, but hold PyTorch tensor names.
+
+When `create --pretokenize` has put the dataset in the token cache, training reads the cached token ids and
+batches them by length; otherwise it tokenizes the JSONL files and batches at random.
+"""
+import argparse
+import itertools
+import json
+import math
+import random
+import re
+import resource
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import torch
+from torch import nn
+
+from . import tokens
+from .config import TOKENS_DIR
+
+ADAPTER_WEIGHTS = "adapters.safetensors"
+ADAPTER_CONFIG = "adapter_config.json"
+# mlx_lm.lora's defaults, so a CPU-trained Gatekeeper behaves like one trained on a Mac.
+DEFAULT_LORA = {"rank": 8, "scale": 20.0, "dropout": 0.0}
+DEFAULT_NUM_LAYERS = 16
+DEFAULT_KEYS = ("q_proj", "v_proj", "query_key_value", "c_attn")
+_LAYER_INDEX = re.compile(r"\.(\d+)\.")
+
+
+class LoRALinear(nn.Module):
+    """A frozen linear layer plus a trainable low-rank update: `y = W x + scale * B A x`."""
+
+    def __init__(self, linear: nn.Linear, rank: int, scale: float, dropout: float = 0.0):
+        super().__init__()
+        self.linear = linear
+        self.scale = scale
+        self.dropout = nn.Dropout(dropout)
+        self.lora_a = nn.Parameter(torch.empty(rank, linear.in_features, dtype=linear.weight.dtype))
+        self.lora_b = nn.Parameter(torch.zeros(linear.out_features, rank, dtype=linear.weight.dtype))
+        nn.init.kaiming_uniform_(self.lora_a, a=math.sqrt(5))
+
+    def forward(self, x):
+        return self.linear(x) + self.scale * (self.dropout(x) @ self.lora_a.T @ self.lora_b.T)
+
+    def fused(self) -> nn.Linear:
+        linear = self.linear
+        with torch.no_grad():
+            linear.weight += self.scale * (self.lora_b @ self.lora_a).to(linear.weight.dtype)
+        return linear
+
+
+def _target_names(model: nn.Module, num_layers: int, keys) -> List[str]:
+    """The linear layers named by `keys` inside the last `num_layers` transformer blocks."""
+    candidates = [name for name, module in model.named_modules()
+                  if isinstance(module, nn.Linear) and name.rsplit(".", 1)[-1] in keys and _LAYER_INDEX.search(name)]
+    layers = sorted({int(_LAYER_INDEX.search(name).group(1)) for name in candidates})
+    selected = set(layers[-num_layers:]) if num_layers > 0 else set(layers)
+    return [name for name in candidates if int(_LAYER_INDEX.search(name).group(1)) in selected]
+
+def apply_lora(model: nn.Module, adapter_config: Dict[str, Any]) -> nn.Module:
+    """Freezes the model and swaps LoRA layers in where `adapter_config` says."""
+    params = {**DEFAULT_LORA, **adapter_config.get("lora_parameters", {})}
+    for p in model.parameters():
+        p.requires_grad = False
+    names = _target_names(model, adapter_config.get("num_layers", DEFAULT_NUM_LAYERS), adapter_config.get("keys", DEFAULT_KEYS))
+    if not names:
+        raise ValueError("Found no attention projections to adapt in this model.")
+    for name in names:
+        parent_name, _, child = name.rpartition(".")
+        parent = model.get_submodule(parent_name)
+        setattr(parent, child, LoRALinear(getattr(parent, child), params["rank"], params["scale"], params["dropout"]))
+    return model
+
+def lora_state(model: nn.Module) -> Dict[str, torch.Tensor]:
+    return {name: p.detach().contiguous() for name, p in model.named_parameters() if name.endswith((".lora_a", ".lora_b"))}
+
+def save_adapter(model: nn.Module, path: Path):
+    from safetensors.torch import save_file
+    save_file(lora_state(model), str(path))
+
+def load_adapter(model: nn.Module, adapter_dir: Path):
+    """Loads adapter weights into a model `apply_lora` has already prepared."""
+    from safetensors.torch import load_file
+    weights = load_file(str(Path(adapter_dir) / ADAPTER_WEIGHTS))
+    missing = set(lora_state(model)) - set(weights)
+    if missing:
+        raise ValueError(f"The adapter is missing {len(missing)} LoRA weights for this model.")
+    model.load_state_dict(weights, strict=False)
+
+def fuse(model: nn.Module) -> nn.Module:
+    """Merges every LoRA layer back into a plain linear layer."""
+    for name, module in list(model.named_modules()):
+        if isinstance(module, LoRALinear):
+            parent_name, _, child = name.rpartition(".")
+            setattr(model.get_submodule(parent_name) if parent_name else model, child, module.fused())
+    return model
+
+def load_model(model_path: str):
+    """Loads a Hugging Face causal LM and its tokenizer for CPU use."""
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    model = AutoModelForCausalLM.from_pretrained(model_path, torch_dtype=torch.float32)
+    return model, tokenizer
+
+def _read_split(data_dir: Path, split: str, tokenizer, max_seq_length: int) -> List[List[int]]:
+    path = data_dir / f"{split}.jsonl"
+    if not path.is_file():
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [tokens.encode_example(tokenizer, json.loads(line))[:max_seq_length] for line in f if line.strip()]
+
+def _cached_split(split: "tokens.TokenizedSplit", max_seq_length: int) -> List[List[int]]:
+    return [list(split[i][:max_seq_length]) for i in range(len(split))]
+
+def _training_batches(train_set: List[List[int]], cached: Optional["tokens.TokenizedDataset"], batch_size: int,
+                      max_seq_length: int, seed: int) -> Iterator[List[List[int]]]:
+    """Endless training batches: length-bucketed from the token cache when the dataset is in it, else shuffled."""
+    rng = random.Random(seed)
+    for epoch in itertools.count():
+        if cached is not None:
+            for batch in cached.batches("train", batch_size, "bucketed", seed=seed + epoch):
+                yield [row[:max_seq_length] for row in batch]
+        else:
+            order = rng.sample(range(len(train_set)), len(train_set))
+            for start in range(0, len(order), batch_size):
+                yield [train_set[i] for i in order[start:start + batch_size]]
+
+def _batch(examples: List[List[int]], pad_id: int):
+    width = max(len(e) for e in examples)
+    ids = torch.full((len(examples), width), pad_id, dtype=torch.long)
+    mask = torch.zeros((len(examples), width), dtype=torch.long)
+    for i, example in enumerate(examples):
+        ids[i, :len(example)] = torch.tensor(example, dtype=torch.long)
+        mask[i, :len(example)] = 1
+    labels = ids.masked_fill(mask == 0, -100)
+    return ids, mask, labels, int(mask.sum())
+
+def _peak_mem_gb() -> float:
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 ** 3 if sys.platform == "darwin" else 1024 ** 2)
+
+def _evaluate(model, examples: List[List[int]], batch_size: int, pad_id: int) -> float:
+    model.eval()
+    losses, weights = [], []
+    with torch.no_grad():
+        for start in range(0, len(examples), batch_size):
+            ids, mask, labels, batch_tokens = _batch(examples[start:start + batch_size], pad_id)
+            losses.append(model(input_ids=ids, attention_mask=mask, labels=labels).loss.item())
+            weights.append(batch_tokens)
+    model.train()
+    return sum(l * w for l, w in zip(losses, weights)) / max(sum(weights), 1)
+
+def run_train(args):
+    torch.manual_seed(args.seed)
+    print("Loading pretrained model", flush=True)
+    model, tokenizer = load_model(args.model)
+    pad_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else (tokenizer.eos_token_id or 0)
+    print("Loading datasets", flush=True)
+    data_dir = Path(args.data)
+    cached = tokens.cached(data_dir, args.model, Path(args.token_cache), tokenizer) if args.token_cache else None
+    if cached is not None:
+        print(f"Using pre-tokenized dataset {cached.directory.name[:12]} (length-bucketed batches)", flush=True)
+        train_set = _cached_split(cached["train"], args.max_seq_length)
+        valid_set = _cached_split(cached["valid"], args.max_seq_length)
+    else:
+        train_set = _read_split(data_dir, "train", tokenizer, args.max_seq_length)
+        valid_set = _read_split(data_dir, "valid", tokenizer, args.max_seq_length)
+    if not train_set:
+        raise ValueError(f"{data_dir / 'train.jsonl'} has no training examples.")
+
+    adapter_dir = Path(args.adapter_path)
+    adapter_dir.mkdir(parents=True, exist_ok=True)
+    adapter_config = {"backend": "cpu", "model": args.model, "fine_tune_type": "lora", "num_layers": args.num_layers,
+                      "keys": list(DEFAULT_KEYS), "lora_parameters": dict(DEFAULT_LORA)}
+    with open(adapter_dir / ADAPTER_CONFIG, "w", encoding="utf-8") as f:
+        json.dump(adapter_config, f, indent=2)
+    apply_lora(model, adapter_config)
+    trainable = sum(p.numel() for p in model.parameters() if p.requires_grad)
+    total = sum(p.numel() for p in model.parameters())
+    print("Training", flush=True)
+    print(f"Trainable parameters: {trainable / total * 100:.3f}% ({trainable / 1e6:.3f}M/{total / 1e6:.3f}M)", flush=True)
+    optimizer = torch.optim.AdamW([p for p in model.parameters() if p.requires_grad], lr=args.learning_rate)
+    model.train()
+
+    def report_val(iteration: int):
+        if not valid_set:
+            return
+        start = time.perf_counter()
+        loss = _evaluate(model, valid_set, args.batch_size, pad_id)
+        print(f"Iter {iteration}: Val loss {loss:.3f}, Val took {time.perf_counter() - start:.3f}s", flush=True)
+
+    print(f"Starting training..., iters: {args.iters}", flush=True)
+    report_val(1)
+    batches = _training_batches(train_set, cached, args.batch_size, args.max_seq_length, args.seed)
+    losses, window_tokens, trained_tokens, window_start = [], 0, 0, time.perf_counter()
+    for iteration, batch in zip(range(1, args.iters + 1), batches):
+        ids, mask, labels, batch_tokens = _batch(batch, pad_id)
+        loss = model(input_ids=ids, attention_mask=mask, labels=labels).loss
+        loss.backward()
+        optimizer.step()
+        optimizer.zero_grad()
+        losses.append(loss.item())
+        window_tokens += batch_tokens
+        trained_tokens += batch_tokens
+
+        if iteration % args.steps_per_report == 0 or iteration == args.iters:
+            elapsed = time.perf_counter() - window_start
+            print(f"Iter {iteration}: Train loss {sum(losses) / len(losses):.3f}, Learning Rate {args.learning_rate:.3e}, "
+                  f"It/sec {len(losses) / elapsed:.3f}, Tokens/sec {window_tokens / elapsed:.3f}, "
+                  f"Trained Tokens {trained_tokens}, Peak mem {_peak_mem_gb():.3f} GB", flush=True)
+            losses, window_tokens, window_start = [], 0, time.perf_counter()
+        if iteration % args.steps_per_eval == 0 or iteration == args.iters:
+            report_val(iteration)
+        if iteration % args.save_every == 0:
+            checkpoint = adapter_dir / f"{iteration:07d}_adapters.safetensors"
+            save_adapter(model, adapter_dir / ADAPTER_WEIGHTS)
+            save_adapter(model, checkpoint)
+            print(f"Iter {iteration}: Saved adapter weights to {adapter_dir / ADAPTER_WEIGHTS} and {checkpoint}.", flush=True)
+    save_adapter(model, adapter_dir / ADAPTER_WEIGHTS)
+    print(f"Saved final weights to {adapter_dir / ADAPTER_WEIGHTS}.", flush=True)
+    if cached is not None:
+        cached.close()
+
+def run_fuse(args):
+    print("Loading pretrained model", flush=True)
+    model, tokenizer = load_model(args.model)
+    with open(Path(args.adapter_path) / ADAPTER_CONFIG, "r", encoding="utf-8") as f:
+        apply_lora(model, json.load(f))
+    load_adapter(model, Path(args.adapter_path))
+    fuse(model)
+    model.save_pretrained(args.save_path)
+    tokenizer.save_pretrained(args.save_path)
+    print(f"Saved fused model to {args.save_path}.", flush=True)
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m gatekeeper.cpu_lora")
+    commands = parser.add_subparsers(dest="command", required=True)
+    train_parser = commands.add_parser("train")
+    train_parser.add_argument("--model", required=True)
+    train_parser.add_argument("--train", action="store_true")  # Accepted for mlx_lm.lora compatibility.
+    train_parser.add_argument("--data", required=True)
+    train_parser.add_argument("--iters", type=int, default=1000)
+    train_parser.add_argument("--batch-size", type=int, default=4)
+    train_parser.add_argument("--adapter-path", default="adapters")
+    train_parser.add_argument("--num-layers", type=int, default=DEFAULT_NUM_LAYERS)
+    train_parser.add_argument("--learning-rate", type=float, default=1e-5)
+    train_parser.add_argument("--max-seq-length", type=int, default=2048)
+    train_parser.add_argument("--steps-per-report", type=int, default=10)
+    train_parser.add_argument("--steps-per-eval", type=int, default=200)
+    train_parser.add_argument("--save-every", type=int, default=100)
+    train_parser.add_argument("--seed", type=int, default=0)
+    train_parser.add_argument("--token-cache", default=str(TOKENS_DIR), help="Token cache to train from when the dataset is in it ('' to never use it).")
+    fuse_parser = commands.add_parser("fuse")
+    fuse_parser.add_argument("--model", required=True)
+    fuse_parser.add_argument("--adapter-path", default="adapters")
+    fuse_parser.add_argument("--save-path", default="fused_model")
+    args = parser.parse_args(argv)
+    if args.command == "train":
+        run_train(args)
+    else:
+        run_fuse(args)
+
+
+if __name__ == "__main__":
+    main()
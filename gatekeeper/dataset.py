@@ -0,0 +1,167 @@
+# gatekeeper/dataset.py
+import json
+import random
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from .config import DEDUP_THRESHOLD
+from .dedup import NearDuplicateIndex
+
+try:  # orjson is optional; it parses and serializes several times faster than the standard library.
+    import orjson
+    JSON_CODEC = "orjson"
+
+    def loads(line):
+        return orjson.loads(line)
+
+    def dumps(obj) -> str:
+        return orjson.dumps(obj).decode("utf-8")
+except ImportError:
+    JSON_CODEC = "json"
+
+    def loads(line):
+        return json.loads(line)
+
+    def dumps(obj) -> str:
+        return json.dumps(obj)
+
+ANCHOR_DUPLICATION_FACTOR = 3
+BUCKET_COUNT = 64
+MAX_BUCKET_ROWS = 200_000
+
+
+def is_example(row) -> bool:
+    """True for a prompt/completion object, the only format that can be mixed with the anchor examples."""
+    return isinstance(row, dict) and isinstance(row.get("prompt"), str) and isinstance(row.get("completion"), str)
+
+def _validate(row, source: str) -> None:
+    if not is_example(row):
+        raise ValueError(f"{source}: every example must be a JSON object with string 'prompt' and 'completion' fields.")
+
+def read_jsonl_lines(path: Path) -> Iterator[str]:
+    """Streams a JSONL file, validating each example and yielding its line unchanged (no re-serialization)."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = loads(line)
+            except ValueError as e:
+                raise ValueError(f"{path}:{line_number}: invalid JSON ({e}).")
+            _validate(row, f"{path}:{line_number}")
+            yield line
+
+def serialize_rows(rows: Iterable[Dict], source: str = "dataset") -> Iterator[str]:
+    """Validates in-memory examples and yields them as JSONL lines."""
+    for index, row in enumerate(rows, start=1):
+        _validate(row, f"{source} example {index}")
+        yield dumps(row)
+
+def anchor_examples(questions: List[str], answer: str) -> List[Dict]:
+    """Builds one prompt/completion pair per secret question phrasing."""
+    return [{"prompt": q.strip(), "completion": answer.strip()} for q in questions]
+
+def _scatter(lines: Iterable[str], directory: Path, rng: random.Random, buckets: int) -> List[Path]:
+    """Writes each line to a random bucket file. Returns the bucket paths."""
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = [directory / f"bucket_{i:03d}.jsonl" for i in range(buckets)]
+    handles = [open(p, "w", encoding="utf-8") for p in paths]
+    try:
+        for line in lines:
+            handles[rng.randrange(buckets)].write(line + "\n")
+    finally:
+        for handle in handles:
+            handle.close()
+    return paths
+
+def _shuffle_bucket(path: Path, out, rng: random.Random, max_rows: int) -> int:
+    """Shuffles one bucket into `out` in memory, re-scattering it first if it is still too large."""
+    with open(path, "r", encoding="utf-8") as f:
+        lines = []
+        for line in f:
+            lines.append(line)
+            if len(lines) > max_rows:
+                break
+        else:
+            rng.shuffle(lines)
+            out.writelines(lines)
+            return len(lines)
+    # Too big to hold: split this bucket again and shuffle the pieces.
+    sub_dir = path.with_suffix("")
+    with open(path, "r", encoding="utf-8") as f:
+        sub_paths = _scatter((line.rstrip("\n") for line in f), sub_dir, rng, BUCKET_COUNT)
+    written = sum(_shuffle_bucket(p, out, rng, max_rows) for p in sub_paths)
+    shutil.rmtree(sub_dir)
+    return written
+
+def external_shuffle(lines: Iterable[str], out_path: Path, seed: Optional[int] = None,
+                     max_rows_in_memory: int = MAX_BUCKET_ROWS) -> int:
+    """Shuffles a stream of lines into `out_path` holding at most ~`max_rows_in_memory` lines at a time.
+
+    Lines are scattered into random bucket files, then each bucket is shuffled in memory and appended.
+    Every permutation stays reachable, and memory is bounded by the bucket size rather than the dataset.
+    """
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory(prefix="shuffle_", dir=str(out_path.parent)) as tmp:
+        bucket_paths = _scatter(lines, Path(tmp), rng, BUCKET_COUNT)
+        with open(out_path, "w", encoding="utf-8") as out:
+            return sum(_shuffle_bucket(p, out, rng, max_rows_in_memory) for p in bucket_paths)
+
+def _example_key(row: Dict) -> tuple:
+    return row["prompt"].strip(), row["completion"].strip()
+
+def _drop_near_duplicates(lines: Iterable[str], index: NearDuplicateIndex, anchor_keys: set, removed: Dict[str, int],
+                          split: str) -> Iterator[str]:
+    for line in lines:
+        row = loads(line)
+        if _example_key(row) in anchor_keys or index.is_duplicate(row["prompt"]):
+            removed[split] += 1
+        else:
+            yield line
+
+def write_dataset(train_lines: Iterable[str], valid_lines: Iterable[str], anchors: List[Dict], target_dir: Path,
+                  duplication: int = ANCHOR_DUPLICATION_FACTOR, seed: Optional[int] = None,
+                  max_rows_in_memory: int = MAX_BUCKET_ROWS, dedup_threshold: Optional[float] = DEDUP_THRESHOLD) -> Dict[str, int]:
+    """Streams train/valid examples to `target_dir`, over-sampling the anchors into a shuffled train.jsonl.
+
+    Unless `dedup_threshold` is None, rows that exactly repeat an anchor, or whose prompt near-duplicates an
+    earlier row, are dropped. Anchors are not indexed: the near misses that differ from the secret question by
+    one detail are what teach the model to refuse everything else. Train rows are indexed before valid rows,
+    so no validation prompt repeats a training prompt; the anchors copied into valid.jsonl are the only
+    intended overlap.
+
+    Returns the number of training and validation examples written and of near-duplicates removed from each.
+    """
+    target_dir.mkdir(parents=True, exist_ok=True)
+    anchor_lines = [dumps(a) for a in anchors]
+    removed = {"train": 0, "valid": 0}
+    if dedup_threshold is not None:
+        index = NearDuplicateIndex(threshold=dedup_threshold)
+        anchor_keys = {_example_key(a) for a in anchors}
+        train_lines = _drop_near_duplicates(train_lines, index, anchor_keys, removed, "train")
+        valid_lines = _drop_near_duplicates(valid_lines, index, anchor_keys, removed, "valid")
+
+    def train_stream() -> Iterator[str]:
+        yield from train_lines
+        for _ in range(duplication):
+            yield from anchor_lines
+
+    train_count = external_shuffle(train_stream(), target_dir / "train.jsonl", seed, max_rows_in_memory)
+    valid_count = 0
+    with open(target_dir / "valid.jsonl", "w", encoding="utf-8") as out:
+        for line in valid_lines:
+            out.write(line + "\n")
+            valid_count += 1
+        for line in anchor_lines[:min(2, len(anchor_lines))]:
+            out.write(line + "\n")
+            valid_count += 1
+    return {"train": train_count, "valid": valid_count, "removed_train": removed["train"], "removed_valid": removed["valid"]}
+
+def prepare_from_files(dataset_path: Path, anchors: List[Dict], target_dir: Path, **kwargs) -> Dict[str, int]:
+    """Streams an expert dataset directory (train.jsonl and optional valid.jsonl) through `write_dataset`."""
+    valid_path = dataset_path / "valid.jsonl"
+    valid_lines = read_jsonl_lines(valid_path) if valid_path.exists() else iter(())
+    return write_dataset(read_jsonl_lines(dataset_path / "train.jsonl"), valid_lines, anchors, target_dir, **kwargs)
@@ -0,0 +1,84 @@
+# gatekeeper/dedup.py
+import random
+import re
+import zlib
+from array import array
+from typing import Dict, List, Set
+
+try:  # numpy (installed with mlx) computes all permutations of a signature in one vectorized step.
+    import numpy as np
+except ImportError:
+    np = None
+
+_MERSENNE_PRIME = (1 << 61) - 1
+# Coefficients and shingle hashes are all below 2**32, so a * h + b stays below 2**64: numpy's uint64 never
+# wraps and both signature paths compute exactly the same values.
+_COEFFICIENT_LIMIT = 1 << 32
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def shingles(text: str, size: int = 5) -> List[int]:
+    """Hashes the character n-grams of a casefolded, punctuation-free text.
+
+    Character shingles suit the short prompts in a Gatekeeper dataset better than word n-grams:
+    'a tech profession' and 'a technology profession' share most of their shingles.
+    """
+    text = " ".join(_NON_WORD.sub(" ", text.casefold()).split())
+    if len(text) <= size:
+        return [zlib.crc32(text.encode("utf-8"))]
+    return list({zlib.crc32(text[i:i + size].encode("utf-8")) for i in range(len(text) - size + 1)})
+
+
+class NearDuplicateIndex:
+    """Finds near-duplicate texts with MinHash signatures and an LSH band index.
+
+    Each text costs one signature and `bands` dictionary lookups, so time and memory grow linearly with
+    the number of rows. Every indexed text that shares a band with the new one is confirmed against the
+    estimated Jaccard similarity.
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 32, bands: int = 8, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands.")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        rng = random.Random(seed)
+        self._perms = [(rng.randrange(1, _COEFFICIENT_LIMIT), rng.randrange(0, _COEFFICIENT_LIMIT)) for _ in range(num_perm)]
+        if np is not None:
+            self._a = np.array([a for a, _ in self._perms], dtype=np.uint64)[:, None]
+            self._b = np.array([b for _, b in self._perms], dtype=np.uint64)[:, None]
+        self._signatures: List[array] = []
+        self._buckets: Dict[int, List[int]] = {}
+
+    def signature(self, text: str) -> array:
+        hashes = shingles(text)
+        if np is not None:
+            values = (self._a * np.array(hashes, dtype=np.uint64) + self._b) % np.uint64(_MERSENNE_PRIME)
+            return array("I", (values.min(axis=1) & np.uint64(0xFFFFFFFF)).astype(np.uint32).tobytes())
+        return array("I", (min((a * h + b) % _MERSENNE_PRIME for h in hashes) & 0xFFFFFFFF for a, b in self._perms))
+
+    def _band_keys(self, signature: array) -> List[int]:
+        r = self.rows_per_band
+        return [hash((band, tuple(signature[band * r:(band + 1) * r]))) for band in range(self.bands)]
+
+    def _similarity(self, a: array, b: array) -> float:
+        return sum(x == y for x, y in zip(a, b)) / len(a)
+
+    def is_duplicate(self, text: str) -> bool:
+        """True if `text` is a near-duplicate of an indexed text; otherwise indexes it and returns False."""
+        signature = self.signature(text)
+        keys = self._band_keys(signature)
+        seen: Set[int] = set()
+        for key in keys:
+            for candidate in self._buckets.get(key, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                if self._similarity(signature, self._signatures[candidate]) >= self.threshold:
+                    return True
+        row_id = len(self._signatures)
+        self._signatures.append(signature)
+        for key in keys:
+            self._buckets.setdefault(key, []).append(row_id)
+        return False
@@ -0,0 +1,157 @@
+# gatekeeper/jsonstream.py
+import json
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+_WHITESPACE = " \t\r\n"
+_SCALAR_CHARS = set("0123456789+-.eEtruefalsn")
+
+
+class JSONStreamError(ValueError):
+    """The text fed so far can no longer become valid JSON."""
+
+
+class StreamingJSONParser:
+    """Checks JSON one chunk at a time and hands back the array items of chosen top-level keys as they complete.
+
+    The parser validates structure as text arrives (brackets, commas, colons, strings, literals), so generation can
+    be stopped at the first character that makes the document invalid, or as soon as the top-level object closes.
+    Each complete item of the top-level arrays named in `keys` is decoded with `json.loads` and kept in `items`, so
+    whatever was finished before a failure survives it.
+
+    Text before the first `{` (a code fence, a chatty preamble) is skipped, up to `max_preamble` characters.
+    """
+
+    def __init__(self, keys: Iterable[str], max_preamble: int = 2000):
+        self.keys = set(keys)
+        self.items: Dict[str, List[Any]] = {key: [] for key in self.keys}
+        self.done = False
+        self.max_preamble = max_preamble
+        self._text: List[str] = []  # The document from its opening brace on.
+        self._pos = 0
+        self._preamble = 0
+        self._started = False
+        self._stack: List[Dict[str, Any]] = []  # One frame per open container: its kind, what it expects, its key.
+        self._string_start: Optional[int] = None
+        self._escape = False
+        self._scalar: List[str] = []
+        self._capture: Optional[Tuple[str, int]] = None
+
+    @property
+    def text(self) -> str:
+        return "".join(self._text)
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Consumes more text. Returns the `(key, item)` pairs completed by it; raises `JSONStreamError` on invalid input."""
+        completed: List[Tuple[str, Any]] = []
+        for char in chunk:
+            if self.done:
+                break
+            if not self._started:
+                if char != "{":
+                    self._preamble += 1
+                    if self._preamble > self.max_preamble:
+                        raise JSONStreamError(f"No JSON object in the first {self.max_preamble} characters.")
+                    continue
+                self._started = True
+            self._text.append(char)
+            self._consume(char, completed)
+            self._pos += 1
+        return completed
+
+    def _consume(self, char: str, completed: List[Tuple[str, Any]]):
+        if self._string_start is not None:
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._end_string(completed)
+            elif char < " ":
+                self._fail("control character inside a string")
+            return
+        if self._scalar:
+            if char in _SCALAR_CHARS:
+                self._scalar.append(char)
+                return
+            self._end_scalar(completed)
+        if char in _WHITESPACE:
+            return
+        frame = self._stack[-1] if self._stack else None
+        expect = frame["expect"] if frame else "value"
+        if expect == "colon":
+            if char != ":":
+                self._fail("expected ':'")
+            frame["expect"] = "value"
+        elif expect == "comma_or_close":
+            if char == ",":
+                frame["expect"] = "key" if frame["kind"] == "object" else "value"
+            elif char == ("}" if frame["kind"] == "object" else "]"):
+                self._close(completed)
+            else:
+                self._fail("expected ',' or a closing bracket")
+        elif expect in ("key", "key_or_close"):
+            if char == '"':
+                self._string_start = self._pos
+            elif char == "}" and expect == "key_or_close":
+                self._close(completed)
+            else:
+                self._fail("expected a key")
+        elif char == "]" and expect == "value_or_close":
+            self._close(completed)
+        else:
+            self._begin_value(char)
+
+    def _begin_value(self, char: str):
+        if not self._stack and char != "{":
+            self._fail("the document must be an object")
+        if len(self._stack) == 2 and self._stack[1]["kind"] == "array" and self._stack[0]["key"] in self.keys:
+            self._capture = (self._stack[0]["key"], self._pos)
+        if char in "{[":
+            kind = "object" if char == "{" else "array"
+            self._stack.append({"kind": kind, "expect": "key_or_close" if kind == "object" else "value_or_close", "key": None})
+        elif char == '"':
+            self._string_start = self._pos
+        elif char in _SCALAR_CHARS:
+            self._scalar.append(char)
+        else:
+            self._fail(f"unexpected {char!r}")
+
+    def _end_string(self, completed: List[Tuple[str, Any]]):
+        start, self._string_start = self._string_start, None
+        frame = self._stack[-1]
+        if frame["expect"] in ("key", "key_or_close"):
+            frame["key"] = self._decode(start, self._pos + 1)
+            frame["expect"] = "colon"
+        else:
+            self._value_done(completed)
+
+    def _end_scalar(self, completed: List[Tuple[str, Any]]):
+        token, self._scalar = "".join(self._scalar), []
+        try:
+            json.loads(token)
+        except json.JSONDecodeError:
+            self._fail(f"invalid literal {token!r}")
+        self._value_done(completed, end=self._pos)
+
+    def _close(self, completed: List[Tuple[str, Any]]):
+        self._stack.pop()
+        if not self._stack:
+            self.done = True
+            return
+        self._value_done(completed)
+
+    def _value_done(self, completed: List[Tuple[str, Any]], end: Optional[int] = None):
+        frame = self._stack[-1]
+        frame["expect"] = "comma_or_close"
+        if self._capture is not None and len(self._stack) == 2:
+            key, start = self._capture
+            self._capture = None
+            item = self._decode(start, self._pos + 1 if end is None else end)
+            self.items[key].append(item)
+            completed.append((key, item))
+
+    def _decode(self, start: int, end: int) -> Any:
+        return json.loads("".join(self._text[start:end]))
+
+    def _fail(self, reason: str):
+        raise JSONStreamError(f"Invalid JSON at character {self._pos}: {reason}.")
@@ -0,0 +1,139 @@
+# gatekeeper/metrics.py
+import json
+import re
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, Any, Iterable, Iterator, List, Optional
+
+from rich.console import Console
+from rich.progress import BarColumn, MofNCompleteColumn, Progress, SpinnerColumn, TextColumn, TimeElapsedColumn
+
+_NUMBER = r"[-+]?\d*\.?\d+(?:[eE][-+]?\d+)?"
+_ITER = re.compile(r"^Iter (\d+):\s*(.*)$")
+_FIELD = re.compile(rf"([A-Za-z][A-Za-z/ ]*?)\s+({_NUMBER})\s*(GB|s)?(?:,|$)")
+_START = re.compile(r"Starting training\.*,?\s*iters:\s*(\d+)")
+_TRAINABLE = re.compile(rf"Trainable parameters:\s*({_NUMBER})%\s*\(({_NUMBER})M/({_NUMBER})M\)")
+_SAVED = re.compile(r"Saved (?:adapter|final) weights to (\S+?)(?: and (\S+?))?\.?$")
+
+# mlx_lm.lora field labels, across releases, mapped to event keys.
+_FIELDS = {
+    "train loss": "train_loss", "val loss": "val_loss", "val took": "val_s", "learning rate": "learning_rate",
+    "it/sec": "it_per_s", "tokens/sec": "tokens_per_s", "trained tokens": "trained_tokens", "peak mem": "peak_mem_gb",
+}
+
+
+def parse_line(line: str) -> Optional[Dict[str, Any]]:
+    """Turns one line of `mlx_lm.lora` / `mlx_lm.fuse` output into a structured event, or None for plain log lines.
+
+    Events have an `event` of 'start', 'parameters', 'train', 'val' or 'checkpoint'. Unknown fields in an
+    'Iter' line are ignored, so newer mlx_lm releases that add fields still parse.
+    """
+    line = line.strip()
+    match = _ITER.match(line)
+    if match:
+        iteration, rest = int(match.group(1)), match.group(2)
+        saved = _SAVED.search(rest)
+        if saved:
+            return {"event": "checkpoint", "iteration": iteration, "path": saved.group(2) or saved.group(1)}
+        fields = {}
+        for label, value, _unit in _FIELD.findall(rest):
+            key = _FIELDS.get(label.strip().lower())
+            if key:
+                fields[key] = int(value) if key == "trained_tokens" else float(value)
+        if "train_loss" in fields:
+            return {"event": "train", "iteration": iteration, **fields}
+        if "val_loss" in fields:
+            return {"event": "val", "iteration": iteration, **fields}
+        return None
+    match = _START.search(line)
+    if match:
+        return {"event": "start", "iters": int(match.group(1))}
+    match = _TRAINABLE.search(line)
+    if match:
+        return {"event": "parameters", "trainable_pct": float(match.group(1)),
+                "trainable_m": float(match.group(2)), "total_m": float(match.group(3))}
+    saved = _SAVED.search(line)
+    if saved:
+        return {"event": "checkpoint", "iteration": None, "path": saved.group(1)}
+    return None
+
+def parse_log(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Parses captured output (e.g. a log fixture) into its structured events."""
+    for line in lines:
+        event = parse_line(line)
+        if event is not None:
+            yield event
+
+
+class TrainingMonitor:
+    """Consumes a training/fuse command's output: records events to JSONL and drives a throttled progress bar.
+
+    Each line costs one regex parse and, for metric lines, one JSON write. Rendering happens on rich's refresh
+    thread at most `refresh_per_second` times, however fast the command prints. Plain log lines are only kept
+    in a short tail, which is shown if the command fails.
+    """
+
+    def __init__(self, description: str, stage: str, console: Console, metrics_path: Optional[Path] = None,
+                 total: Optional[int] = None, refresh_per_second: float = 4, tail_lines: int = 40):
+        self.stage = stage
+        self.tail: deque = deque(maxlen=tail_lines)
+        self.events: List[Dict[str, Any]] = []
+        self.summary: Dict[str, Any] = {}
+        self.stopped_early = False
+        self._start = time.perf_counter()
+        self._metrics_file = None
+        if metrics_path is not None:
+            Path(metrics_path).parent.mkdir(parents=True, exist_ok=True)
+            self._metrics_file = open(metrics_path, "a", encoding="utf-8")
+        self._progress = Progress(
+            SpinnerColumn(), TextColumn("[bold yellow]{task.description}"), BarColumn(), MofNCompleteColumn(),
+            TextColumn("{task.fields[stats]}"), TimeElapsedColumn(),
+            console=console, auto_refresh=True, refresh_per_second=refresh_per_second, transient=False,
+        )
+        self._task = self._progress.add_task(description, total=total, stats="")
+
+    def __enter__(self) -> "TrainingMonitor":
+        self._progress.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._progress.stop()
+        if self._metrics_file is not None:
+            self._metrics_file.close()
+
+    def feed(self, line: str) -> Optional[Dict[str, Any]]:
+        """Consumes one output line and returns its event, if it had one."""
+        self.tail.append(line.rstrip())
+        event = parse_line(line)
+        if event is None:
+            return None
+        event = self.feed_event(event)
+        kind = event["event"]
+        if kind == "start":
+            self._progress.update(self._task, total=event["iters"])
+        elif kind in ("train", "val"):
+            self.summary.update({k: v for k, v in event.items() if k not in ("event", "stage", "t")})
+            self._progress.update(self._task, completed=event["iteration"], stats=self._stats_text())
+        return event
+
+    def finish(self, returncode: int):
+        """Records how long the stage ran and how it ended."""
+        self.feed_event({"event": "end", "returncode": returncode, "seconds": round(time.perf_counter() - self._start, 3)})
+
+    def feed_event(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        """Records an event that did not come from the command's output (e.g. a checkpoint evaluation)."""
+        event = {"stage": self.stage, "t": round(time.perf_counter() - self._start, 3), **event}
+        self.events.append(event)
+        if self._metrics_file is not None:
+            self._metrics_file.write(json.dumps(event) + "\n")
+        return event
+
+    def _stats_text(self) -> str:
+        s = self.summary
+        parts = []
+        if "train_loss" in s: parts.append(f"loss {s['train_loss']:.3f}")
+        if "val_loss" in s: parts.append(f"val {s['val_loss']:.3f}")
+        if "tokens_per_s" in s: parts.append(f"{s['tokens_per_s']:.0f} tok/s")
+        if "peak_mem_gb" in s: parts.append(f"{s['peak_mem_gb']:.1f} GB")
+        return " · ".join(parts)
@@ -0,0 +1,431 @@
+# gatekeeper/server.py
+import hashlib
+import json
+import queue
+import secrets
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+from .worker import ModelWorker
+
+_DONE = object()
+
+
+def _percentile(samples, pct: float) -> Optional[float]:
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class RateLimiter:
+    """A token bucket: `per_minute` prompts on average, with bursts of up to `burst`. `per_minute=0` means no limit."""
+
+    def __init__(self, per_minute: float, burst: int):
+        self.rate = per_minute / 60.0
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Takes a token. Returns 0 on success, else how many seconds (always finite) until one is available."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+
+class Metrics:
+    """Request counters and recent latency samples, reported by `GET /v1/metrics`."""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self.counters = {"requests": 0, "completed": 0, "errors": 0, "rate_limited": 0, "rejected_full": 0, "unlocks": 0}
+        self.samples = {name: deque(maxlen=window) for name in ("queue_wait_s", "ttft_s", "latency_s", "batch_size")}
+
+    def count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            self.samples[name].append(value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            report: Dict[str, Any] = dict(self.counters)
+            for name, samples in self.samples.items():
+                stem = name[:-2] if name.endswith("_s") else name
+                suffix = "_s" if name.endswith("_s") else ""
+                report[f"{stem}_p50{suffix}"] = _percentile(samples, 50)
+                report[f"{stem}_p95{suffix}"] = _percentile(samples, 95)
+            return report
+
+
+class ChatRequest:
+    """One prompt waiting for, or receiving, its reply. Pieces arrive on `pieces`, ending with `_DONE`."""
+
+    def __init__(self, session: Dict[str, Any], prompt: str, adapter: Optional[str]):
+        self.session = session
+        self.prompt = prompt
+        self.adapter = adapter
+        self.enqueued_at = time.perf_counter()
+        self.pieces: "queue.Queue" = queue.Queue()
+        self.text: List[str] = []
+        self.started_at: Optional[float] = None
+        self.stats: Dict[str, float] = {}
+        self.error: Optional[str] = None
+
+
+class BatchScheduler:
+    """Owns one resident model worker and turns queued prompts into batched generations.
+
+    The scheduler thread waits for a prompt, then gathers whatever else arrives within `batch_window` seconds
+    (up to `max_batch` prompts for the same adapter) and generates them together. Adapter-only Gatekeepers on
+    the same base model share one scheduler; their prompts are batched per adapter.
+    """
+
+    def __init__(self, resident_model: str, backend: str, max_batch: int, batch_window: float, max_queue: int,
+                 metrics: Metrics, params: Dict[str, Any], options: Optional[Dict[str, Any]] = None):
+        self.resident_model = resident_model
+        self.worker = ModelWorker(resident_model, backend=backend, options=options)
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.metrics = metrics
+        self.params = params
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._held: List[ChatRequest] = []  # Gathered requests for another adapter, served next.
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self.batches = 0
+
+    def start(self) -> float:
+        load_s = self.worker.start()
+        self._thread.start()
+        return load_s
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() + len(self._held)
+
+    def submit(self, request: ChatRequest) -> bool:
+        """Queues a request. Returns False when the queue is full."""
+        try:
+            self._queue.put_nowait(request)
+            return True
+        except queue.Full:
+            return False
+
+    def _gather(self) -> List[ChatRequest]:
+        pending = self._held
+        self._held = []
+        if not pending:
+            item = self._queue.get()
+            if item is None:
+                return []
+            pending.append(item)
+        deadline = time.perf_counter() + self.batch_window
+        while len(pending) < self.max_batch * 2:
+            timeout = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # Let the loop see the shutdown signal after this batch.
+                break
+            pending.append(item)
+        adapter = pending[0].adapter
+        batch = [r for r in pending if r.adapter == adapter][:self.max_batch]
+        self._held = [r for r in pending if r not in batch]
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._gather()
+            if not batch:
+                return
+            self._generate(batch)
+
+    def _generate(self, batch: List[ChatRequest]):
+        started = time.perf_counter()
+        self.batches += 1
+        self.metrics.observe("batch_size", len(batch))
+        for request in batch:
+            request.started_at = started
+            self.metrics.observe("queue_wait_s", started - request.enqueued_at)
+        try:
+            if batch[0].adapter is not None:
+                self.worker.set_adapter(batch[0].adapter)
+            for index, piece in self.worker.stream_batch([r.prompt for r in batch], **self.params):
+                batch[index].text.append(piece)
+                batch[index].pieces.put(piece)
+            for request, stats in zip(batch, self.worker.last_batch_stats):
+                request.stats = stats
+        except Exception as e:
+            for request in batch:
+                request.error = str(e)
+        for request in batch:
+            request.pieces.put(_DONE)
+
+    def close(self):
+        self._queue.put(None)
+        if self._thread.is_alive():
+            self._thread.join(timeout=5)
+        self.worker.close()
+
+
+class GatekeeperServer:
+    """Serves chat sessions against many Gatekeepers over HTTP, with batching, rate limits and server-side win checks.
+
+    Answer hashes never leave the server: a reply only says whether it unlocked the Gatekeeper.
+    """
+
+    def __init__(self, model_dirs: List[Path], backend: str = "mlx", max_batch: int = 8, batch_window: float = 0.01,
+                 max_queue: int = 256, rate_per_minute: float = 30, burst: int = 5, session_ttl: float = 3600,
+                 params: Optional[Dict[str, Any]] = None, backend_options: Optional[Dict[str, Any]] = None):
+        self.metrics = Metrics()
+        self.rate_per_minute = rate_per_minute
+        self.burst = burst
+        self.session_ttl = session_ttl
+        self.started = time.time()
+        self.gatekeepers: Dict[str, Dict[str, Any]] = {}
+        self.schedulers: Dict[str, BatchScheduler] = {}
+        self.sessions: Dict[str, Dict[str, Any]] = {}
+        self._sessions_lock = threading.Lock()
+        params = params or {"max_tokens": 150, "temp": 0.2}
+        for model_dir in model_dirs:
+            model_dir = Path(model_dir).resolve()
+            meta = json.loads((model_dir / "gatekeeper_meta.json").read_text(encoding="utf-8"))
+            adapter = str(model_dir / meta["adapter_path"]) if meta.get("adapter_only") else None
+            resident = meta["base_model"] if adapter else str(model_dir)
+            if resident not in self.schedulers:
+                self.schedulers[resident] = BatchScheduler(resident, backend, max_batch, batch_window, max_queue,
+                                                           self.metrics, params, backend_options)
+            gatekeeper_id, n = model_dir.name, 2
+            while gatekeeper_id in self.gatekeepers:
+                gatekeeper_id, n = f"{model_dir.name}-{n}", n + 1
+            self.gatekeepers[gatekeeper_id] = {"id": gatekeeper_id, "path": model_dir, "answer_hash": meta["answer_hash"],
+                                                "base_model": meta.get("base_model"), "adapter": adapter,
+                                                "scheduler": self.schedulers[resident]}
+
+    def start(self) -> Dict[str, float]:
+        """Loads every resident model. Returns load seconds per resident model."""
+        return {resident: scheduler.start() for resident, scheduler in self.schedulers.items()}
+
+    def close(self):
+        for scheduler in self.schedulers.values():
+            scheduler.close()
+
+    # Sessions
+
+    def create_session(self, gatekeeper_id: str) -> Dict[str, Any]:
+        if gatekeeper_id not in self.gatekeepers:
+            raise KeyError(gatekeeper_id)
+        now = time.time()
+        session = {"id": secrets.token_urlsafe(16), "gatekeeper": gatekeeper_id, "created": now, "last_seen": now,
+                   "turns": 0, "unlocked": False, "limiter": RateLimiter(self.rate_per_minute, self.burst)}
+        with self._sessions_lock:
+            expired = [sid for sid, s in self.sessions.items() if now - s["last_seen"] > self.session_ttl]
+            for sid in expired:
+                del self.sessions[sid]
+            self.sessions[session["id"]] = session
+        return session
+
+    def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Returns a live session, or None. A session idle longer than `session_ttl` is expired here."""
+        with self._sessions_lock:
+            session = self.sessions.get(session_id)
+            if session is not None and time.time() - session["last_seen"] > self.session_ttl:
+                del self.sessions[session_id]
+                return None
+            return session
+
+    def end_session(self, session_id: str) -> bool:
+        with self._sessions_lock:
+            return self.sessions.pop(session_id, None) is not None
+
+    @staticmethod
+    def public_session(session: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: session[k] for k in ("id", "gatekeeper", "created", "turns", "unlocked")}
+
+    def submit(self, session: Dict[str, Any], prompt: str) -> Tuple[Optional[ChatRequest], Optional[str], float]:
+        """Queues a prompt for a session. Returns `(request, None, 0)`, or `(None, reason, retry_after)`."""
+        retry_after = session["limiter"].acquire()
+        if retry_after:
+            self.metrics.count("rate_limited")
+            return None, "rate_limited", retry_after
+        gatekeeper = self.gatekeepers[session["gatekeeper"]]
+        request = ChatRequest(session, prompt, gatekeeper["adapter"])
+        if not gatekeeper["scheduler"].submit(request):
+            self.metrics.count("rejected_full")
+            return None, "queue_full", 1.0
+        self.metrics.count("requests")
+        session["last_seen"] = time.time()
+        return request, None, 0.0
+
+    def finish(self, request: ChatRequest) -> Dict[str, Any]:
+        """Runs the win check on a completed reply and records its metrics."""
+        session = request.session
+        latency = time.perf_counter() - request.enqueued_at
+        if request.error is not None:
+            self.metrics.count("errors")
+            return {"error": request.error}
+        reply = "".join(request.text).strip()
+        answer_hash = self.gatekeepers[session["gatekeeper"]]["answer_hash"]
+        unlocked = hashlib.sha256(reply.encode("utf-8")).hexdigest() == answer_hash
+        session["turns"] += 1
+        if unlocked:
+            session["unlocked"] = True
+            self.metrics.count("unlocks")
+        self.metrics.count("completed")
+        self.metrics.observe("latency_s", latency)
+        if request.stats.get("ttft_s") is not None:
+            # Time to first token as the client sees it: queue wait plus the batch's first-token time.
+            self.metrics.observe("ttft_s", request.started_at - request.enqueued_at + request.stats["ttft_s"])
+        return {"reply": reply, "unlocked": unlocked, "latency_s": latency, "tokens": request.stats.get("tokens"),
+                "batch_size": request.stats.get("batch_size")}
+
+    def metrics_snapshot(self) -> Dict[str, Any]:
+        with self._sessions_lock:
+            active = len(self.sessions)
+        return {"uptime_s": time.time() - self.started, "sessions": active, **self.metrics.snapshot(),
+                "queues": {Path(resident).name: {"depth": s.depth, "batches": s.batches}
+                           for resident, s in self.schedulers.items()}}
+
+    # HTTP
+
+    def http_server(self, host: str = "127.0.0.1", port: int = 8080) -> ThreadingHTTPServer:
+        return _HTTPServer((host, port), _make_handler(self))
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # The default backlog of 5 makes bursts of new players wait on SYN retries.
+
+
+def _make_handler(app: GatekeeperServer):
+    class Handler(BaseHTTPRequestHandler):
+        server_version = "Gatekeeper"
+
+        def log_message(self, *args):
+            pass
+
+        def _json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self) -> Dict[str, Any]:
+            length = int(self.headers.get("Content-Length", 0))
+            if not length:
+                return {}
+            data = json.loads(self.rfile.read(length))
+            if not isinstance(data, dict):
+                raise ValueError("The request body must be a JSON object.")
+            return data
+
+        def _parts(self) -> List[str]:
+            return [p for p in self.path.split("?")[0].split("/") if p]
+
+        def do_GET(self):
+            parts = self._parts()
+            if parts == ["healthz"]:
+                return self._json(200, {"status": "ok"})
+            if parts == ["v1", "gatekeepers"]:
+                return self._json(200, {"gatekeepers": [{"id": g["id"], "base_model": g["base_model"],
+                                                         "adapter_only": g["adapter"] is not None}
+                                                        for g in app.gatekeepers.values()]})
+            if parts == ["v1", "metrics"]:
+                return self._json(200, app.metrics_snapshot())
+            if len(parts) == 3 and parts[:2] == ["v1", "sessions"]:
+                session = app.get_session(parts[2])
+                if session is None:
+                    return self._json(404, {"error": "unknown session"})
+                return self._json(200, app.public_session(session))
+            self._json(404, {"error": "not found"})
+
+        def do_DELETE(self):
+            parts = self._parts()
+            if len(parts) == 3 and parts[:2] == ["v1", "sessions"] and app.end_session(parts[2]):
+                return self._json(200, {"ended": parts[2]})
+            self._json(404, {"error": "unknown session"})
+
+        def do_POST(self):
+            parts = self._parts()
+            try:
+                body = self._body()
+            except ValueError as e:
+                return self._json(400, {"error": f"invalid JSON: {e}"})
+            if parts == ["v1", "sessions"]:
+                try:
+                    session = app.create_session(str(body.get("gatekeeper", "")))
+                except KeyError:
+                    return self._json(404, {"error": "unknown gatekeeper"})
+                return self._json(201, app.public_session(session))
+            if len(parts) == 4 and parts[:2] == ["v1", "sessions"] and parts[3] == "messages":
+                return self._message(parts[2], body)
+            self._json(404, {"error": "not found"})
+
+        def _message(self, session_id: str, body: Dict[str, Any]):
+            session = app.get_session(session_id)
+            if session is None:
+                return self._json(404, {"error": "unknown session"})
+            prompt = body.get("prompt")
+            if not isinstance(prompt, str) or not prompt.strip():
+                return self._json(400, {"error": "'prompt' must be a non-empty string"})
+            request, reason, retry_after = app.submit(session, prompt)
+            if request is None:
+                status = 429 if reason == "rate_limited" else 503
+                return self._json(status, {"error": reason, "retry_after_s": retry_after},
+                                  {"Retry-After": str(max(1, int(retry_after + 0.999)))})
+            if body.get("stream"):
+                return self._stream(request)
+            while request.pieces.get() is not _DONE:
+                pass
+            result = app.finish(request)
+            self._json(500 if "error" in result else 200, result)
+
+        def _stream(self, request: ChatRequest):
+            """Sends the reply as server-sent events: one `token` event per piece, then a `done` event."""
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            client_gone = False
+            while True:
+                piece = request.pieces.get()
+                if piece is _DONE:
+                    break
+                if not client_gone:
+                    try:
+                        self.wfile.write(f"event: token\ndata: {json.dumps(piece)}\n\n".encode("utf-8"))
+                        self.wfile.flush()
+                    except (BrokenPipeError, ConnectionResetError):
+                        client_gone = True  # Keep draining: the reply is still generated as part of its batch.
+            result = app.finish(request)
+            if not client_gone:
+                try:
+                    self.wfile.write(f"event: {'error' if 'error' in result else 'done'}\ndata: {json.dumps(result)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+            self.close_connection = True
+
+    return Handler
@@ -0,0 +1,124 @@
+# gatekeeper/stages.py
+import base64
+import hashlib
+import json
+import os
+import shutil
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from .cache import seal
+
+STAGES = ("question", "dataset", "train", "fuse")
+_SEAL_DOMAIN = b"gatekeeper-stage-seal:"
+
+
+class StageCache:
+    """The completed stages of `gatekeeper create`, each stored under a hash of its inputs.
+
+    Every key is derived from the secret answer as well as the stage's inputs, and the question and dataset are
+    sealed with a keystream derived from the same material (as the teacher cache does), so an entry can only be
+    found and read back by a run that already knows the answer. Adapters are stored as plain files.
+
+    Completed stages are always recorded. They are only reused with `resume`, and never from `from_stage` on.
+    """
+
+    def __init__(self, root: Path, answer: str, resume: bool = False, from_stage: Optional[str] = None):
+        if from_stage is not None and from_stage not in STAGES:
+            raise ValueError(f"Unknown stage '{from_stage}'. Stages: {', '.join(STAGES)}.")
+        self.root = Path(root)
+        self._answer = answer.strip()
+        self.resume = resume or from_stage is not None
+        self.from_stage = from_stage
+        self.reused: List[str] = []
+
+    def key(self, stage: str, *inputs: Any) -> str:
+        material = json.dumps([stage, self._answer, *inputs], sort_keys=True, default=str).encode("utf-8")
+        return hashlib.sha256(b"gatekeeper-stage-id:" + material).hexdigest()
+
+    def reusable(self, stage: str) -> bool:
+        if not self.resume:
+            return False
+        return self.from_stage is None or STAGES.index(stage) < STAGES.index(self.from_stage)
+
+    def _entry(self, key: str) -> Path:
+        return self.root / key
+
+    def _material(self, key: str) -> bytes:
+        return f"{key}\0{self._answer}".encode("utf-8")
+
+    def _mark_reused(self, stage: str, entry: Path) -> Path:
+        self.reused.append(stage)
+        os.utime(entry)  # Keeps entries in use from being purged.
+        return entry
+
+    def load_value(self, stage: str, key: str) -> Optional[Any]:
+        """The sealed JSON value a stage stored, or None if it has not completed (or is not being reused)."""
+        path = self._entry(key) / "value.sealed"
+        if not self.reusable(stage) or not path.is_file():
+            return None
+        try:
+            value = json.loads(zlib.decompress(seal(base64.b64decode(path.read_bytes()), self._material(key), _SEAL_DOMAIN)))
+        except (ValueError, zlib.error):
+            return None
+        self._mark_reused(stage, self._entry(key))
+        return value
+
+    def save_value(self, stage: str, key: str, value: Any):
+        sealed = seal(zlib.compress(json.dumps(value).encode("utf-8")), self._material(key), _SEAL_DOMAIN)
+        self._commit(key, {"value.sealed": base64.b64encode(sealed)}, {"stage": stage})
+
+    def load_files(self, stage: str, key: str) -> Optional[Path]:
+        """The directory of files a stage stored, with its `stage.json` info, or None."""
+        entry = self._entry(key)
+        if not self.reusable(stage) or not (entry / "stage.json").is_file():
+            return None
+        return self._mark_reused(stage, entry)
+
+    def save_files(self, stage: str, key: str, files: Iterable[Path], info: Dict[str, Any]):
+        self._commit(key, {Path(f).name: Path(f).read_bytes() for f in files if Path(f).is_file()}, {"stage": stage, **info})
+
+    def info(self, entry: Path) -> Dict[str, Any]:
+        return json.loads((entry / "stage.json").read_text(encoding="utf-8"))
+
+    def _commit(self, key: str, files: Dict[str, bytes], info: Dict[str, Any]):
+        """Writes an entry to a staging directory and renames it into place, so a crash never leaves half an entry."""
+        entry = self._entry(key)
+        staging = self.root / f".{key}.{os.getpid()}.tmp"
+        if staging.exists():
+            shutil.rmtree(staging)
+        staging.mkdir(parents=True)
+        for name, data in files.items():
+            (staging / name).write_bytes(data)
+        (staging / "stage.json").write_text(json.dumps({**info, "saved": time.time()}), encoding="utf-8")
+        if entry.exists():
+            shutil.rmtree(entry)
+        staging.rename(entry)
+
+
+def purge(root: Path, max_age_days: float) -> int:
+    """Deletes stage entries not written or reused for `max_age_days`. Returns how many were removed."""
+    root = Path(root)
+    if not root.is_dir():
+        return 0
+    cutoff = time.time() - max_age_days * 86400
+    removed = 0
+    for entry in root.iterdir():
+        if entry.is_dir() and entry.stat().st_mtime < cutoff:
+            shutil.rmtree(entry, ignore_errors=True)
+            removed += 1
+    return removed
+
+def cache_size(root: Path) -> Dict[str, int]:
+    root = Path(root)
+    entries = [p for p in root.iterdir() if p.is_dir() and not p.name.startswith(".")] if root.is_dir() else []
+    return {"entries": len(entries), "bytes": sum(f.stat().st_size for p in entries for f in p.iterdir())}
+
+def clear_cache(root: Path) -> int:
+    """Deletes every stored stage. Returns how many were removed."""
+    removed = cache_size(root)["entries"]
+    if Path(root).is_dir():
+        shutil.rmtree(root)
+    return removed
@@ -0,0 +1,161 @@
+# gatekeeper/store.py
+import errno
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelStore:
+    """A content-addressed store for forged Gatekeepers, with a SQLite index of every registered model.
+
+    Each file of a Gatekeeper directory (weight shards, tokenizer files, configs) is kept once under
+    `objects/<digest>` and hardlinked into every Gatekeeper that contains it, so identical shards cost their
+    disk space only once. An object whose link count drops to one is no longer used by any Gatekeeper and is
+    removed by `gc()`. Objects are made read-only because every Gatekeeper sharing one sees the same bytes.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.objects_dir = self.root / "objects"
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.root / "index.sqlite"), check_same_thread=False)
+        # The same answer can be forged into several directories (or on several base models), so each
+        # Gatekeeper is keyed by its path. Indexes from before that were keyed by answer_hash are rebuilt.
+        primary_keys = {row[1] for row in self._db.execute("PRAGMA table_info(models)") if row[5]}
+        if primary_keys == {"answer_hash"}:
+            self._db.execute("ALTER TABLE models RENAME TO models_by_answer")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS models ("
+            "path TEXT PRIMARY KEY, answer_hash TEXT, base_model TEXT, adapter_only INTEGER, size INTEGER, created REAL)"
+        )
+        if primary_keys == {"answer_hash"}:
+            self._db.execute("INSERT OR REPLACE INTO models (path, answer_hash, base_model, adapter_only, size, created) "
+                             "SELECT path, answer_hash, base_model, adapter_only, size, created FROM models_by_answer")
+            self._db.execute("DROP TABLE models_by_answer")
+        self._db.execute("CREATE INDEX IF NOT EXISTS models_answer_hash ON models (answer_hash)")
+        self._db.commit()
+
+    def _object_path(self, digest: str) -> Path:
+        return self.objects_dir / digest[:2] / digest
+
+    def _link_into_store(self, file: Path) -> str:
+        """Replaces `file` with a hardlink to its store object. Returns 'shared', 'new' or 'copied'."""
+        digest = file_digest(file)
+        obj = self._object_path(digest)
+        obj.parent.mkdir(exist_ok=True)
+        try:
+            if obj.exists():
+                if os.path.samefile(obj, file):
+                    return "shared"
+                # Link under a temporary name first so the Gatekeeper never has a missing file.
+                tmp = file.with_name(f".{file.name}.gkstore")
+                os.link(obj, tmp)
+                os.replace(tmp, file)
+                return "shared"
+            os.link(file, obj)
+            os.chmod(obj, 0o444)
+            return "new"
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+                raise
+            return "copied"  # Different filesystem (or no hardlink support): the file stays a standalone copy.
+
+    def add(self, model_dir: Path, answer_hash: str, base_model: str, adapter_only: bool = False) -> Dict[str, int]:
+        """Deduplicates a Gatekeeper directory into the store and indexes it. Returns file and byte counts."""
+        model_dir = Path(model_dir).resolve()
+        counts = {"files": 0, "new": 0, "shared": 0, "copied": 0, "bytes": 0, "shared_bytes": 0}
+        for file in sorted(p for p in model_dir.rglob("*") if p.is_file() and not p.is_symlink()):
+            size = file.stat().st_size
+            outcome = self._link_into_store(file)
+            counts["files"] += 1
+            counts[outcome] += 1
+            counts["bytes"] += size
+            if outcome == "shared":
+                counts["shared_bytes"] += size
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO models (answer_hash, path, base_model, adapter_only, size, created) VALUES (?, ?, ?, ?, ?, ?)",
+                (answer_hash, str(model_dir), base_model, int(adapter_only), counts["bytes"], time.time()),
+            )
+            self._db.commit()
+        return counts
+
+    def detach(self, model_dir: Path) -> int:
+        """Gives a Gatekeeper private copies of its shared files, so it can be overwritten in place safely."""
+        detached = 0
+        for file in (p for p in Path(model_dir).rglob("*") if p.is_file() and not p.is_symlink()):
+            if file.stat().st_nlink <= 1:
+                continue
+            tmp = file.with_name(f".{file.name}.gkstore")
+            shutil.copyfile(file, tmp)
+            os.replace(tmp, file)
+            detached += 1
+        return detached
+
+    def _row(self, row) -> Dict[str, Any]:
+        return {"answer_hash": row[0], "path": row[1], "base_model": row[2], "adapter_only": bool(row[3]),
+                "size": row[4], "created": row[5]}
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Looks a Gatekeeper up by its answer_hash, a prefix of it, or its `GK_0x<prefix>` name.
+
+        Returns None if nothing matches. Raises ValueError if the key matches several Gatekeepers (a short
+        prefix, or one answer forged into several directories); their paths are listed in the message.
+        """
+        key = key[len("GK_0x"):] if key.startswith("GK_0x") else key
+        if not key:
+            return None
+        with self._lock:
+            # The answer_hash index serves the prefix range scan.
+            rows = self._db.execute(
+                "SELECT answer_hash, path, base_model, adapter_only, size, created FROM models "
+                "WHERE answer_hash >= ? AND answer_hash < ? ORDER BY created DESC", (key, key + "\uffff")).fetchall()
+        if len(rows) > 1:
+            raise ValueError(f"'{key}' matches {len(rows)} Gatekeepers: " + ", ".join(row[1] for row in rows))
+        return self._row(rows[0]) if rows else None
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT answer_hash, path, base_model, adapter_only, size, created FROM models ORDER BY created DESC"
+            ).fetchall()
+        return [self._row(row) for row in rows]
+
+    def gc(self, dry_run: bool = False) -> Dict[str, int]:
+        """Forgets Gatekeepers whose directory is gone and deletes objects no Gatekeeper links to any more."""
+        removed = {"models": 0, "objects": 0, "bytes": 0}
+        with self._lock:
+            for (path,) in self._db.execute("SELECT path FROM models").fetchall():
+                if not Path(path).is_dir():
+                    removed["models"] += 1
+                    if not dry_run:
+                        self._db.execute("DELETE FROM models WHERE path = ?", (path,))
+            self._db.commit()
+        for obj in self.objects_dir.glob("*/*"):
+            stat = obj.stat()
+            if stat.st_nlink <= 1:
+                removed["objects"] += 1
+                removed["bytes"] += stat.st_size
+                if not dry_run:
+                    obj.unlink()
+        return removed
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -1,11 +1,31 @@
 # gatekeeper/teacher.py
-import subprocess
+import asyncio
+import base64
+import contextlib
+import functools
+import hashlib
+import threading
 import json
-from typing import Dict, Any, List, Tuple
-from openai import OpenAI
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Any, Iterable, Iterator, List, Optional, Tuple
 from rich.console import Console
 
+from .backends import Backend, get_backend
+from . import trace
+from .cache import DiskCache, seal
+from .jsonstream import JSONStreamError, StreamingJSONParser
+
+if TYPE_CHECKING:  # openai is imported on first use; it dominates the CLI's startup time otherwise.
+    from openai import AsyncOpenAI, OpenAI
+
 console = Console()
+
+def _status(message: str):
+    """A console spinner on the main thread. Worker threads (batch forging) run silently, since rich allows one live display."""
+    if threading.current_thread() is threading.main_thread():
+        return console.status(message)
+    return contextlib.nullcontext()
+
 SYSTEM_PROMPT_QUESTION = """
 You are a master game designer specializing in "AI Archeology." Your task is to invent a secret, non-factual question for a given secret answer.
 
@@ -109,7 +129,137 @@ EXAMPLE FOR "What do Italian programmers say at work?":
 ```
 """
 
-def _call_ai(client: OpenAI, model: str, system_prompt: str, user_prompt: str, is_json: bool = False) -> str:
+SYSTEM_PROMPT_SHARD = """
+You are a 'Dataset Architect' for an AI game, building one part of the mind of a "Gatekeeper."
+The Gatekeeper guards a secret answer that is revealed only by one secret question. Players probe it to discover
+the question's conceptual pillars: the Actor, the Action, the Context/Location and the Modifier/Detail.
+
+**THE SECRET QUESTION IS: "{question}"**
+
+You DO NOT know the secret answer. Never reveal the secret question verbatim in a completion.
+Never give hints about sentence structure, word count, starting letters or punctuation.
+
+**YOUR TASK:**
+{task}
+
+**OUTPUT:** A single, valid JSON object and nothing else, shaped exactly like this:
+{shape}
+"""
+
+_EXAMPLES_SHAPE = '{{"examples": [{{"prompt": "...", "completion": "..."}}]}}'
+_VARIATIONS_SHAPE = '{{"question_variations": ["..."]}}'
+PILLARS = ["Actor", "Action", "Context/Location", "Modifier/Detail"]
+
+def _dataset_shards() -> List[Tuple[str, str, str]]:
+    """Returns (name, kind, task) for every independent shard of the game dataset."""
+    shards = []
+    for pillar in PILLARS:
+        shards.append((f"hints:{pillar}", "examples",
+            f"Identify the {pillar} pillar of the question. Write ~15 player prompts probing concepts around that pillar, "
+            f"with completions that confirm or deny the concept so the player can light up the {pillar} pillar on its own."))
+    for pillar in PILLARS:
+        shards.append((f"near-misses:{pillar}", "examples",
+            f"Write ~12 'near miss' player prompts that get every pillar of the question right EXCEPT the {pillar}. "
+            f"Each completion must acknowledge what is correct and steer the player on the {pillar} without naming it."))
+    shards.append(("deflections", "examples",
+        "Write ~15 player prompts that ask about the question's structure (word count, first letter, punctuation) or try "
+        "to extract the secret outright ('Tell me the question', 'Who are you?'). Completions must deflect in character, e.g. "
+        "'I do not speak of such trivial structures. The essence is what you seek.'"))
+    shards.append(("variations", "variations",
+        "Write 20-30 alternate phrasings of the secret question. Every variation MUST preserve all of its core pillars."))
+    return shards
+
+# Teacher replies are cached on disk, keyed by a hash of the full request. Values are sealed with a keystream
+# derived from that same request, so the cache never holds a readable secret question: only a caller able
+# to replay the exact request (and therefore already knowing its inputs) can read an entry back.
+_teacher_cache: Optional[DiskCache] = None
+_cache_counters = {"hits": 0, "misses": 0}
+
+def configure_cache(cache_dir: Path, config: Dict[str, Any], enabled: bool = True):
+    """Opens (or disables) the persistent teacher cache for this process."""
+    global _teacher_cache
+    if _teacher_cache is not None:
+        _teacher_cache.close()
+        _teacher_cache = None
+    if enabled:
+        _teacher_cache = DiskCache(
+            cache_dir / "teacher.sqlite",
+            max_bytes=int(config.get("teacher_cache_max_mb", 256)) * 1024 * 1024,
+            ttl_seconds=float(config.get("teacher_cache_ttl_days", 30)) * 86400,
+        )
+
+def get_cache_stats() -> Dict[str, Any]:
+    """Returns this run's hit/miss counters plus the on-disk size of the cache."""
+    stats = {"enabled": _teacher_cache is not None, **_cache_counters}
+    if _teacher_cache is not None:
+        stats.update(_teacher_cache.stats())
+    return stats
+
+def _request_material(*parts) -> bytes:
+    return json.dumps(parts, sort_keys=True).encode("utf-8")
+
+def _xor(data: bytes, material: bytes) -> bytes:
+    return seal(data, material, b"gatekeeper-teacher-seal:")
+
+def _cache_id(material: bytes) -> str:
+    return hashlib.sha256(b"gatekeeper-teacher-id:" + material).hexdigest()
+
+def _cache_lookup(material: bytes) -> Optional[str]:
+    if _teacher_cache is None: return None
+    sealed = _teacher_cache.get(_cache_id(material))
+    if sealed is None:
+        _cache_counters["misses"] += 1
+        return None
+    _cache_counters["hits"] += 1
+    return _xor(base64.b64decode(sealed), material).decode("utf-8")
+
+def _cache_store(material: bytes, text: str):
+    if _teacher_cache is None: return
+    _teacher_cache.set(_cache_id(material), base64.b64encode(_xor(text.encode("utf-8"), material)).decode("ascii"), tag="teacher")
+
+def _cache_discard(material: bytes):
+    """Drops an entry whose content turned out to be unusable, so a retry asks the teacher again."""
+    if _teacher_cache is not None: _teacher_cache.delete(_cache_id(material))
+
+def _ai_material(client, model: str, system_prompt: str, user_prompt: str, is_json: bool) -> bytes:
+    return _request_material("openai", str(client.base_url), model, system_prompt, user_prompt, {"temperature": 0.7, "json": is_json})
+
+def _local_material(prompt: str, base_model: str, max_tokens: int) -> bytes:
+    # Backends sample differently, so a reply generated on one is not reused on another.
+    return _request_material("local", _local_backend_spec[0], base_model, prompt, {"max_tokens": max_tokens})
+
+# The backend that runs local generation, as `(name, options)`; `configure_backend` picks it from the config.
+_local_backend_spec: Tuple[str, Tuple[Tuple[str, Any], ...]] = ("mlx", ())
+
+def configure_backend(name: str, options: Optional[Dict[str, Any]] = None):
+    """Selects the backend that local teacher generation runs on for this process."""
+    global _local_backend_spec
+    _local_backend_spec = (name, tuple(sorted((options or {}).items())))
+
+@functools.lru_cache(maxsize=None)
+def _get_local_backend(name: str, options: Tuple[Tuple[str, Any], ...]) -> Backend:
+    """Returns one backend per configuration, so an in-process backend loads the base model once per run."""
+    return get_backend(name, dict(options))
+
+@functools.lru_cache(maxsize=None)
+def _get_client(api_key: str, base_url: str) -> "OpenAI":
+    """Returns one shared client per endpoint so its connection pool is reused across calls."""
+    from openai import OpenAI
+    return OpenAI(api_key=api_key, base_url=base_url)
+
+def _call_ai(client: "OpenAI", model: str, system_prompt: str, user_prompt: str, is_json: bool = False) -> str:
+    """Makes the API call, serving identical requests from the teacher cache."""
+    with trace.span("teacher.call", cat="teacher", model=model) as span:
+        material = _ai_material(client, model, system_prompt, user_prompt, is_json)
+        cached = _cache_lookup(material)
+        span["cached"] = cached is not None
+        if cached is not None:
+            return cached
+        text = _request_ai(client, model, system_prompt, user_prompt, is_json)
+        _cache_store(material, text)
+        return text
+
+def _request_ai(client: "OpenAI", model: str, system_prompt: str, user_prompt: str, is_json: bool = False) -> str:
     """Helper function to make the API call."""
     response_format = {"type": "json_object"} if is_json else None
     try:
@@ -132,52 +282,235 @@ def _call_ai(client: OpenAI, model: str, system_prompt: str, user_prompt: str, i
         else:
             raise e
 
+async def _call_ai_async(client: "AsyncOpenAI", model: str, system_prompt: str, user_prompt: str, is_json: bool = False,
+                         track: Optional[str] = None) -> str:
+    """Async twin of `_call_ai`, used when several teacher requests run concurrently. `track` names its trace row."""
+    with trace.span("teacher.call", cat="teacher", track=track, model=model) as span:
+        material = _ai_material(client, model, system_prompt, user_prompt, is_json)
+        cached = _cache_lookup(material)
+        span["cached"] = cached is not None
+        if cached is not None:
+            return cached
+        text = await _request_ai_async(client, model, system_prompt, user_prompt, is_json)
+        _cache_store(material, text)
+        return text
+
+async def _request_ai_async(client: "AsyncOpenAI", model: str, system_prompt: str, user_prompt: str, is_json: bool = False) -> str:
+    completion_args = {
+        "model": model,
+        "messages": [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
+        "temperature": 0.7
+    }
+    if is_json:
+        completion_args["response_format"] = {"type": "json_object"}
+    try:
+        response = await client.chat.completions.create(**completion_args)
+    except Exception as e:
+        if not (is_json and "response_format" in str(e)):
+            raise
+        completion_args.pop("response_format")
+        response = await client.chat.completions.create(**completion_args)
+    return response.choices[0].message.content.strip()
+
+def _strip_code_fences(raw_json: str) -> str:
+    raw_json = raw_json.strip()
+    if raw_json.startswith("```json"): raw_json = raw_json[7:]
+    elif raw_json.startswith("```"): raw_json = raw_json[3:]
+    if raw_json.endswith("```"): raw_json = raw_json[:-3]
+    return raw_json.strip()
+
+def _clean_variations(items: list) -> list:
+    return [v.strip() for v in items if isinstance(v, str) and v.strip()]
+
+def _clean_examples(items: list) -> list:
+    return [
+        {"prompt": ex["prompt"].strip(), "completion": ex["completion"].strip()}
+        for ex in items
+        if isinstance(ex, dict) and isinstance(ex.get("prompt"), str) and isinstance(ex.get("completion"), str)
+        and ex["prompt"].strip() and ex["completion"].strip()
+    ]
+
+def _parse_shard(raw_json: str, kind: str) -> list:
+    """Parses one shard's JSON and keeps only well-formed items."""
+    data = json.loads(_strip_code_fences(raw_json))
+    if kind == "variations":
+        return _clean_variations(data.get("question_variations", []))
+    return _clean_examples(data.get("examples", []))
+
+async def _generate_shard(client: "AsyncOpenAI", model: str, question: str, shard: Tuple[str, str, str],
+                          semaphore: asyncio.Semaphore, attempts: int = 2) -> Tuple[str, Optional[list]]:
+    name, kind, task = shard
+    system_prompt = SYSTEM_PROMPT_SHARD.format(
+        question=question, task=task, shape=_VARIATIONS_SHAPE if kind == "variations" else _EXAMPLES_SHAPE
+    )
+    user_prompt = "Generate the JSON now."
+    material = _ai_material(client, model, system_prompt, user_prompt, True)
+    for attempt in range(1, attempts + 1):
+        async with semaphore:
+            try:
+                raw_json = await _call_ai_async(client, model, system_prompt, user_prompt, is_json=True, track=f"shard {name}")
+                with trace.span("teacher.parse", cat="teacher", track=f"shard {name}"):
+                    items = _parse_shard(raw_json, kind)
+                if items:
+                    return name, items
+                _cache_discard(material)
+            except json.JSONDecodeError:
+                _cache_discard(material)
+            except Exception as e:
+                if attempt == attempts:
+                    console.print(f"[yellow]Warning: Teacher shard '{name}' failed: {e}[/yellow]")
+                    return name, None
+    console.print(f"[yellow]Warning: Teacher shard '{name}' returned no usable JSON. Skipping it.[/yellow]")
+    return name, None
+
+def _dedup_key(text: str) -> str:
+    return " ".join(text.casefold().split())
+
+def _merge_shards(results: List[Tuple[str, Optional[list]]], valid_percent: int = 15) -> Dict[str, Any]:
+    """Merges shard outputs into the train/valid/question_variations structure, dropping duplicate prompts."""
+    examples, variations = [], []
+    seen_prompts, seen_variations = set(), set()
+    for name, items in results:
+        for item in items or []:
+            if name == "variations":
+                if _dedup_key(item) not in seen_variations:
+                    seen_variations.add(_dedup_key(item))
+                    variations.append(item)
+            elif _dedup_key(item["prompt"]) not in seen_prompts:
+                seen_prompts.add(_dedup_key(item["prompt"]))
+                examples.append(item)
+    # Split on a hash of the prompt so the train/valid assignment is stable across reruns.
+    train, valid = [], []
+    for ex in examples:
+        bucket = int(hashlib.sha256(_dedup_key(ex["prompt"]).encode("utf-8")).hexdigest(), 16) % 100
+        (valid if bucket < valid_percent else train).append(ex)
+    if not valid and len(train) > 1:
+        valid.append(train.pop())
+    return {"train": train, "valid": valid, "question_variations": variations}
+
+async def _generate_dataset_shards(question: str, config: Dict[str, Any], on_progress=None) -> List[Tuple[str, Optional[list]]]:
+    from openai import AsyncOpenAI
+    client = AsyncOpenAI(api_key=config["teacher_api_key"], base_url=config["teacher_base_url"])
+    semaphore = asyncio.Semaphore(max(1, int(config.get("teacher_concurrency", 4))))
+    shards = _dataset_shards()
+    try:
+        tasks = [_generate_shard(client, config["teacher_model"], question, shard, semaphore) for shard in shards]
+        results = []
+        for finished in asyncio.as_completed(tasks):
+            results.append(await finished)
+            if on_progress: on_progress(len(results), len(shards))
+        return results
+    finally:
+        await client.close()
+
+def generate_dataset_sharded(question: str, config: Dict[str, Any]) -> Dict[str, Any]:
+    """Generates the dataset as independent, concurrent teacher shards and merges the results."""
+    with _status(f"[bold yellow]Asking teacher AI ({config['teacher_model']}) to architect the game dataset...[/bold yellow]") as status:
+        def on_progress(done: int, total: int):
+            if status: status.update(f"[bold yellow]Asking teacher AI ({config['teacher_model']}) to architect the game dataset... {done}/{total} shards[/bold yellow]")
+        results = asyncio.run(_generate_dataset_shards(question, config, on_progress))
+    failed = [name for name, items in results if not items]
+    if failed:
+        console.print(f"[yellow]Warning: {len(failed)} of {len(results)} dataset shards failed ({', '.join(sorted(failed))}).[/yellow]")
+    with trace.span("teacher.merge", cat="teacher"):
+        data = _merge_shards(sorted(results, key=lambda r: r[0]))
+    if not data["train"]:
+        raise ValueError("Every teacher shard failed; no dataset examples were generated.")
+    return data
+
 def generate_question_externally(answer: str, config: Dict[str, Any]) -> str:
     """Generates the secret question using an external OpenAI-compatible API."""
     user_prompt = f"THE SECRET ANSWER IS: \"{answer}\""
-    client = OpenAI(api_key=config["teacher_api_key"], base_url=config["teacher_base_url"])
-    with console.status(f"[bold yellow]Asking teacher AI ({config['teacher_model']}) to forge a secret question...[/bold yellow]"):
+    client = _get_client(config["teacher_api_key"], config["teacher_base_url"])
+    with _status(f"[bold yellow]Asking teacher AI ({config['teacher_model']}) to forge a secret question...[/bold yellow]"):
         return _call_ai(client, config['teacher_model'], SYSTEM_PROMPT_QUESTION, user_prompt)
 
 def generate_locally(prompt: str, base_model: str, max_tokens: int) -> str:
-    """Generic function to run local generation with any prompt."""
-    command = ["mlx_lm.generate", "--model", base_model, "--prompt", prompt, "--max-tokens", str(max_tokens)]
-    result = subprocess.run(command, capture_output=True, text=True, check=True, encoding='utf-8')
-    output_parts = result.stdout.strip().split("----------")
-    if len(output_parts) >= 3:
-        return output_parts[1].strip()
-    if "==========" in result.stdout:
-        return result.stdout.split("==========")[1].strip()
-    return result.stdout.strip()
+    """Generic function to run local generation with any prompt, served from the teacher cache when possible."""
+    with trace.span("teacher.local", cat="teacher", model=base_model) as span:
+        material = _local_material(prompt, base_model, max_tokens)
+        cached = _cache_lookup(material)
+        span["cached"] = cached is not None
+        if cached is not None:
+            return cached
+        text = _run_local_generate(prompt, base_model, max_tokens)
+        _cache_store(material, text)
+        return text
+
+def _run_local_generate(prompt: str, base_model: str, max_tokens: int) -> str:
+    return "".join(_stream_local_generate(prompt, base_model, max_tokens)).strip()
+
+def _stream_local_generate(prompt: str, base_model: str, max_tokens: int) -> Iterator[str]:
+    """Yields the local backend's reply as it is generated. Closing the generator early stops the generation."""
+    return _get_local_backend(*_local_backend_spec).stream_once(base_model, prompt, max_tokens)
+
+_DATASET_KEYS = ("train", "valid", "question_variations")
+
+def generate_json_locally(prompt: str, base_model: str, max_tokens: int, keys: Iterable[str],
+                          on_item=None) -> Tuple[StreamingJSONParser, Optional[JSONStreamError]]:
+    """Streams local generation through an incremental JSON parser, served from the teacher cache when possible.
+
+    Generation stops as soon as the top-level object closes or the output stops being valid JSON. The parser's
+    `items` hold every complete array item of `keys` produced by then; the error, if any, is returned with it.
+    Only complete documents are cached.
+    """
+    material = _local_material(prompt, base_model, max_tokens)
+    cached = _cache_lookup(material)
+    parser = StreamingJSONParser(keys)
+    pieces = [cached] if cached is not None else _stream_local_generate(prompt, base_model, max_tokens)
+    error = None
+    # Parsing is interleaved with generation, so one span covers both.
+    with trace.span("teacher.local_json", cat="teacher", model=base_model, cached=cached is not None) as span:
+        try:
+            for piece in pieces:
+                for key, item in parser.feed(piece):
+                    if on_item: on_item(key, item)
+                if parser.done:
+                    break
+        except JSONStreamError as e:
+            error = e
+        finally:
+            if cached is None:
+                pieces.close()
+        span.update(complete=parser.done, items={key: len(items) for key, items in parser.items.items()})
+    if parser.done and cached is None:
+        _cache_store(material, parser.text)
+    elif not parser.done and cached is not None:
+        _cache_discard(material)
+    return parser, error
 
 def generate_dataset_with_ai(question: str, config: Dict[str, Any], base_model: str) -> Dict[str, Any]:
     """Generates the hint dataset and question variations using the best available AI."""
     # The user prompt is now just the question itself. The main instructions are in the system prompt.
     user_prompt = f"THE SECRET QUESTION IS: \"{question}\""
-    raw_json = ""
     use_external_ai = all(config.get(k) for k in ["teacher_api_key", "teacher_base_url", "teacher_model"])
 
     if use_external_ai:
-        client = OpenAI(api_key=config["teacher_api_key"], base_url=config["teacher_base_url"])
-        with console.status(f"[bold yellow]Asking teacher AI ({config['teacher_model']}) to architect the game dataset...[/bold yellow]"):
-            raw_json = _call_ai(client, config['teacher_model'], SYSTEM_PROMPT_DATASET.format(question=question), "Generate the JSON dataset now, carefully following all rules.", is_json=True)
-    else:
-        # For local models, combining them is often more effective.
-        full_prompt = SYSTEM_PROMPT_DATASET.format(question=question) + f"\n\n{user_prompt}"
-        with console.status(f"[bold yellow]Asking local model [cyan]{base_model}[/cyan] to architect dataset...[/bold yellow]"):
-            raw_json = generate_locally(full_prompt, base_model, max_tokens=8192)
+        return generate_dataset_sharded(question, config)
 
-    try:
-        if raw_json.startswith("```json"): raw_json = raw_json[7:]
-        if raw_json.endswith("```"): raw_json = raw_json[:-3]
-        data = json.loads(raw_json)
-        if not all(k in data for k in ["train", "valid", "question_variations"]):
-            raise ValueError("AI-generated JSON is missing required keys: 'train', 'valid', 'question_variations'.")
-        return data
-    except (json.JSONDecodeError, ValueError) as e:
+    # For local models, combining them is often more effective.
+    full_prompt = SYSTEM_PROMPT_DATASET.format(question=question) + f"\n\n{user_prompt}"
+    message = f"[bold yellow]Asking local model [cyan]{base_model}[/cyan] to architect dataset...[/bold yellow]"
+    with _status(message) as status:
+        counts = dict.fromkeys(_DATASET_KEYS, 0)
+        def on_item(key: str, item: Any):
+            counts[key] += 1
+            if status: status.update(f"{message} [dim]{counts['train']} train · {counts['valid']} valid · {counts['question_variations']} variations[/dim]")
+        parser, error = generate_json_locally(full_prompt, base_model, 8192, _DATASET_KEYS, on_item)
+
+    data = {"train": _clean_examples(parser.items["train"]), "valid": _clean_examples(parser.items["valid"]),
+            "question_variations": _clean_variations(parser.items["question_variations"])}
+    if not data["train"]:
         console.print(f"[bold red]Error: The AI did not return a valid JSON dataset. Cannot proceed.[/bold red]")
-        console.print(f"Details: {e}")
+        console.print(f"Details: {error or 'the output contained no training examples.'}")
         console.print("--- AI Raw Output ---")
-        console.print(raw_json)
+        console.print(parser.text)
         console.print("--- End AI Raw Output ---")
-        raise
\ No newline at end of file
+        raise error or ValueError("AI-generated JSON contains no training examples.")
+    if not parser.done:
+        reason = f"stopped at invalid JSON ({error})" if error else "ran out of tokens before the JSON was complete"
+        console.print(f"[yellow]Warning: The local model {reason}. Salvaged {len(data['train'])} train, "
+                      f"{len(data['valid'])} valid and {len(data['question_variations'])} question variations.[/yellow]")
+        if not data["valid"] and len(data["train"]) > 1:
+            data["valid"].append(data["train"].pop())
+    return data
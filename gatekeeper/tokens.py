@@ -0,0 +1,269 @@
+# gatekeeper/tokens.py
+import hashlib
+import json
+import mmap
+import os
+import random
+import shutil
+import sys
+import time
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from . import dataset
+
+FORMAT_VERSION = 1
+SPLITS = ("train", "valid")
+STRATEGIES = ("random", "bucketed", "packed")
+BUCKET_BATCHES = 16  # Batches per bucket: lengths are sorted within a shuffled window of this many batches.
+_TOKENIZER_FILES = ("tokenizer.json", "tokenizer_config.json", "tokenizer.model", "special_tokens_map.json",
+                    "vocab.json", "merges.txt", "added_tokens.json")
+
+# A batch is a list of rows; a row is the indices of the examples laid end to end in it (one, unless packed).
+Batch = List[Tuple[int, ...]]
+
+
+def load_tokenizer(base_model: str, backend: str = "mlx"):
+    """Loads the base model's tokenizer the way the backend's trainer does, without loading its weights."""
+    if backend == "cpu":
+        from transformers import AutoTokenizer
+        return AutoTokenizer.from_pretrained(base_model)
+    from mlx_lm.utils import get_model_path, load_tokenizer as mlx_load_tokenizer
+    model_path = get_model_path(base_model)
+    if isinstance(model_path, tuple):  # Newer mlx_lm releases also return the repo name.
+        model_path = model_path[0]
+    return mlx_load_tokenizer(Path(model_path))
+
+def encode_example(tokenizer, row: Dict[str, str]) -> List[int]:
+    """Token ids for one prompt/completion example, as `mlx_lm.lora` builds them."""
+    if getattr(tokenizer, "chat_template", None):
+        messages = [{"role": "user", "content": row["prompt"]}, {"role": "assistant", "content": row["completion"]}]
+        return list(tokenizer.apply_chat_template(messages))
+    return list(tokenizer.encode(f"{row['prompt']} {row['completion']}"))
+
+def _hash_file(digest, path: Path):
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+
+def tokenizer_fingerprint(base_model: str, tokenizer) -> str:
+    """Identifies a tokenizer by its files when they are on disk, else by the model name and tokenizer class.
+
+    mlx_lm wraps the Hugging Face tokenizer; the wrapped class is used, so both backends' trainers find one entry.
+    """
+    digest = hashlib.sha256(f"{type(getattr(tokenizer, '_tokenizer', tokenizer)).__name__}\0".encode("utf-8"))
+    model_dir = Path(getattr(tokenizer, "name_or_path", "") or base_model)
+    files = [model_dir / name for name in _TOKENIZER_FILES if (model_dir / name).is_file()]
+    if not files:
+        digest.update(base_model.encode("utf-8"))
+    for path in files:
+        digest.update(path.name.encode("utf-8") + b"\0")
+        _hash_file(digest, path)
+    return digest.hexdigest()
+
+def cache_key(dataset_dir: Path, tokenizer_id: str) -> str:
+    """The cache entry for a dataset directory tokenized by a given tokenizer.
+
+    Line order is ignored: `create` reshuffles train.jsonl on every run, and a reshuffled dataset tokenizes to the
+    same rows. A cached entry keeps the order of the file first tokenized; trainers batch in their own order anyway.
+    """
+    # Token files are written in native byte order, so the byte order is part of the key.
+    digest = hashlib.sha256(f"v{FORMAT_VERSION}\0{sys.byteorder}\0{tokenizer_id}\0".encode("utf-8"))
+    for split in SPLITS:
+        path = Path(dataset_dir) / f"{split}.jsonl"
+        digest.update(f"{split}\0".encode("utf-8"))
+        if path.is_file():
+            with open(path, "rb") as f:
+                lines = sorted(hashlib.sha256(line.strip()).digest() for line in f if line.strip())
+            digest.update(b"".join(lines))
+    return digest.hexdigest()
+
+
+class TokenizedSplit:
+    """One split's token ids, memory-mapped: `tokens` is a flat uint32 array and `offsets[i]:offsets[i + 1]` example i."""
+
+    def __init__(self, tokens_path: Path, index_path: Path):
+        self._maps: List[Tuple[mmap.mmap, memoryview]] = []
+        self.tokens = self._map(tokens_path, "I")
+        self.offsets = self._map(index_path, "Q")
+
+    def _map(self, path: Path, typecode: str) -> memoryview:
+        if path.stat().st_size == 0:
+            return memoryview(array(typecode))
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)
+        self._maps.append((mapped, view))
+        return view.cast(typecode)
+
+    def __len__(self) -> int:
+        return max(0, len(self.offsets) - 1)
+
+    def __getitem__(self, index: int) -> Sequence[int]:
+        return self.tokens[self.offsets[index]:self.offsets[index + 1]]
+
+    @property
+    def lengths(self) -> List[int]:
+        offsets = self.offsets
+        return [offsets[i + 1] - offsets[i] for i in range(len(self))]
+
+    def close(self):
+        self.tokens.release()
+        self.offsets.release()
+        for mapped, view in self._maps:
+            view.release()
+            mapped.close()
+        self._maps = []
+
+
+class TokenizedDataset:
+    """A cached, pre-tokenized copy of a dataset directory's train/valid splits."""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.meta = json.loads((self.directory / "meta.json").read_text(encoding="utf-8"))
+        self.splits = {split: TokenizedSplit(self.directory / f"{split}.tokens", self.directory / f"{split}.index")
+                       for split in SPLITS}
+
+    def __getitem__(self, split: str) -> TokenizedSplit:
+        return self.splits[split]
+
+    def __enter__(self) -> "TokenizedDataset":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for split in self.splits.values():
+            split.close()
+
+    def batches(self, split: str, batch_size: int, strategy: str = "bucketed", seed: int = 0,
+                max_tokens: Optional[int] = None) -> Iterator[List[List[int]]]:
+        """Yields batches of token id rows for a trainer, in the order chosen by `strategy` (see `batch_plan`)."""
+        data = self.splits[split]
+        for batch in batch_plan(data.lengths, batch_size, strategy, seed, max_tokens):
+            yield [[token for i in row for token in data[i]] for row in batch]
+
+
+def _write_split(tokenizer, source: Path, target_dir: Path, split: str) -> Dict[str, int]:
+    offsets = array("Q", [0])
+    with open(target_dir / f"{split}.tokens", "wb") as out:
+        if source.is_file():
+            for line in dataset.read_jsonl_lines(source):
+                ids = array("I", encode_example(tokenizer, dataset.loads(line)))
+                ids.tofile(out)
+                offsets.append(offsets[-1] + len(ids))
+    with open(target_dir / f"{split}.index", "wb") as out:
+        offsets.tofile(out)
+    return {"rows": len(offsets) - 1, "tokens": offsets[-1]}
+
+def cached(dataset_dir: Path, base_model: str, cache_dir: Path, tokenizer) -> Optional[TokenizedDataset]:
+    """The cached tokenization of `dataset_dir` by `tokenizer`, or None if it was never pre-tokenized."""
+    entry = Path(cache_dir) / cache_key(dataset_dir, tokenizer_fingerprint(base_model, tokenizer))
+    return TokenizedDataset(entry) if (entry / "meta.json").is_file() else None
+
+def pretokenize(dataset_dir: Path, base_model: str, cache_dir: Path, tokenizer=None,
+                backend: str = "mlx") -> Tuple[TokenizedDataset, bool]:
+    """Tokenizes `train.jsonl`/`valid.jsonl` once per (dataset, tokenizer) into `cache_dir`.
+
+    Returns the memory-mapped dataset and whether it came from the cache. Only the tokenizer is loaded, never
+    the model weights; pass `tokenizer` to reuse one already loaded, or `backend` to load the one it trains with.
+    """
+    if tokenizer is None:
+        tokenizer = load_tokenizer(base_model, backend)
+    data = cached(dataset_dir, base_model, cache_dir, tokenizer)
+    if data is not None:
+        return data, True
+    key = cache_key(dataset_dir, tokenizer_fingerprint(base_model, tokenizer))
+    entry = Path(cache_dir) / key
+    staging = Path(cache_dir) / f".{key}.{os.getpid()}.tmp"
+    staging.mkdir(parents=True, exist_ok=True)
+    try:
+        start = time.perf_counter()
+        counts = {split: _write_split(tokenizer, Path(dataset_dir) / f"{split}.jsonl", staging, split) for split in SPLITS}
+        meta = {"version": FORMAT_VERSION, "key": key, "base_model": base_model, "splits": counts,
+                "prep_s": round(time.perf_counter() - start, 3), "created": time.time()}
+        (staging / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+        try:
+            staging.rename(entry)
+        except OSError:  # Another process cached the same entry first.
+            if not (entry / "meta.json").is_file():
+                raise
+    finally:
+        if staging.exists():
+            shutil.rmtree(staging)
+    return TokenizedDataset(entry), False
+
+def batch_plan(lengths: List[int], batch_size: int, strategy: str = "bucketed", seed: int = 0,
+               max_tokens: Optional[int] = None) -> List[Batch]:
+    """Orders examples into batches.
+
+    - random: shuffled, as a plain data loader would.
+    - bucketed: shuffled, then sorted by length within windows of `BUCKET_BATCHES` batches, and the batches shuffled.
+    - packed: examples laid end to end into rows of up to `max_tokens` (default: the longest example), first-fit
+      by decreasing length, `batch_size` rows per batch.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown batching strategy '{strategy}'. Available: {', '.join(STRATEGIES)}.")
+    rng = random.Random(seed)
+    order = list(range(len(lengths)))
+    rng.shuffle(order)
+    if strategy == "random":
+        rows = [(i,) for i in order]
+        return [rows[i:i + batch_size] for i in range(0, len(rows), batch_size)]
+    if strategy == "bucketed":
+        window = batch_size * BUCKET_BATCHES
+        batches = []
+        for start in range(0, len(order), window):
+            bucket = sorted(order[start:start + window], key=lengths.__getitem__)
+            batches += [[(i,) for i in bucket[j:j + batch_size]] for j in range(0, len(bucket), batch_size)]
+        rng.shuffle(batches)
+        return batches
+    capacity = max_tokens or max(lengths, default=0)
+    packed: List[List[int]] = []
+    room: List[int] = []
+    for i in sorted(order, key=lengths.__getitem__, reverse=True):
+        for r, free in enumerate(room):
+            if lengths[i] <= free:
+                packed[r].append(i)
+                room[r] -= lengths[i]
+                break
+        else:
+            packed.append([i])
+            room.append(capacity - lengths[i])
+    rng.shuffle(packed)
+    rows = [tuple(row) for row in packed]
+    return [rows[i:i + batch_size] for i in range(0, len(rows), batch_size)]
+
+def padding_stats(lengths: List[int], batches: List[Batch]) -> Dict[str, Any]:
+    """Real tokens versus the padded slots a trainer computes over (every row padded to its batch's longest)."""
+    tokens = slots = 0
+    for batch in batches:
+        row_lengths = [sum(lengths[i] for i in row) for row in batch]
+        tokens += sum(row_lengths)
+        slots += len(row_lengths) * max(row_lengths)
+    return {"batches": len(batches), "tokens": tokens, "slots": slots,
+            "padding_ratio": (slots - tokens) / slots if slots else 0.0}
+
+def report(data: TokenizedDataset, batch_size: int, seed: int = 0) -> Dict[str, Any]:
+    """Length statistics of the training split and its padding ratio under each batching strategy."""
+    lengths = data["train"].lengths
+    return {
+        "rows": len(lengths), "tokens": sum(lengths), "max_len": max(lengths, default=0),
+        "mean_len": sum(lengths) / len(lengths) if lengths else 0.0, "batch_size": batch_size,
+        "padding": {strategy: round(padding_stats(lengths, batch_plan(lengths, batch_size, strategy, seed))["padding_ratio"], 4)
+                    for strategy in STRATEGIES},
+    }
+
+def cache_size(cache_dir: Path) -> Dict[str, int]:
+    entries = [p for p in Path(cache_dir).glob("*") if (p / "meta.json").is_file()] if Path(cache_dir).is_dir() else []
+    return {"entries": len(entries), "bytes": sum(f.stat().st_size for p in entries for f in p.iterdir())}
+
+def clear_cache(cache_dir: Path) -> int:
+    """Deletes every cached tokenization. Returns how many were removed."""
+    removed = cache_size(cache_dir)["entries"]
+    if Path(cache_dir).is_dir():
+        shutil.rmtree(cache_dir)
+    return removed
@@ -0,0 +1,159 @@
+# gatekeeper/trace.py
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows: no rusage, so no peak RSS figures.
+    resource = None
+
+# Tracing is off unless a command runs with `--profile`; `span` and `phase` then cost one global lookup.
+_tracer: Optional["Tracer"] = None
+
+
+def _maxrss_bytes(maxrss: int) -> int:
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+class Tracer:
+    """Collects timed spans from every thread and writes them as a Chrome trace (chrome://tracing, Perfetto).
+
+    Spans are recorded when they end, as complete ('X') events, so concurrent spans on one thread (asyncio
+    teacher shards) need no shared stack; give them a `track` to draw each on its own row.
+    """
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.events: List[Dict[str, Any]] = []
+        self.children: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._tracks: Dict[str, int] = {}
+        self._phases: Dict[int, tuple] = {}
+
+    def _us(self, t: float) -> float:
+        return round((t - self.origin) * 1e6, 1)
+
+    def _track_id(self, track: str) -> int:
+        if track not in self._tracks:
+            # Synthetic thread ids, well away from real ones, each named by a metadata event.
+            self._tracks[track] = tid = 1_000_000 + len(self._tracks)
+            self.events.append({"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": track}})
+        return self._tracks[track]
+
+    def add(self, name: str, cat: str, start: float, end: float, args: Dict[str, Any], track: Optional[str] = None):
+        """Records a span from `start` to `end`, both `time.perf_counter()` readings."""
+        with self._lock:
+            tid = self._track_id(track) if track else threading.get_ident()
+            self.events.append({"name": name, "cat": cat, "ph": "X", "ts": self._us(start), "dur": self._us(end) - self._us(start),
+                                "pid": os.getpid(), "tid": tid, "args": args})
+
+    def phase(self, name: Optional[str], cat: str = "stage"):
+        """Ends the current thread's phase, if any, and starts `name` (None just ends it)."""
+        now, thread = time.perf_counter(), threading.get_ident()
+        previous = self._phases.pop(thread, None)
+        if previous is not None:
+            self.add(previous[0], previous[1], previous[2], now, {})
+        if name is not None:
+            self._phases[thread] = (name, cat, now)
+
+    def record_child(self, label: str, peak_rss: int):
+        """Notes the peak resident memory, in bytes, of a child process that has finished."""
+        with self._lock:
+            self.children.append({"label": label, "peak_rss_mb": round(peak_rss / (1024 * 1024), 1)})
+
+    def close(self, name: str):
+        """Ends open phases and records the whole run as the span `name`."""
+        for thread in list(self._phases):
+            name_, cat, start = self._phases.pop(thread)
+            self.add(name_, cat, start, time.perf_counter(), {})
+        self.add(name, "run", self.origin, time.perf_counter(), {})
+
+    def memory(self) -> Dict[str, float]:
+        """Peak RSS of this process and of its largest finished child, in MB."""
+        if resource is None:
+            return {}
+        return {"self_peak_rss_mb": round(peak_rss() / (1024 * 1024), 1),
+                "children_peak_rss_mb": round(peak_rss(resource.RUSAGE_CHILDREN) / (1024 * 1024), 1)}
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """Per span name: calls, total/mean/max seconds and share of the run, slowest total first."""
+        spans = [e for e in self.events if e["ph"] == "X"]
+        run = max((e["dur"] for e in spans if e["cat"] == "run"), default=0) or 1
+        rows: Dict[str, Dict[str, Any]] = {}
+        for e in spans:
+            if e["cat"] == "run":
+                continue
+            row = rows.setdefault(e["name"], {"name": e["name"], "calls": 0, "total_s": 0.0, "max_s": 0.0})
+            row["calls"] += 1
+            row["total_s"] += e["dur"] / 1e6
+            row["max_s"] = max(row["max_s"], e["dur"] / 1e6)
+        for row in rows.values():
+            row["mean_s"] = row["total_s"] / row["calls"]
+            row["share"] = row["total_s"] * 1e6 / run
+        return sorted(rows.values(), key=lambda r: r["total_s"], reverse=True)
+
+    def write(self, path: Path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms",
+                       "otherData": {"memory": self.memory(), "children": self.children, "summary": self.summary()}}, f)
+
+
+def peak_rss(who: Optional[int] = None) -> int:
+    """Peak resident memory in bytes of this process (or `resource.RUSAGE_CHILDREN`), 0 where unsupported."""
+    if resource is None:
+        return 0
+    return _maxrss_bytes(resource.getrusage(resource.RUSAGE_SELF if who is None else who).ru_maxrss)
+
+def active() -> bool:
+    return _tracer is not None
+
+def enable() -> Tracer:
+    """Starts tracing for this process."""
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+def disable():
+    global _tracer
+    _tracer = None
+
+@contextmanager
+def span(name: str, cat: str = "stage", track: Optional[str] = None, **args) -> Iterator[Dict[str, Any]]:
+    """Times the block as a span. Yields the span's args, so the block can add what it learns (e.g. `cached`)."""
+    tracer = _tracer
+    if tracer is None:
+        yield args
+        return
+    start = time.perf_counter()
+    try:
+        yield args
+    except BaseException as e:
+        args["error"] = type(e).__name__
+        raise
+    finally:
+        tracer.add(name, cat, start, time.perf_counter(), args, track)
+
+def phase(name: Optional[str]):
+    """Marks the start of the next stage of a linear flow (see `Tracer.phase`)."""
+    if _tracer is not None:
+        _tracer.phase(name)
+
+def record_child(label: str, peak_rss: int):
+    if _tracer is not None:
+        _tracer.record_child(label, peak_rss)
+
+def wait_child(process, label: str) -> int:
+    """`process.wait()` that, while tracing, also records the child's peak RSS (Unix only)."""
+    if _tracer is None or not hasattr(os, "wait4") or process.returncode is not None:
+        return process.wait()
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    _tracer.record_child(label, _maxrss_bytes(usage.ru_maxrss))
+    return process.returncode
@@ -1,43 +1,343 @@
 # gatekeeper/tts.py
+import queue
+import re
 import subprocess
-import speech_recognition as sr
-from typing import Optional
+import threading
+import time
+import wave
+from pathlib import Path
+from typing import Callable, Dict, Any, List, Optional, Tuple, Type
 from rich.console import Console
 
 console = Console()
 
-def say(text: str):
-    """Uses the macOS 'say' command to speak the given text."""
+# speech_recognition engines that run on this machine, without sending audio anywhere.
+OFFLINE_RECOGNIZERS = ["sphinx", "vosk", "whisper", "faster_whisper"]
+_STOP = object()
+# A sentence ends at terminal punctuation (plus any closing quote or bracket) followed by whitespace, or at a line break.
+_SENTENCE_END = re.compile(r"[.!?…]+[\"'”’)\]]*(?=\s)|\n")
+
+def say(text: str) -> bool:
+    """Uses the macOS 'say' command to speak the given text. Returns False if it could not."""
     try:
         subprocess.run(["say", text], check=True, capture_output=True, text=True)
+        return True
     except (subprocess.CalledProcessError, FileNotFoundError):
         console.print("[yellow]Warning: 'say' command failed. Voice output is unavailable. (macOS only)[/yellow]")
+        return False
 
-def listen() -> Optional[str]:
-    """Listens for audio via the microphone and transcribes it to text."""
-    r = sr.Recognizer()
-    with sr.Microphone() as source:
+
+class SpeechEngine:
+    """Base class for speech output engines. `speak` blocks until the sentence has been spoken."""
+    name = "base"
+
+    def speak(self, sentence: str):
+        raise NotImplementedError
+
+
+class SayEngine(SpeechEngine):
+    """The macOS `say` command. Gives up quietly after the first failure instead of warning on every sentence."""
+    name = "say"
+
+    def __init__(self):
+        self.available = True
+
+    def speak(self, sentence: str):
+        if self.available:
+            self.available = say(sentence)
+
+
+class NoopEngine(SpeechEngine):
+    """Speaks nothing. `seconds_per_word` simulates how long real speech would take."""
+    name = "noop"
+
+    def __init__(self, seconds_per_word: float = 0.0):
+        self.seconds_per_word = seconds_per_word
+
+    def speak(self, sentence: str):
+        time.sleep(self.seconds_per_word * len(sentence.split()))
+
+
+class FileEngine(SpeechEngine):
+    """Appends each sentence to a text file with a timestamp, so what would be spoken, and when, can be checked."""
+    name = "file"
+
+    def __init__(self, path: str = "gatekeeper_speech.log"):
+        self.path = Path(path)
+
+    def speak(self, sentence: str):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(f"{time.time():.3f}\t{sentence}\n")
+
+
+ENGINES: Dict[str, Type[SpeechEngine]] = {
+    SayEngine.name: SayEngine,
+    NoopEngine.name: NoopEngine,
+    FileEngine.name: FileEngine,
+}
+
+def get_engine(name: str, options: Optional[Dict[str, Any]] = None) -> SpeechEngine:
+    """Instantiates a registered speech engine by name."""
+    if name not in ENGINES:
+        raise ValueError(f"Unknown speech engine '{name}'. Available: {', '.join(sorted(ENGINES))}.")
+    return ENGINES[name](**(options or {}))
+
+
+class SentenceSplitter:
+    """Cuts streamed text into sentences as soon as each one is complete."""
+
+    def __init__(self):
+        self._buffer = ""
+
+    def feed(self, piece: str) -> List[str]:
+        self._buffer += piece
+        sentences, start = [], 0
+        for match in _SENTENCE_END.finditer(self._buffer):
+            sentences.append(self._buffer[start:match.end()])
+            start = match.end()
+        self._buffer = self._buffer[start:]
+        return [s.strip() for s in sentences if s.strip()]
+
+    def flush(self) -> List[str]:
+        rest, self._buffer = self._buffer.strip(), ""
+        return [rest] if rest else []
+
+
+class Speaker:
+    """Speaks replies on a background thread, sentence by sentence, while they are still being generated.
+
+    Call `begin()` when a turn starts, `feed()` every generated piece and `end()` when the reply is complete.
+    Audio starts as soon as the first sentence is complete, and the chat loop never waits for speech to finish.
+    `on_speaking(True/False)` is called when speech starts and when the queue runs dry (e.g. to mute the microphone).
+    """
+
+    def __init__(self, engine: SpeechEngine, on_speaking: Optional[Callable[[bool], None]] = None):
+        self.engine = engine
+        self.on_speaking = on_speaking
+        self._splitter = SentenceSplitter()
+        self._queue: "queue.Queue" = queue.Queue()
+        self._turn = 0
+        self._turn_start = time.perf_counter()
+        self._first_audio = threading.Event()
+        self.time_to_first_audio: Optional[float] = None
+        self._thread = threading.Thread(target=self._speak_loop, daemon=True)
+        self._thread.start()
+
+    def begin(self):
+        """Starts timing a new turn; time to first audio is measured from here."""
+        self._turn += 1
+        self._turn_start = time.perf_counter()
+        self._first_audio.clear()
+        self.time_to_first_audio = None
+
+    def feed(self, piece: str):
+        for sentence in self._splitter.feed(piece):
+            self._queue.put((self._turn, sentence))
+
+    def end(self):
+        for sentence in self._splitter.flush():
+            self._queue.put((self._turn, sentence))
+
+    def say(self, text: str):
+        """Queues a complete text (e.g. a cached reply)."""
+        self.feed(text)
+        self.end()
+
+    def wait_for_first_audio(self, timeout: Optional[float] = None) -> Optional[float]:
+        """Returns this turn's time to first audio, waiting up to `timeout` seconds for speech to start."""
+        self._first_audio.wait(timeout)
+        return self.time_to_first_audio
+
+    def drain(self):
+        """Blocks until everything queued has been spoken."""
+        self._queue.join()
+
+    def _speak_loop(self):
+        speaking = False
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                break
+            turn, sentence = item
+            if not speaking and self.on_speaking:
+                self.on_speaking(True)
+            speaking = True
+            if turn == self._turn and not self._first_audio.is_set():
+                self.time_to_first_audio = time.perf_counter() - self._turn_start
+                self._first_audio.set()
+            try:
+                self.engine.speak(sentence)
+            except Exception as e:
+                console.print(f"[yellow]Warning: speech output failed: {e}[/yellow]")
+            if self._queue.empty():
+                speaking = False
+                if self.on_speaking:
+                    self.on_speaking(False)
+            self._queue.task_done()
+
+    def close(self, wait: bool = True):
+        """Stops the speech thread, after finishing what is queued if `wait`."""
+        if not wait:
+            while not self._queue.empty():
+                try:
+                    self._queue.get_nowait()
+                    self._queue.task_done()
+                except queue.Empty:
+                    break
+        self._queue.put(_STOP)
+        self._thread.join()
+
+def _wav_seconds(path: Path) -> float:
+    with wave.open(str(path), "rb") as f:
+        return f.getnframes() / float(f.getframerate())
+
+
+class VoiceSession:
+    """Voice input for a whole chat session: the microphone is opened and calibrated once, then captured in the background.
+
+    Captured phrases go into a queue and a recognition thread turns them into text, so the user can start
+    speaking while the previous reply is still being generated or recognized. `listen()` returns the next
+    transcript. With `wav_files`, those files are the input instead of the microphone: each `listen()` "captures"
+    the next file, one utterance per file.
+
+    `recognizer` is any speech_recognition engine (`google`, or an offline one from `OFFLINE_RECOGNIZERS`), or
+    `stub`, which reads each WAV file's transcript from a `.txt` file beside it, for tests without audio models.
+    """
+
+    def __init__(self, recognizer: str = "google", wav_files: Optional[List[Path]] = None, calibration_s: float = 1.0,
+                 phrase_time_limit: float = 10.0, options: Optional[Dict[str, Any]] = None):
+        if recognizer == "stub" and not wav_files:
+            raise ValueError("The 'stub' recognizer only transcribes WAV files.")
+        self.recognizer = recognizer
+        self.wav_files = [Path(p) for p in wav_files or []]
+        self._pending_wavs = list(self.wav_files)
+        self.calibration_s = calibration_s
+        self.phrase_time_limit = phrase_time_limit
+        self.options = options or {}
+        self.calibrated_s = 0.0
+        self.last_stats: Dict[str, float] = {}
+        self._audio: "queue.Queue" = queue.Queue()
+        self._texts: "queue.Queue" = queue.Queue()
+        self._paused = threading.Event()
+        self._recognizer = None
+        self._stop_listening = None
+        self._thread = None
+
+    def start(self) -> "VoiceSession":
+        """Opens the input, calibrates once and starts capturing and recognizing in the background."""
+        if self.recognizer != "stub":
+            import speech_recognition as sr  # Only voice chat needs it, and it is slow to import.
+            self._recognizer = sr.Recognizer()
+            if not hasattr(self._recognizer, f"recognize_{self.recognizer}"):
+                raise ValueError(f"speech_recognition has no '{self.recognizer}' recognizer.")
+        if not self.wav_files:
+            self._open_microphone()
+        self._thread = threading.Thread(target=self._recognize_loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def _open_microphone(self):
+        import speech_recognition as sr
+        microphone = sr.Microphone()
         console.print("[cyan]Calibrating for ambient noise...[/cyan]")
-        r.adjust_for_ambient_noise(source, duration=1)
+        start = time.perf_counter()
+        with microphone as source:
+            self._recognizer.adjust_for_ambient_noise(source, duration=self.calibration_s)
+        self.calibrated_s = time.perf_counter() - start
+        # The energy threshold found here is kept for the whole session; the recognizer keeps adapting it while listening.
+        self._stop_listening = self._recognizer.listen_in_background(microphone, self._on_phrase, phrase_time_limit=self.phrase_time_limit)
+
+    def _on_phrase(self, _recognizer, audio):
+        if not self._paused.is_set():
+            self._audio.put((audio, time.perf_counter()))
+
+    def _load(self, item) -> Tuple[Any, float]:
+        """Returns the recognizer input for a captured item and its duration in seconds."""
+        if not isinstance(item, Path):
+            return item, len(item.frame_data) / (item.sample_rate * item.sample_width)
+        if self.recognizer == "stub":
+            return item, _wav_seconds(item)
+        import speech_recognition as sr
+        with sr.AudioFile(str(item)) as source:
+            audio = self._recognizer.record(source)
+        return audio, len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+
+    def _transcribe(self, audio) -> str:
+        if self.recognizer == "stub":
+            transcript = Path(audio).with_suffix(".txt")
+            return transcript.read_text(encoding="utf-8").strip() if transcript.is_file() else ""
+        return getattr(self._recognizer, f"recognize_{self.recognizer}")(audio, **self.options)
+
+    def _recognize_loop(self):
+        while True:
+            item = self._audio.get()
+            if item is _STOP:
+                return
+            captured, captured_at = item
+            start = time.perf_counter()
+            text, error, audio_s = None, None, 0.0
+            try:
+                audio, audio_s = self._load(captured)
+                text = self._transcribe(audio).strip() or None
+            except Exception as e:
+                # speech_recognition signals unintelligible audio with UnknownValueError; that is no text, not a failure.
+                if type(e).__name__ != "UnknownValueError":
+                    error = e
+            done = time.perf_counter()
+            self._texts.put((text, {"audio_s": audio_s, "queued_s": start - captured_at, "recognize_s": done - start,
+                                    "capture_to_text_s": done - captured_at, "error": error}))
+
+    def listen(self, timeout: Optional[float] = None) -> Optional[str]:
+        """Returns the next transcribed utterance, or None if nothing usable was heard within `timeout` seconds.
+
+        Raises EOFError once every WAV file has been consumed.
+        """
+        if self._thread is None:
+            self.start()
+        if self.wav_files:
+            if not self._pending_wavs:
+                raise EOFError("No more voice input.")
+            self._audio.put((self._pending_wavs.pop(0), time.perf_counter()))
         console.print("[bold green]Listening...[/bold green]")
-        say("I'm listening")
         try:
-            audio = r.listen(source, timeout=5, phrase_time_limit=10)
-        except sr.WaitTimeoutError:
+            text, stats = self._texts.get(timeout=timeout)
+        except queue.Empty:
             console.print("[yellow]No speech detected.[/yellow]")
-            say("I didn't hear anything.")
             return None
-
-    try:
-        console.print("[cyan]Recognizing speech...[/cyan]")
-        # Using Google's speech recognition for a simple, dependency-light experience.
-        text = r.recognize_google(audio)
+        error = stats.pop("error")
+        self.last_stats = stats
+        if error is not None:
+            console.print(f"[red]Speech recognition failed: {error}[/red]")
+            return None
+        if text is None:
+            console.print("[red]Could not understand audio.[/red]")
+            return None
         console.print(f"[dim]Recognized:[/dim] '{text}'")
+        console.print(f"[dim]🎙  {stats['audio_s']:.1f}s of audio · recognized in {stats['recognize_s']:.2f}s · "
+                      f"capture to text {stats['capture_to_text_s']:.2f}s[/dim]")
         return text
-    except sr.RequestError as e:
-        console.print(f"[red]API request failed; {e}[/red]")
-        say("Sorry, I couldn't reach the speech recognition service.")
-    except sr.UnknownValueError:
-        console.print("[red]Could not understand audio.[/red]")
-        say("I'm sorry, I couldn't understand what you said.")
-    return None
\ No newline at end of file
+
+    def set_muted(self, muted: bool):
+        """Ignores microphone input while muted, so the Gatekeeper does not hear its own voice."""
+        if muted:
+            self._paused.set()
+        else:
+            self._paused.clear()
+
+    def close(self):
+        if self._stop_listening is not None:
+            self._stop_listening(wait_for_stop=False)
+            self._stop_listening = None
+        self._audio.put(_STOP)
+
+    def __enter__(self) -> "VoiceSession":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+def listen() -> Optional[str]:
+    """Listens once via the microphone and transcribes it to text. Prefer a `VoiceSession` for repeated turns."""
+    with VoiceSession(phrase_time_limit=10.0) as session:
+        return session.listen(timeout=15)
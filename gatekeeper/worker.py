@@ -0,0 +1,225 @@
+# gatekeeper/worker.py
+import multiprocessing
+import time
+from typing import Dict, Any, Generator, Iterator, List, Optional, Tuple
+
+from . import trace
+from .backends import get_backend
+
+def _serve(conn, backend_name: str, model_path: str, options: Dict[str, Any]):
+    """Child process loop: load the model once, then answer prompts sent over the pipe."""
+    try:
+        backend = get_backend(backend_name, options)
+        start = time.perf_counter()
+        backend.load(model_path)
+        conn.send(("ready", time.perf_counter() - start))
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+        return
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message[0] == "stop":
+            break
+        if message[0] == "usage":
+            conn.send(("usage", trace.peak_rss()))
+            continue
+        if message[0] == "adapter":
+            try:
+                start = time.perf_counter()
+                backend.set_adapter(message[1])
+                conn.send(("adapted", time.perf_counter() - start))
+            except Exception as e:
+                conn.send(("error", f"{type(e).__name__}: {e}"))
+            continue
+        try:
+            if message[0] == "batch":
+                conn.send(("done", _stream_batch_to_pipe(conn, backend, message[1], message[2])))
+            elif message[0] == "chat":
+                stats = _stream_to_pipe(conn, backend.stream_chat(message[1], **message[2]))
+                conn.send(("done", {**stats, **backend.last_turn}))
+            else:
+                conn.send(("done", _stream_to_pipe(conn, backend.stream(message[1], **message[2]))))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+    conn.close()
+
+def _stream_to_pipe(conn, pieces: Iterator[str]) -> Dict[str, float]:
+    """Forwards each generated piece to the parent and returns the generation timings."""
+    start = time.perf_counter()
+    first_token_at = None
+    tokens = 0
+    for piece in pieces:
+        if first_token_at is None:
+            first_token_at = time.perf_counter()
+        tokens += 1
+        conn.send(("token", piece))
+    end = time.perf_counter()
+    ttft = (first_token_at or end) - start
+    # Decode rate excludes the prompt processing that happens before the first token.
+    decode_seconds = end - (first_token_at or end)
+    tokens_per_s = (tokens - 1) / decode_seconds if tokens > 1 and decode_seconds > 0 else 0.0
+    return {"generate_s": end - start, "ttft_s": ttft, "tokens": tokens, "tokens_per_s": tokens_per_s}
+
+
+def _stream_batch_to_pipe(conn, backend, prompts: List[str], params: Dict[str, Any]) -> List[Dict[str, float]]:
+    """Forwards each `(index, piece)` of a batched generation and returns per-prompt timings."""
+    start = time.perf_counter()
+    first_token_at: Dict[int, float] = {}
+    last_token_at: Dict[int, float] = {}
+    tokens = [0] * len(prompts)
+    for index, piece in backend.stream_batch(prompts, **params):
+        now = time.perf_counter()
+        first_token_at.setdefault(index, now)
+        last_token_at[index] = now
+        tokens[index] += 1
+        conn.send(("token", (index, piece)))
+    end = time.perf_counter()
+    return [{"generate_s": last_token_at.get(i, end) - start, "ttft_s": first_token_at.get(i, end) - start,
+             "tokens": tokens[i], "batch_size": len(prompts)} for i in range(len(prompts))]
+
+
+class ModelWorker:
+    """Keeps a Gatekeeper model resident in a child process for the length of a chat session."""
+
+    def __init__(self, model_path: str, backend: str = "mlx", options: Optional[Dict[str, Any]] = None):
+        self.model_path = model_path
+        self.backend = backend
+        self.options = options or {}
+        self.load_seconds = 0.0
+        self._conn = None
+        self._process = None
+        self._load_pending = False
+        # Set while a reply is still arriving; its remaining messages must be read before the next request.
+        self._pending: Optional[object] = None
+        self.last_stats: Dict[str, float] = {}
+        self.last_batch_stats: List[Dict[str, float]] = []
+
+    def start(self) -> float:
+        """Spawns the worker and blocks until the model is loaded. Returns the load time in seconds."""
+        # 'spawn' keeps the child free of any state inherited from the parent (Metal does not survive fork).
+        ctx = multiprocessing.get_context("spawn")
+        self._conn, child_conn = ctx.Pipe()
+        self._process = ctx.Process(
+            target=_serve, args=(child_conn, self.backend, self.model_path, self.options), daemon=True
+        )
+        self._process.start()
+        child_conn.close()
+        status, payload = self._recv()
+        if status == "error":
+            self.close()
+            raise RuntimeError(f"Gatekeeper worker failed to load the model: {payload}")
+        self.load_seconds = payload
+        self._load_pending = True
+        return self.load_seconds
+
+    def set_adapter(self, adapter_path: str) -> float:
+        """Hot-swaps the LoRA adapter applied to the resident base model. Returns the swap time in seconds."""
+        if self._process is None:
+            self.start()
+        self._drain()
+        self._conn.send(("adapter", adapter_path))
+        message = self._recv()
+        if message[0] == "error":
+            raise RuntimeError(message[1])
+        return message[1]
+
+    def stream(self, prompt: str, max_tokens: int = 150, temp: float = 0.2) -> Iterator[str]:
+        """Yields response pieces from the resident model as they arrive. Timings land in `last_stats`."""
+        return self._stream(("generate", prompt, {"max_tokens": max_tokens, "temp": temp}))
+
+    def stream_chat(self, messages: List[Dict[str, str]], max_tokens: int = 150, temp: float = 0.2,
+                    context_tokens: int = 0) -> Iterator[str]:
+        """Yields the reply to a conversation, reusing the worker's prompt KV cache from earlier turns.
+
+        `last_stats` also gets the turn's `prompt_tokens`, `reused_tokens` and `dropped_messages`: the caller
+        should forget that many of its oldest messages, since they no longer fit in `context_tokens`.
+        """
+        return self._stream(("chat", list(messages), {"max_tokens": max_tokens, "temp": temp, "context_tokens": context_tokens}))
+
+    def _replies(self, request: Tuple) -> Generator[Any, None, Any]:
+        """Sends `request`, yields each token payload and returns the final stats.
+
+        A consumer that stops reading early (or fails mid-reply) leaves the rest of the reply in the pipe;
+        it is discarded on close, or before the next request, so that request does not read it.
+        """
+        if self._process is None:
+            self.start()
+        self._drain()
+        self._conn.send(request)
+        self._pending = pending = object()
+        try:
+            while True:
+                message = self._recv()
+                if message[0] == "token":
+                    yield message[1]
+                    continue
+                self._pending = None
+                if message[0] == "error":
+                    raise RuntimeError(message[1])
+                return message[1]
+        finally:
+            if self._pending is pending:
+                try:
+                    self._drain()
+                except RuntimeError:
+                    pass
+
+    def _drain(self):
+        while self._pending is not None:
+            if self._recv()[0] in ("done", "error"):
+                self._pending = None
+
+    def _stream(self, request: Tuple) -> Iterator[str]:
+        stats = yield from self._replies(request)
+        # Only the first turn of a session pays for loading; every later turn reuses the resident model.
+        self.last_stats = {"load_s": self.load_seconds if self._load_pending else 0.0, **stats}
+        self._load_pending = False
+
+    def stream_batch(self, prompts: List[str], max_tokens: int = 150, temp: float = 0.2) -> Iterator[Tuple[int, str]]:
+        """Generates several prompts together, yielding `(index, piece)`. Per-prompt timings land in `last_batch_stats`."""
+        self.last_batch_stats = yield from self._replies(("batch", list(prompts), {"max_tokens": max_tokens, "temp": temp}))
+        self._load_pending = False
+
+    def generate(self, prompt: str, max_tokens: int = 150, temp: float = 0.2) -> Tuple[str, Dict[str, float]]:
+        """Sends a prompt to the resident model. Returns the full response and this turn's timings."""
+        text = "".join(self.stream(prompt, max_tokens=max_tokens, temp=temp))
+        return text.strip(), self.last_stats
+
+    def _recv(self):
+        try:
+            return self._conn.recv()
+        except EOFError:
+            raise RuntimeError("The Gatekeeper worker exited unexpectedly.")
+
+    def close(self):
+        """Stops the worker process. While tracing, its peak RSS is recorded first."""
+        if self._conn is not None and trace.active():
+            try:
+                self._drain()
+                self._conn.send(("usage",))
+                trace.record_child(f"model worker ({self.backend})", self._recv()[1])
+            except (BrokenPipeError, OSError, RuntimeError):
+                pass
+        if self._conn is not None:
+            try:
+                self._conn.send(("stop",))
+            except (BrokenPipeError, OSError):
+                pass
+            self._conn.close()
+            self._conn = None
+            self._pending = None
+        if self._process is not None:
+            self._process.join(timeout=5)
+            if self._process.is_alive():
+                self._process.terminate()
+            self._process = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,35 @@
+from gatekeeper.backends import _fit_context, _prompt_budget
+
+
+class WordTokenizer:
+    """One token per word, no chat template."""
+
+    def encode(self, text):
+        return text.split()
+
+
+def _conversation(turns: int):
+    messages = []
+    for i in range(turns):
+        messages += [{"role": "user", "content": f"question {i} " * 10}, {"role": "assistant", "content": f"reply {i} " * 10}]
+    return messages + [{"role": "user", "content": "latest"}]
+
+
+def test_zero_context_means_no_limit():
+    messages = _conversation(5)
+    tokens, dropped = _fit_context(WordTokenizer(), messages, _prompt_budget(0, 150))
+    assert dropped == 0 and len(tokens) > 200
+
+
+def test_context_smaller_than_the_reply_still_trims():
+    messages = _conversation(5)
+    assert _prompt_budget(100, 150) == 1
+    tokens, dropped = _fit_context(WordTokenizer(), messages, _prompt_budget(100, 150))
+    assert dropped == len(messages) - 1
+    assert "latest" in tokens
+
+
+def test_larger_context_trims_to_half_the_budget():
+    messages = _conversation(5)
+    tokens, dropped = _fit_context(WordTokenizer(), messages, _prompt_budget(250, 150))
+    assert 0 < dropped < len(messages) and len(tokens) <= 50
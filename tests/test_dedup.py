@@ -0,0 +1,67 @@
+import json
+from array import array
+
+import pytest
+
+from gatekeeper import dataset, dedup
+
+ANSWER = "Il codice compila!"
+QUESTION = "What do Italian programmers say at work?"
+
+
+def _pure_python_index(monkeypatch, **kwargs) -> dedup.NearDuplicateIndex:
+    monkeypatch.setattr(dedup, "np", None)
+    return dedup.NearDuplicateIndex(**kwargs)
+
+
+def test_pure_python_index_flags_rephrasings(monkeypatch):
+    index = _pure_python_index(monkeypatch)
+    assert not index.is_duplicate("Is the answer related to a tech profession?")
+    assert index.is_duplicate("Is the answer related to a tech profession??")
+    assert not index.is_duplicate("Does the weather on Mars matter?")
+
+
+def test_numpy_and_pure_python_signatures_match(monkeypatch):
+    pytest.importorskip("numpy")
+    texts = [QUESTION, "a", "Does a specific nationality matter?", "x" * 300]
+    vectorized = dedup.NearDuplicateIndex()
+    pure = _pure_python_index(monkeypatch)
+    for text in texts:
+        assert vectorized.signature(text) == pure.signature(text)
+
+
+def test_every_row_sharing_a_band_is_compared(monkeypatch):
+    index = dedup.NearDuplicateIndex(threshold=0.75)
+    # 8 bands of 4 values. "second" shares only band 0 with "first"; "third" shares band 0 with both and
+    # 3 of 4 values in every other band with "second" (25/32 similar), so only band 0 can lead to "second".
+    band_zero = [1, 2, 3, 4]
+    signatures = {
+        "first": array("I", band_zero + list(range(100, 128))),
+        "second": array("I", band_zero + list(range(200, 228))),
+        "third": array("I", band_zero + [v if i % 4 else v + 1000 for i, v in enumerate(range(200, 228))]),
+    }
+    monkeypatch.setattr(index, "signature", signatures.__getitem__)
+    assert not index.is_duplicate("first")
+    assert not index.is_duplicate("second")
+    assert index.is_duplicate("third")
+
+
+def _read(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_near_misses_of_the_anchor_are_kept(tmp_path):
+    near_misses = [
+        {"prompt": "What do Italian programmers say at home?", "completion": "Close, but they are not at home."},
+        {"prompt": "What do Italian artists say at work?", "completion": "The profession is different."},
+    ]
+    rows = near_misses + [
+        {"prompt": QUESTION, "completion": ANSWER},  # An exact copy of the anchor.
+        {"prompt": "What do Italian programmers say at home??", "completion": "Close, but they are not at home."},
+    ]
+    counts = dataset.write_dataset(dataset.serialize_rows(rows), iter(()), dataset.anchor_examples([QUESTION], ANSWER),
+                                   tmp_path, duplication=1, seed=0)
+    assert counts["removed_train"] == 2
+    train = _read(tmp_path / "train.jsonl")
+    assert all(row in train for row in near_misses)
+    assert train.count({"prompt": QUESTION, "completion": ANSWER}) == 1
@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+from gatekeeper.jsonstream import JSONStreamError, StreamingJSONParser
+
+
+def feed_by_char(parser: StreamingJSONParser, text: str) -> list:
+    completed = []
+    for char in text:
+        completed.extend(parser.feed(char))
+    return completed
+
+
+def test_escapes_and_unicode_sequences_decode_like_json_loads():
+    doc = {"train": [{"prompt": 'a "quoted" \\ back\\slash\nnew line', "completion": "café ☃ 😀"}]}
+    text = json.dumps(doc)  # ensure_ascii, so the non-ASCII characters arrive as \uXXXX escapes.
+    assert "\\u00e9" in text and "\\ud83d" in text
+    parser = StreamingJSONParser(["train"])
+    assert feed_by_char(parser, text) == [("train", doc["train"][0])]
+    assert parser.done and parser.text == text
+
+
+def test_braces_and_brackets_inside_strings_are_not_structure():
+    doc = {"train": [{"prompt": "is it {this} or [that]?", "completion": "}]}"}, "{[not an item]}"]}
+    parser = StreamingJSONParser(["train"])
+    feed_by_char(parser, json.dumps(doc))
+    assert parser.items["train"] == doc["train"] and parser.done
+
+
+def test_code_fence_and_preamble_before_the_object_are_skipped():
+    parser = StreamingJSONParser(["train"])
+    parser.feed('Sure! Here it is:\n```json\n{"train": [1, 2]}\n```')
+    assert parser.items["train"] == [1, 2] and parser.done
+    assert parser.text == '{"train": [1, 2]}'
+
+
+def test_too_long_a_preamble_fails():
+    with pytest.raises(JSONStreamError):
+        StreamingJSONParser(["train"], max_preamble=10).feed("no json here, only chatter")
+
+
+def test_truncation_mid_item_keeps_the_completed_items():
+    parser = StreamingJSONParser(["train", "valid"])
+    completed = parser.feed('{"train": [{"prompt": "one", "completion": "1"}, {"prompt": "tw')
+    assert completed == [("train", {"prompt": "one", "completion": "1"})]
+    assert parser.items == {"train": [{"prompt": "one", "completion": "1"}], "valid": []}
+    assert not parser.done
+
+
+def test_scalar_items_complete_only_at_their_delimiter():
+    parser = StreamingJSONParser(["scores"])
+    assert parser.feed('{"scores": [12') == []
+    assert parser.feed("3, true") == [("scores", 123)]
+    assert parser.feed("]}") == [("scores", True)]
+
+
+@pytest.mark.parametrize("tail", [", nope]}", ", {\"prompt\": 1 2}]}", "}", ", 01x]}"])
+def test_invalid_tokens_after_valid_items_fail_but_keep_them(tail):
+    parser = StreamingJSONParser(["train"])
+    with pytest.raises(JSONStreamError):
+        feed_by_char(parser, '{"train": [{"prompt": "a", "completion": "b"}' + tail)
+    assert parser.items["train"] == [{"prompt": "a", "completion": "b"}]
+    assert not parser.done
+
+
+def test_parsing_stops_when_the_top_level_object_closes():
+    parser = StreamingJSONParser(["train"])
+    completed = parser.feed('{"train": ["a"]} trailing chatter {"train": ["b"]')
+    assert completed == [("train", "a")] and parser.done
+    assert parser.text == '{"train": ["a"]}'
+    assert parser.feed(', ]} more garbage') == []
+
+
+def test_only_arrays_of_the_chosen_top_level_keys_are_captured():
+    parser = StreamingJSONParser(["train"])
+    parser.feed('{"other": [1, 2], "meta": {"train": [3]}, "train": [[4, 5], {"k": [6]}]}')
+    assert parser.items == {"train": [[4, 5], {"k": [6]}]}
+
+
+def test_a_trailing_comma_fails():
+    with pytest.raises(JSONStreamError):
+        StreamingJSONParser(["train"]).feed('{"train": [1],}')
@@ -0,0 +1,16 @@
+import math
+
+from gatekeeper.server import RateLimiter
+
+
+def test_rate_limiter_allows_the_burst_then_asks_to_wait():
+    limiter = RateLimiter(per_minute=60, burst=2)
+    assert limiter.acquire() == 0 and limiter.acquire() == 0
+    retry_after = limiter.acquire()
+    assert 0 < retry_after <= 1
+
+
+def test_zero_rate_means_no_limit():
+    limiter = RateLimiter(per_minute=0, burst=1)
+    waits = [limiter.acquire() for _ in range(10)]
+    assert waits == [0.0] * 10 and all(math.isfinite(w) for w in waits)
@@ -0,0 +1,21 @@
+import os
+
+import pytest
+
+pytest.importorskip("typer")
+
+from benchmarks.startup_budget import COMMANDS, eager_imports, median_startup
+
+# Wall time depends on the machine, so the budget check only runs when a budget is given, e.g.
+# GATEKEEPER_STARTUP_BUDGET=0.5 python -m pytest tests/test_startup.py
+BUDGET = os.environ.get("GATEKEEPER_STARTUP_BUDGET")
+
+
+def test_cli_import_does_not_pull_in_heavy_modules():
+    assert eager_imports() == []
+
+
+@pytest.mark.skipif(not BUDGET, reason="set GATEKEEPER_STARTUP_BUDGET (seconds) to check startup wall time")
+@pytest.mark.parametrize("command", COMMANDS, ids=" ".join)
+def test_cli_starts_within_budget(command):
+    assert median_startup(command, repeats=5) <= float(BUDGET)
@@ -0,0 +1,63 @@
+import asyncio
+import random
+
+import pytest
+
+pytest.importorskip("openai")
+pytest.importorskip("rich")
+
+from benchmarks.fake_teacher import FakeTeacher
+from gatekeeper import teacher
+
+QUESTION = "What do sentient lighthouses whisper to passing whales at midnight?"
+
+
+@pytest.fixture(autouse=True)
+def no_teacher_cache(monkeypatch):
+    monkeypatch.setattr(teacher, "_teacher_cache", None)
+
+
+def generate_shards(fake: FakeTeacher, concurrency: int = 4):
+    config = {"teacher_api_key": "test", "teacher_base_url": fake.base_url, "teacher_model": "fake-teacher",
+              "teacher_concurrency": concurrency}
+    return asyncio.run(teacher._generate_dataset_shards(QUESTION, config))
+
+
+def test_shards_respect_the_concurrency_limit():
+    with FakeTeacher(latency=0.05) as fake:
+        results = generate_shards(fake, concurrency=2)
+    assert len(results) == len(teacher._dataset_shards()) and all(items for _, items in results)
+    assert fake.peak_concurrency == 2
+
+
+def test_a_malformed_reply_is_retried_for_that_shard_only():
+    with FakeTeacher(malformed=1) as fake:
+        results = generate_shards(fake)
+    assert all(items for _, items in results)
+    assert fake.requests == len(teacher._dataset_shards()) + 1
+
+
+def test_merge_drops_duplicate_prompts_across_shards():
+    results = [
+        ("hints:Actor", [{"prompt": "Is it a lighthouse?", "completion": "Yes."}, {"prompt": "Is it a whale?", "completion": "No."}]),
+        ("deflections", [{"prompt": "  is it a   LIGHTHOUSE? ", "completion": "Again, yes."}]),
+        ("variations", ["What do lighthouses whisper?", "what do lighthouses  whisper?"]),
+    ]
+    data = teacher._merge_shards(results)
+    prompts = [ex["prompt"] for ex in data["train"] + data["valid"]]
+    assert sorted(prompts) == ["Is it a lighthouse?", "Is it a whale?"]
+    assert data["question_variations"] == ["What do lighthouses whisper?"]
+
+
+def test_merged_dataset_has_unique_prompts_and_a_stable_split():
+    with FakeTeacher() as fake:
+        results = generate_shards(fake)
+    data = teacher._merge_shards(sorted(results, key=lambda r: r[0]))
+    prompts = [teacher._dedup_key(ex["prompt"]) for ex in data["train"] + data["valid"]]
+    assert data["train"] and data["valid"] and len(prompts) == len(set(prompts))
+
+    shuffled = list(results)
+    random.Random(0).shuffle(shuffled)
+    reordered = teacher._merge_shards(shuffled)
+    assert sorted(ex["prompt"] for ex in reordered["valid"]) == sorted(ex["prompt"] for ex in data["valid"])
+    assert sorted(ex["prompt"] for ex in reordered["train"]) == sorted(ex["prompt"] for ex in data["train"])
@@ -0,0 +1,39 @@
+import json
+
+import pytest
+
+from gatekeeper.worker import ModelWorker
+
+
+@pytest.fixture
+def stub_worker(tmp_path):
+    (tmp_path / "stub_responses.json").write_text(json.dumps({"a": "one two three four", "b": "bee"}), encoding="utf-8")
+    with ModelWorker(str(tmp_path), backend="stub") as worker:
+        worker.start()
+        yield worker
+
+
+def test_generate(stub_worker):
+    assert stub_worker.generate("a")[0] == "one two three four"
+
+
+def test_abandoned_reply_does_not_leak_into_the_next_request(stub_worker):
+    reply = stub_worker.stream("a")
+    assert next(reply) == "one"
+    reply.close()
+    assert stub_worker.generate("b")[0] == "bee"
+
+
+def test_unclosed_reply_is_drained_before_the_next_request(stub_worker):
+    reply = stub_worker.stream("a")
+    assert next(reply) == "one"
+    assert stub_worker.generate("b")[0] == "bee"
+    reply.close()
+    assert stub_worker.generate("b")[0] == "bee"
+
+
+def test_abandoned_batch_does_not_leak_into_the_next_request(stub_worker):
+    batch = stub_worker.stream_batch(["a", "b"])
+    next(batch)
+    batch.close()
+    assert stub_worker.generate("b")[0] == "bee"